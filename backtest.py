@@ -1,15 +1,25 @@
 import asyncio
+import copy
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+import itertools
 import json
+import multiprocessing
 import os
+import pickle
+import sys
 import traceback
 import pytz
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from typing import Dict, List, Optional, Tuple
 
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.system.exchange_pool import close_exchange_pool, get_exchange_pool
+from function.binance.futures.system.indicator_engine import calculate_indicator_arrays
+from function.binance.futures.system.ohlcv_cache import get_ohlcv_cache, get_timeframe_ms
 from function.binance.futures.order.other.get_create_order_adjusted_price import get_adjusted_price
 from function.message import message
 from config import (
@@ -19,9 +29,17 @@ from config import (
     PRICE_CHANGE_MAXPERCENT,
     PRICE_CHANGE_THRESHOLD,
     MIN_NOTIONAL,
+    BACKTEST_OFFLINE,
+    BACKTEST_MAX_WORKERS,
+    BACKTEST_SWEEP_GRID,
+    BACKTEST_HEADLESS_REPORT,
+    BACKTEST_REPORT_MAX_POINTS,
     api_key, api_secret
 )
 
+BACKTEST_RESULTS_DIR = 'json/backtest_results'
+BACKTEST_REPORTS_DIR = 'json/backtest_reports'
+
 class BacktestPosition:
     """คลาสเก็บข้อมูล Position สำหรับ Backtest"""
     def __init__(self):
@@ -98,8 +116,35 @@ class BacktestTrade:
         self.tp_hits = []
         self.sl_adjustments = []
 
+class BacktestBars:
+    """ข้อมูลแท่งเทียนและ indicators แบบ NumPy array แยกคอลัมน์ (เตรียมครั้งเดียวก่อนวนลูป)"""
+    __slots__ = ('timestamp', 'time', 'open', 'high', 'low', 'close', 'volume',
+                 'atr_length1', 'atr_length2', 'rsi_period', 'rsi', 'rsi_prev')
+
+    def __init__(self, df: pd.DataFrame):
+        self.timestamp = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        self.time = pd.DatetimeIndex(df['timestamp']).to_pydatetime()
+        for column in ('open', 'high', 'low', 'close', 'volume', 'atr_length1', 'atr_length2', 'rsi', 'rsi_prev'):
+            setattr(self, column, df[column].to_numpy(dtype=float))
+        self.rsi_period = df['rsi_period'].to_numpy()
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def candle(self, index: int) -> dict:
+        """แท่งเทียนที่ index ในรูปแบบเดียวกับ state.current_candle ของ live"""
+        return {
+            'timestamp': int(self.timestamp[index]),
+            'open': float(self.open[index]),
+            'high': float(self.high[index]),
+            'low': float(self.low[index]),
+            'close': float(self.close[index]),
+            'volume': float(self.volume[index])
+        }
+
 class BacktestEngine:
-    def __init__(self, symbol: str, start_date: str, end_date: str, config: dict, initial_balance: float = 1000):
+    def __init__(self, symbol: str, start_date: str, end_date: str, config: dict, initial_balance: float = 1000, verbose: bool = True,
+                 offline: bool = BACKTEST_OFFLINE):
         self.symbol = symbol
         self.start_date = datetime.fromisoformat(start_date)
         self.end_date = datetime.fromisoformat(end_date)
@@ -112,6 +157,9 @@ class BacktestEngine:
         self.current_trade: Optional[BacktestTrade] = None
         self.equity_curve = []
         self.current_time = None
+        self.backtest_config = BacktestConfig()
+        self.verbose = verbose  # False = ไม่แสดง log รายแท่ง/รายเทรด (ใช้ตอนรันหลายชุดพารามิเตอร์)
+        self.offline = offline  # True = อ่านจาก OHLCV cache อย่างเดียว ไม่ดึงจาก exchange
 
         """message(symbol, f"RSI Settings:", "blue")
         message(symbol, f"Oversold: {config['rsi_oversold']}", "blue")
@@ -136,39 +184,41 @@ class BacktestEngine:
             'risk_reward_ratio': 0
         }
 
-    async def _adjust_stoploss_for_new_candle(self, df: pd.DataFrame, index: int):
+    def _log(self, text: str, color: str):
+        """แสดง log ระหว่างจำลองการเทรด (เฉพาะเมื่อ verbose)"""
+        if self.verbose:
+            message(self.symbol, text, color)
+
+    async def _adjust_stoploss_for_new_candle(self, bars: BacktestBars, index: int):
         """ปรับ stoploss ตามชุด 3 แท่งเทียน"""
         if not self.state.is_in_position or index < 3:
             return
         
         # ดูย้อนหลัง 3 แท่ง
         position_side = self.state.position.position_side 
-        candles = df.iloc[index-3:index]
         
         if position_side == 'buy':
-            prices = [c['low'] * PRICE_DECREASE for _, c in candles.iterrows()]
+            prices = bars.low[index-3:index] * PRICE_DECREASE
             # หาราคาที่สูงขึ้นเรื่อยๆ 
             if prices[2] > prices[1] > prices[0]:
-                new_stoploss = prices[0]
+                new_stoploss = float(prices[0])
                 if new_stoploss > self.state.current_stoploss:
                     self.state.current_stoploss = new_stoploss
         else:
-            prices = [c['high'] * PRICE_INCREASE for _, c in candles.iterrows()]
+            prices = bars.high[index-3:index] * PRICE_INCREASE
             # หาราคาที่ต่ำลงเรื่อยๆ
             if prices[2] < prices[1] < prices[0]:
-                new_stoploss = prices[0] 
+                new_stoploss = float(prices[0])
                 if new_stoploss < self.state.current_stoploss:
                     self.state.current_stoploss = new_stoploss
 
-    async def _adjust_tp_orders(self, df: pd.DataFrame, index: int):
+    async def _adjust_tp_orders(self, bars: BacktestBars, index: int):
         """ปรับ TP Orders หลังผ่าน 2 แท่ง"""
-        if not self.state.is_in_position or not self.state.entry_candle_index:
+        if not self.state.is_in_position or self.state.entry_candle_index is None:
             return
             
-        # หาจำนวนแท่งที่ผ่านไปหลัง entry
-        current_timestamp = df.iloc[index]['timestamp'].timestamp() * 1000
-        entry_timestamp = self.state.entry_candle_index
-        candles_passed = sum(1 for i in range(index) if df.iloc[i]['timestamp'].timestamp() * 1000 > entry_timestamp)
+        # จำนวนแท่งที่ปิดไปแล้วหลังแท่ง entry (ไม่นับแท่งปัจจุบัน)
+        candles_passed = index - self.state.entry_candle_index - 1
         
         if candles_passed < 2:  # ยังไม่ผ่าน 2 แท่ง
             return
@@ -178,9 +228,9 @@ class BacktestEngine:
         
         # คำนวณราคาอ้างอิงใหม่
         if position_side == 'buy':
-            ref_price = max(df.iloc[index-1]['high'], self.state.position.entry_price)
+            ref_price = max(bars.high[index-1], self.state.position.entry_price)
         else:
-            ref_price = min(df.iloc[index-1]['low'], self.state.position.entry_price)
+            ref_price = min(bars.low[index-1], self.state.position.entry_price)
             
         # ปรับ TP ใหม่ตามราคาอ้างอิง
         for level in self.config['take_profits']['levels']:
@@ -231,7 +281,7 @@ class BacktestEngine:
             tp_base = entry_price - (atr * target_atr)
             return tp_base * (PRICE_DECREASE - (PRICE_CHANGE_THRESHOLD * (target_atr * 2)))
 
-    async def _should_swap_position(self, df: pd.DataFrame, index: int) -> bool:
+    async def _should_swap_position(self, bars: BacktestBars, index: int) -> bool:
         """ตรวจสอบเงื่อนไขการ Swap Position"""
         if not self.state.last_focus_price:
             return False
@@ -292,161 +342,38 @@ class BacktestEngine:
         self.state.is_swapping = False
         self.state.last_focus_price = None
     async def load_historical_data(self):
-        """โหลดข้อมูลราคาย้อนหลัง"""
-        exchange = await create_future_exchange(api_key, api_secret)
-        try:
-            # แปลง timeframe เป็น milliseconds
-            timeframe = self.config['timeframe']
-            if timeframe.endswith('h'):
-                ms_per_candle = int(timeframe[:-1]) * 60 * 60 * 1000
-            elif timeframe.endswith('m'):
-                ms_per_candle = int(timeframe[:-1]) * 60 * 1000
-            elif timeframe.endswith('d'):
-                ms_per_candle = int(timeframe[:-1]) * 24 * 60 * 60 * 1000
-            
-            # คำนวณจำนวนแท่งเทียนที่ต้องการ
-            total_ms = (self.end_date - self.start_date).total_seconds() * 1000
-            num_candles = int(total_ms / ms_per_candle) + 100  # เผื่อแท่งเพิ่มสำหรับ indicators
-            
-            # โหลดข้อมูลแบบแบ่งช่วง
-            since = int(self.start_date.timestamp() * 1000)
-            all_candles = []
-            
-            while len(all_candles) < num_candles:
-                candles = await exchange.fetch_ohlcv(
-                    self.symbol, 
-                    timeframe,
-                    since=since,
-                    limit=1000
-                )
-                if not candles:
-                    break
-                    
-                all_candles.extend(candles)
-                since = candles[-1][0] + ms_per_candle
-                
-                # รอสักครู่เพื่อไม่ให้เกิน rate limit
-                await asyncio.sleep(0.1)
-            
-            self.historical_data = all_candles
-            message(self.symbol, f"โหลดข้อมูลทั้งหมด {len(all_candles)} แท่ง", "blue")
-            
-        finally:
-            await exchange.close()
+        """โหลดข้อมูลราคาย้อนหลัง (ผ่าน OHLCV cache ดึงจาก exchange เฉพาะช่วงที่ยังไม่มี)"""
+        timeframe = self.config['timeframe']
+        ms_per_candle = get_timeframe_ms(timeframe)
+        
+        # คำนวณช่วงเวลาที่ต้องการ
+        since = int(self.start_date.timestamp() * 1000)
+        total_ms = (self.end_date - self.start_date).total_seconds() * 1000
+        num_candles = int(total_ms / ms_per_candle) + 100  # เผื่อแท่งเพิ่มสำหรับ indicators
+        until = since + (num_candles - 1) * ms_per_candle
+        
+        exchange = None if self.offline else await get_exchange_pool().acquire(api_key, api_secret)
+        self.historical_data = await get_ohlcv_cache().get_candles(self.symbol, timeframe, since, until, exchange)
+        self._log(f"โหลดข้อมูลทั้งหมด {len(self.historical_data)} แท่ง", "blue")
 
     def _calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """คำนวณ indicators ทั้งหมด"""
-        # คำนวณ ATR
-        def calculate_atr(high, low, close, length):
-            tr = np.maximum(
-                high - low,
-                np.maximum(
-                    np.abs(high - close.shift(1)),
-                    np.abs(low - close.shift(1))
-                )
-            )
-            return tr.ewm(alpha=1/length, adjust=False).mean()
-        
-        # ATR สำหรับ period ต่างๆ
-        df['atr_length1'] = calculate_atr(
-            df['high'], df['low'], df['close'],
-            self.config['rsi_period']['atr']['length1']
-        )
-        df['atr_length2'] = calculate_atr(
-            df['high'], df['low'], df['close'],
-            self.config['rsi_period']['atr']['length2']
+        """คำนวณ indicators ทั้งหมด (vectorized ใช้สูตรเดียวกับ live ใน indicator_engine)"""
+        indicators = calculate_indicator_arrays(
+            df['high'].to_numpy(dtype=float),
+            df['low'].to_numpy(dtype=float),
+            df['close'].to_numpy(dtype=float),
+            self.config['rsi_period']
         )
-        
-        # คำนวณ RSI period แบบไดนามิก
-        def get_dynamic_rsi_period(row):
-            """คำนวณ RSI Period แบบไดนามิก"""
-            try:
-                # ถ้ามีค่า NaN ในการคำนวณให้ใช้ค่า min
-                if pd.isna(row['atr_length1']) or pd.isna(row['atr_length2']):
-                    return self.config['rsi_period']['rsi_period_min']
-                    
-                if not self.config['rsi_period'].get('use_dynamic_period', True):
-                    return self.config['rsi_period']['rsi_period_min']
-                        
-                # คำนวณเปอร์เซ็นต์ความต่างของ ATR
-                atr_diff_percent = ((row['atr_length1'] - row['atr_length2']) / row['atr_length2']) * 100
-                        
-                if atr_diff_percent >= self.config['rsi_period']['atr']['max_percent']:
-                    return self.config['rsi_period']['rsi_period_max']
-                elif atr_diff_percent <= self.config['rsi_period']['atr']['min_percent']:
-                    return self.config['rsi_period']['rsi_period_min']
-                else:
-                    period_range = (
-                        self.config['rsi_period']['rsi_period_max'] - 
-                        self.config['rsi_period']['rsi_period_min']
-                    )
-                    volatility_range = (
-                        self.config['rsi_period']['atr']['max_percent'] - 
-                        self.config['rsi_period']['atr']['min_percent']
-                    )
-                    period_step = (
-                        (atr_diff_percent - self.config['rsi_period']['atr']['min_percent']) / 
-                        volatility_range
-                    )
-                    value = self.config['rsi_period']['rsi_period_min'] + (period_range * period_step)
-                    return int(round(value))
-                    
-            except Exception as e:
-                # ถ้ามีข้อผิดพลาดใดๆ ให้ใช้ค่า min
-                return self.config['rsi_period']['rsi_period_min']
-        
-        df['rsi_period'] = df.apply(get_dynamic_rsi_period, axis=1)
-        
-        # คำนวณ RSI แบบไดนามิก
-        def calculate_dynamic_rsi(data):
-            """คำนวณ RSI แบบไดนามิก"""
-            close_diff = data['close'].diff()
-            gains = close_diff.where(close_diff > 0, 0)
-            losses = -close_diff.where(close_diff < 0, 0)
-            
-            rsi_values = []
-            current_period = data['rsi_period'].iloc[0]
-            
-            #message(self.symbol, f"Using RSI Period: {current_period}", "blue")
-            
-            # คำนวณค่าเฉลี่ยเริ่มต้น
-            avg_gain = gains.rolling(window=current_period).mean().iloc[current_period-1]
-            avg_loss = losses.rolling(window=current_period).mean().iloc[current_period-1]
-            
-            for i in range(len(data)):
-                if i < current_period:
-                    rsi_values.append(np.nan)
-                    continue
-                    
-                current_gain = gains.iloc[i]
-                current_loss = losses.iloc[i]
-                
-                avg_gain = ((avg_gain * (current_period - 1)) + current_gain) / current_period
-                avg_loss = ((avg_loss * (current_period - 1)) + current_loss) / current_period
-                
-                if avg_loss == 0:
-                    rsi = 100
-                else:
-                    rs = avg_gain / avg_loss
-                    rsi = 100 - (100 / (1 + rs))
-                
-                rsi_values.append(rsi)
-                
-                # Log ทุก 100 แท่ง
-                """if i % 100 == 0:
-                    message(self.symbol, f"RSI at candle {i}: {rsi:.2f}", "blue")"""
-            
-            return pd.Series(rsi_values, index=data.index)
-
-        # เพิ่ม RSI column
-        df['rsi'] = calculate_dynamic_rsi(df)
+        for column, values in indicators.items():
+            df[column] = values
 
         # ส่งคืน DataFrame ที่มีการคำนวณ indicators เรียบร้อยแล้ว
         return df
 
     async def run_backtest(self):
         """รัน backtest"""
-        await self.load_historical_data()
+        if not len(self.historical_data):
+            await self.load_historical_data()
         
         # แปลงข้อมูลเป็น DataFrame
         df = pd.DataFrame(
@@ -457,51 +384,43 @@ class BacktestEngine:
         # แปลง timestamp เป็น datetime
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         
-        # คำนวณ indicators
+        # คำนวณ indicators แล้วแยกเป็น array ต่อคอลัมน์ (ไม่ต้อง df.iloc ทุกแท่ง)
         df = self._calculate_indicators(df)
+        bars = BacktestBars(df)
+        equity = np.empty(len(bars))
         
         # วนลูปผ่านแต่ละแท่งเทียน
-        for i in range(len(df)):
-            current_row = df.iloc[i]
-            self.current_time = current_row['timestamp']
+        for i in range(len(bars)):
+            self.current_time = bars.time[i]
             
             # อัพเดทข้อมูลตลาดจำลอง
-            self.state.current_candle = {
-                'timestamp': int(current_row['timestamp'].timestamp() * 1000),
-                'open': current_row['open'],
-                'high': current_row['high'],
-                'low': current_row['low'],
-                'close': current_row['close'],
-                'volume': current_row['volume']
-            }
-            self.state.current_price = current_row['close']
+            self.state.current_candle = bars.candle(i)
+            self.state.current_price = self.state.current_candle['close']
             
             # อัพเดท indicators
-            self.state.current_atr_length_1 = current_row['atr_length1']
-            self.state.current_atr_length_2 = current_row['atr_length2']
-            self.state.current_rsi_period = current_row['rsi_period']
+            self.state.current_atr_length_1 = bars.atr_length1[i]
+            self.state.current_atr_length_2 = bars.atr_length2[i]
+            self.state.current_rsi_period = bars.rsi_period[i]
             
             # จำลองการทำงานของระบบ
-            await self._simulate_trading_logic(df, i)
+            await self._simulate_trading_logic(bars, i)
             
             # บันทึก equity curve
-            current_equity = self._calculate_current_equity()
-            self.equity_curve.append({
-                'timestamp': self.current_time,
-                'equity': current_equity
-            })
+            equity[i] = self._calculate_current_equity()
+            
+        self.equity_curve = pd.DataFrame({'timestamp': df['timestamp'], 'equity': equity})
             
         # คำนวณ metrics เมื่อจบ backtest
         self._calculate_performance_metrics()
 
-    async def _simulate_trading_logic(self, df: pd.DataFrame, index: int):
+    async def _simulate_trading_logic(self, bars: BacktestBars, index: int):
         """จำลองการทำงานของระบบเทรด"""
         try:
             current_candle = self.state.current_candle
-            backtest_config = BacktestConfig()
+            backtest_config = self.backtest_config
             
             # Log ค่า RSI และ indicators
-            #message(self.symbol, f"Candle {index} - RSI: {df['rsi'].iloc[index]:.2f}, ATR1: {df['atr_length1'].iloc[index]:.8f}, ATR2: {df['atr_length2'].iloc[index]:.8f}", "blue")
+            #message(self.symbol, f"Candle {index} - RSI: {bars.rsi[index]:.2f}, ATR1: {bars.atr_length1[index]:.8f}, ATR2: {bars.atr_length2[index]:.8f}", "blue")
             
             # จัดการ Position ที่มีอยู่
             if self.state.is_in_position:
@@ -512,7 +431,7 @@ class BacktestEngine:
                 
                 # 1. ตรวจสอบ Margin Call
                 if self.state.check_margin_call(current_price):
-                    message(self.symbol, f"Margin Call at price {current_price:.8f}!", "red")
+                    self._log(f"Margin Call at price {current_price:.8f}!", "red")
                     exit_price = backtest_config.calculate_execution_price(
                         current_price, 
                         'sell' if position_side == 'buy' else 'buy', 
@@ -530,14 +449,14 @@ class BacktestEngine:
                 # 2. ปรับ Stoploss ตามชุด 3 แท่งเทียน
                 if index >= 3:  # ต้องมีแท่งเทียนพอ
                     old_stoploss = self.state.current_stoploss
-                    await self._adjust_stoploss_for_new_candle(df, index)
+                    await self._adjust_stoploss_for_new_candle(bars, index)
                     if old_stoploss != self.state.current_stoploss:
-                        message(self.symbol, f"Stoploss adjusted from {old_stoploss:.8f} to {self.state.current_stoploss:.8f}", "cyan")
+                        self._log(f"Stoploss adjusted from {old_stoploss:.8f} to {self.state.current_stoploss:.8f}", "cyan")
                 
                 # 3. ตรวจสอบ Stoploss Hit
                 if self.state.current_stoploss:
                     if position_side == 'buy' and current_candle['low'] <= self.state.current_stoploss:
-                        message(self.symbol, f"Stoploss Hit at {self.state.current_stoploss:.8f}", "yellow")
+                        self._log(f"Stoploss Hit at {self.state.current_stoploss:.8f}", "yellow")
                         exit_price = backtest_config.calculate_execution_price(
                             self.state.current_stoploss, 'sell', 'MARKET')
                         fee = backtest_config.calculate_fee(position_size, exit_price, False)
@@ -549,7 +468,7 @@ class BacktestEngine:
                         self.current_balance -= fee
                         return
                     elif position_side == 'sell' and current_candle['high'] >= self.state.current_stoploss:
-                        message(self.symbol, f"Stoploss Hit at {self.state.current_stoploss:.8f}", "yellow")
+                        self._log(f"Stoploss Hit at {self.state.current_stoploss:.8f}", "yellow")
                         exit_price = backtest_config.calculate_execution_price(
                             self.state.current_stoploss, 'buy', 'MARKET')
                         fee = backtest_config.calculate_fee(position_size, exit_price, False)
@@ -564,14 +483,14 @@ class BacktestEngine:
                 # 4. ตรวจสอบและปรับ TP Orders
                 if not self.state.is_swapping:
                     # ปรับ TP หลังผ่าน 2 แท่ง
-                    await self._adjust_tp_orders(df, index)
+                    await self._adjust_tp_orders(bars, index)
                     
                     # ตรวจสอบ TP Hit
                     for level in self.config['take_profits']['levels']:
                         if not self.state.position.tp_levels_hit.get(level['id'], False):
                             tp_price = self._calculate_tp_price(entry_price, level, position_side)
                             if self._is_tp_hit(tp_price, position_side, current_candle):
-                                message(self.symbol, f"Take Profit {level['id']} Hit at {tp_price:.8f}", "green")
+                                self._log(f"Take Profit {level['id']} Hit at {tp_price:.8f}", "green")
                                 exit_price = backtest_config.calculate_execution_price(
                                     tp_price, 'sell' if position_side == 'buy' else 'buy', 'LIMIT')
                                 fee = backtest_config.calculate_fee(position_size, exit_price, True)
@@ -591,40 +510,41 @@ class BacktestEngine:
                 if self.state.last_focus_price:
                     if position_side == 'buy':
                         if current_candle['high'] > self.state.last_focus_price * PRICE_INCREASE:
-                            message(self.symbol, f"Focus Price Break UP at {current_candle['high']:.8f}", "cyan")
+                            self._log(f"Focus Price Break UP at {current_candle['high']:.8f}", "cyan")
                             await self._simulate_focus_price_break('buy')
                     elif position_side == 'sell':
                         if current_candle['low'] < self.state.last_focus_price * PRICE_DECREASE:
-                            message(self.symbol, f"Focus Price Break DOWN at {current_candle['low']:.8f}", "cyan")
+                            self._log(f"Focus Price Break DOWN at {current_candle['low']:.8f}", "cyan")
                             await self._simulate_focus_price_break('sell')
                 
                 # 6. ตรวจสอบ Swap Position
                 if self.state.last_candle_cross and not self.state.is_swapping:
-                    should_swap = await self._should_swap_position(df, index)
+                    should_swap = await self._should_swap_position(bars, index)
                     if should_swap:
-                        message(self.symbol, f"Swapping Position from {position_side}", "magenta")
+                        self._log(f"Swapping Position from {position_side}", "magenta")
                         await self._simulate_position_swap(current_candle)
             
             # ตรวจสอบสัญญาณเข้าใหม่
             else:
-                signal = self._check_entry_signal(df, index)
+                signal = self._check_entry_signal(bars, index)
                 if signal:
-                    message(self.symbol, f"Entry Signal: {signal['type']} (RSI: {df['rsi'].iloc[index]:.2f})", "yellow")
-                    await self._simulate_entry(signal, current_candle)
-                    
-                    # Log entry details
-                    message(self.symbol, f"Entry Price: {self.state.position.entry_price:.8f}", "yellow")
-                    message(self.symbol, f"Position Size: {self.state.position.position_size:.8f}", "yellow")
-                    message(self.symbol, f"Stoploss: {self.state.current_stoploss:.8f}", "yellow")
+                    self._log(f"Entry Signal: {signal['type']} (RSI: {bars.rsi[index]:.2f})", "yellow")
+                    await self._simulate_entry(signal, current_candle, index)
                     
-                    # Log take profit levels
-                    for level in self.config['take_profits']['levels']:
-                        tp_price = self._calculate_tp_price(
-                            self.state.position.entry_price,
-                            level,
-                            self.state.position.position_side
-                        )
-                        message(self.symbol, f"TP {level['id']}: {tp_price:.8f}", "yellow")
+                    if self.verbose:
+                        # Log entry details
+                        self._log(f"Entry Price: {self.state.position.entry_price:.8f}", "yellow")
+                        self._log(f"Position Size: {self.state.position.position_size:.8f}", "yellow")
+                        self._log(f"Stoploss: {self.state.current_stoploss:.8f}", "yellow")
+                        
+                        # Log take profit levels
+                        for level in self.config['take_profits']['levels']:
+                            tp_price = self._calculate_tp_price(
+                                self.state.position.entry_price,
+                                level,
+                                self.state.position.position_side
+                            )
+                            self._log(f"TP {level['id']}: {tp_price:.8f}", "yellow")
 
         except Exception as e:
             import traceback
@@ -632,13 +552,14 @@ class BacktestEngine:
             message(self.symbol, f"Backtest Error: {str(e)}", "red")
             message(self.symbol, f"Error Traceback: {error_traceback}", "red")
 
-    def _check_entry_signal(self, df: pd.DataFrame, index: int) -> Optional[dict]:
+    def _check_entry_signal(self, bars: BacktestBars, index: int) -> Optional[dict]:
         """ตรวจสอบสัญญาณเข้า"""
         if index < 2:
             return None
                 
-        current_rsi = df['rsi'].iloc[index]
-        prev_rsi = df['rsi'].iloc[index-1]
+        # RSI สองค่าจากหน้าต่างเดียวกัน เหมือน get_rsi_cross_last_candle
+        current_rsi = bars.rsi[index]
+        prev_rsi = bars.rsi_prev[index]
         
         # เพิ่ม logging เพื่อ debug
         #message(self.symbol, f"RSI Values - Current: {current_rsi:.2f}, Previous: {prev_rsi:.2f}", "blue")
@@ -662,7 +583,7 @@ class BacktestEngine:
         
         return result if result['status'] else None
 
-    async def _simulate_entry(self, signal: dict, candle: dict):
+    async def _simulate_entry(self, signal: dict, candle: dict, index: int):
         """จำลองการเข้า Position"""
         if signal['type'] == 'crossover':
             entry_price = float(candle['high']) * PRICE_INCREASE
@@ -697,8 +618,8 @@ class BacktestEngine:
         self.state.position.position_size = position_size
         self.state.current_stoploss = stoploss_price
         self.state.entry_candle = candle.copy()
-        # เก็บ timestamp แทนการใช้ index
-        self.state.entry_candle_index = candle['timestamp']
+        # เก็บ index ของแท่ง entry ไว้นับจำนวนแท่งที่ผ่านไปโดยไม่ต้องวนหาใหม่
+        self.state.entry_candle_index = index
 
     async def _simulate_position_close(self, exit_price: float, reason: str, timestamp: int):
         """จำลองการปิด Position"""
@@ -846,48 +767,112 @@ class BacktestEngine:
             self.metrics['risk_reward_ratio'] = abs(self.metrics['avg_win'] / self.metrics['avg_loss'])
             
         # Maximum Drawdown
-        equity_curve = pd.DataFrame(self.equity_curve)
-        rolling_max = equity_curve['equity'].expanding().max()
-        drawdown = (equity_curve['equity'] - rolling_max) / rolling_max * 100
+        equity = self.equity_curve['equity'].to_numpy()
+        rolling_max = np.maximum.accumulate(equity)
+        drawdown = (equity - rolling_max) / rolling_max * 100
         self.metrics['max_drawdown'] = abs(drawdown.min())
 
+    def _build_report_data(self) -> dict:
+        """ข้อมูลสำหรับวาดกราฟ (ลดจำนวนจุดของเส้นราคา/equity/drawdown ให้ไม่เกิน BACKTEST_REPORT_MAX_POINTS)"""
+        candles = np.asarray(self.historical_data, dtype=float).reshape(-1, 6)
+        price_time = candles[:, 0].astype('datetime64[ms]')
+        price = candles[:, 4]
+        equity_time = self.equity_curve['timestamp'].to_numpy(dtype='datetime64[ms]')
+        equity = self.equity_curve['equity'].to_numpy()
+        rolling_max = np.maximum.accumulate(equity)
+        drawdown = (equity - rolling_max) / rolling_max * 100
+
+        price_index = _downsample_index(price, BACKTEST_REPORT_MAX_POINTS)
+        equity_index = _downsample_index(equity, BACKTEST_REPORT_MAX_POINTS)
+        drawdown_index = _downsample_index(drawdown, BACKTEST_REPORT_MAX_POINTS)
+        return {
+            'symbol': self.symbol,
+            'price_time': price_time[price_index],
+            'price': price[price_index],
+            'equity_time': equity_time[equity_index],
+            'equity': equity[equity_index],
+            'drawdown_time': equity_time[drawdown_index],
+            'drawdown': drawdown[drawdown_index],
+            'trades': [
+                (trade.side, np.datetime64(trade.entry_time, 'ms'), trade.entry_price,
+                 np.datetime64(trade.exit_time, 'ms'), trade.exit_price)
+                for trade in self.trades
+            ]
+        }
+
     def plot_results(self):
-        """สร้างกราฟแสดงผลการ backtest"""
-        # สร้าง subplot
-        fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(15, 12))
-        
-        # 1. กราฟราคาและจุดเทรด
-        df = pd.DataFrame(self.historical_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        
-        ax1.plot(df['timestamp'], df['close'], label='Price')
-        
-        # พล็อตจุด Entry/Exit
-        for trade in self.trades:
-            if trade.side == 'buy':
-                ax1.scatter(trade.entry_time, trade.entry_price, color='g', marker='^', s=100)
-                ax1.scatter(trade.exit_time, trade.exit_price, color='r', marker='v', s=100)
-            else:
-                ax1.scatter(trade.entry_time, trade.entry_price, color='r', marker='v', s=100)
-                ax1.scatter(trade.exit_time, trade.exit_price, color='g', marker='^', s=100)
-        
-        ax1.set_title('Price Chart with Entry/Exit Points')
-        ax1.legend()
-        
-        # 2. Equity Curve
-        equity_df = pd.DataFrame(self.equity_curve)
-        ax2.plot(equity_df['timestamp'], equity_df['equity'])
-        ax2.set_title('Equity Curve')
-        
-        # 3. Drawdown
-        rolling_max = equity_df['equity'].expanding().max()
-        drawdown = (equity_df['equity'] - rolling_max) / rolling_max * 100
-        ax3.fill_between(equity_df['timestamp'], drawdown, 0, color='red', alpha=0.3)
-        ax3.set_title('Drawdown')
-        
-        plt.tight_layout()
+        """สร้างกราฟแสดงผลการ backtest (แสดงบนหน้าจอ)"""
+        import matplotlib.pyplot as plt  # ต้องมีหน้าจอ โหลดเฉพาะตอนไม่ใช้ BACKTEST_HEADLESS_REPORT
+        fig = plt.figure(figsize=(15, 12))
+        _draw_report(fig, self._build_report_data())
         plt.show()
 
+    async def get_report_key(self) -> str:
+        """key ของรายงานจากข้อมูลที่ใช้รัน (แท่งเทียน, config ของเหรียญ, ค่าคงที่ของระบบเทรด และโค้ดของ backtest)
+
+        คำนวณได้ก่อนรัน backtest จึงข้ามได้ทั้งการรันและการวาดกราฟถ้าตรงกับรอบก่อน
+        """
+        if not len(self.historical_data):
+            await self.load_historical_data()
+        with open(os.path.abspath(__file__), 'rb') as f:
+            source = f.read()
+        inputs = (
+            self.symbol, self.start_date, self.end_date, self.initial_balance,
+            json.dumps(self.config, sort_keys=True, default=str),
+            vars(self.backtest_config),
+            (PRICE_INCREASE, PRICE_DECREASE, PRICE_CHANGE_MAXPERCENT, PRICE_CHANGE_THRESHOLD, MIN_NOTIONAL),
+            source
+        )
+        digest = hashlib.sha256(pickle.dumps(inputs))
+        digest.update(np.ascontiguousarray(self.historical_data, dtype=float).tobytes())
+        return digest.hexdigest()
+
+    def _report_basename(self, directory: str) -> str:
+        return os.path.join(directory, f"{self.symbol}_{self.config['timeframe']}_{self.start_date.date()}_{self.end_date.date()}")
+
+    def _read_cached_report(self, basename: str, report_key: str) -> Optional[dict]:
+        """รายงานของรอบก่อน ({'key', 'report', 'metrics', 'trades'}) ถ้ามีไฟล์ครบและ key ตรงกัน"""
+        paths = [basename + extension for extension in ('.png', '.txt', '.json')]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        try:
+            with open(basename + '.json', 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('key') != report_key:
+            return None
+        with open(basename + '.txt', 'r', encoding='utf-8') as f:
+            cached['report'] = f.read()
+        return cached
+
+    async def load_cached_report(self, directory: str = BACKTEST_REPORTS_DIR) -> Optional[dict]:
+        """รายงานเดิมถ้าแท่งเทียนและพารามิเตอร์ไม่เปลี่ยนตั้งแต่รอบก่อน (เรียกก่อน run_backtest)"""
+        return self._read_cached_report(self._report_basename(directory), await self.get_report_key())
+
+    async def save_report(self, directory: str = BACKTEST_REPORTS_DIR) -> str:
+        """บันทึกกราฟเป็นไฟล์ PNG (Agg) และรายงานเป็นไฟล์ .txt ไม่ต้องมีหน้าจอ
+
+        วาดใน process แยก และข้ามการวาดใหม่ถ้า key ของข้อมูลที่ใช้รันเหมือนรอบก่อน คืน path ของไฟล์กราฟ
+        """
+        report_key = await self.get_report_key()
+        os.makedirs(directory, exist_ok=True)
+        basename = self._report_basename(directory)
+        image_path = basename + '.png'
+        if self._read_cached_report(basename, report_key) is not None:
+            self._log(f"ผล backtest ไม่เปลี่ยน ใช้กราฟเดิม {image_path}", "blue")
+            return image_path
+
+        with open(basename + '.txt', 'w', encoding='utf-8') as f:
+            f.write(self.generate_report())
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(get_report_executor(), _render_report, self._build_report_data(), image_path)
+        # เขียน key เป็นไฟล์สุดท้าย ถ้าหยุดกลางคันรอบหน้าจะรันใหม่
+        with open(basename + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'key': report_key, 'metrics': self.metrics, 'trades': len(self.trades)}, f, default=float)
+        self._log(f"บันทึกกราฟ backtest ที่ {image_path}", "blue")
+        return image_path
+
     def generate_report(self) -> str:
         """สร้างรายงานผลการ backtest"""
         report = [
@@ -943,12 +928,27 @@ async def run_backtest_analysis():
             initial_balance=1000
         )
         
+        # แท่งเทียนและพารามิเตอร์เหมือนรอบก่อน ใช้รายงานเดิมโดยไม่ต้องรัน backtest และวาดกราฟใหม่
+        cached = await engine.load_cached_report() if BACKTEST_HEADLESS_REPORT else None
+        if cached is not None:
+            print(cached['report'])
+            message("SYSTEM", f"ข้อมูลและพารามิเตอร์ของ {symbol} ไม่เปลี่ยน ใช้รายงานเดิม", "blue")
+            results.append({
+                'symbol': symbol,
+                'metrics': cached['metrics'],
+                'trades': cached['trades']
+            })
+            continue
+
         await engine.run_backtest()
         
         # สร้างรายงานและกราฟ
         report = engine.generate_report()
         print(report)
-        engine.plot_results()
+        if BACKTEST_HEADLESS_REPORT:
+            await engine.save_report()
+        else:
+            engine.plot_results()
         
         results.append({
             'symbol': symbol,
@@ -958,8 +958,155 @@ async def run_backtest_analysis():
         
         message("SYSTEM", f"เสร็จสิ้น Backtest {symbol}", "green")
     
+    await close_exchange_pool()
+    shutdown_report_executor()
     return results
 
+
+def _downsample_index(values: np.ndarray, max_points: int) -> np.ndarray:
+    """เลือก index ที่ใช้วาดกราฟ: แบ่งเป็นช่วงแล้วเก็บจุดต่ำสุด/สูงสุดของแต่ละช่วง (ยอด drawdown ไม่หาย)"""
+    num_points = len(values)
+    if num_points <= max_points:
+        return np.arange(num_points)
+    bucket_size = -(-num_points // (max_points // 2))
+    selected = [0, num_points - 1]
+    for start in range(0, num_points, bucket_size):
+        bucket = values[start:start + bucket_size]
+        selected.append(start + int(np.nanargmin(bucket)) if not np.all(np.isnan(bucket)) else start)
+        selected.append(start + int(np.nanargmax(bucket)) if not np.all(np.isnan(bucket)) else start)
+    return np.unique(selected)
+
+def _draw_report(fig, report_data: dict):
+    """วาดกราฟราคา+จุดเทรด, equity curve และ drawdown ลงบน figure"""
+    ax1, ax2, ax3 = fig.subplots(3, 1)
+
+    # 1. กราฟราคาและจุดเทรด
+    ax1.plot(report_data['price_time'], report_data['price'], label='Price')
+    # ลูกศรขึ้นสีเขียว = เข้า buy / ปิด sell, ลูกศรลงสีแดง = ปิด buy / เข้า sell
+    up = [(entry_time, entry_price) if side == 'buy' else (exit_time, exit_price)
+          for side, entry_time, entry_price, exit_time, exit_price in report_data['trades']]
+    down = [(exit_time, exit_price) if side == 'buy' else (entry_time, entry_price)
+            for side, entry_time, entry_price, exit_time, exit_price in report_data['trades']]
+    if up:
+        ax1.scatter([t for t, _ in up], [p for _, p in up], color='g', marker='^', s=100)
+        ax1.scatter([t for t, _ in down], [p for _, p in down], color='r', marker='v', s=100)
+    ax1.set_title('Price Chart with Entry/Exit Points')
+    ax1.legend()
+
+    # 2. Equity Curve
+    ax2.plot(report_data['equity_time'], report_data['equity'])
+    ax2.set_title('Equity Curve')
+
+    # 3. Drawdown
+    ax3.fill_between(report_data['drawdown_time'], report_data['drawdown'], 0, color='red', alpha=0.3)
+    ax3.set_title('Drawdown')
+
+    fig.tight_layout()
+
+def _render_report(report_data: dict, filepath: str):
+    """วาดกราฟลงไฟล์ด้วย Agg (ไม่ใช้ pyplot ทำงานได้บน server ที่ไม่มีหน้าจอ)"""
+    fig = Figure(figsize=(15, 12))
+    FigureCanvasAgg(fig)
+    _draw_report(fig, report_data)
+    fig.savefig(filepath, dpi=100)
+
+_report_executor: Optional[ProcessPoolExecutor] = None
+
+def get_report_executor() -> ProcessPoolExecutor:
+    """process แยกสำหรับวาดกราฟ ไม่ให้การวาดบล็อก event loop"""
+    global _report_executor
+    if _report_executor is None:
+        _report_executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+    return _report_executor
+
+def shutdown_report_executor():
+    global _report_executor
+    if _report_executor is not None:
+        _report_executor.shutdown()
+        _report_executor = None
+
+def _apply_params(config: dict, params: dict) -> dict:
+    """สร้าง config ใหม่ที่แทนค่าตาม params (key แบบ 'a.b' หมายถึง config['a']['b'])"""
+    config = copy.deepcopy(config)
+    for path, value in params.items():
+        *parents, key = path.split('.')
+        target = config
+        for parent in parents:
+            target = target[parent]
+        target[key] = copy.deepcopy(value)
+    return config
+
+def _run_sweep_job(job: dict) -> dict:
+    """รัน backtest หนึ่งชุดใน process ลูก (อ่านแท่งเทียนจาก OHLCV cache แบบ offline)"""
+    result = {'symbol': job['symbol']}
+    result.update({path: value if isinstance(value, (int, float, str)) else json.dumps(value)
+                   for path, value in job['params'].items()})
+    try:
+        engine = BacktestEngine(
+            symbol=job['symbol'],
+            start_date=job['start_date'],
+            end_date=job['end_date'],
+            config=job['config'],
+            initial_balance=job['initial_balance'],
+            verbose=False,
+            offline=True
+        )
+        asyncio.run(engine.run_backtest())
+        result.update(engine.metrics)
+        result['final_balance'] = engine.current_balance
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+async def run_backtest_sweep(grid: dict = BACKTEST_SWEEP_GRID, start_date: str = "2023-01-01", end_date: str = "2024-11-09",
+                             initial_balance: float = 1000, max_workers: Optional[int] = BACKTEST_MAX_WORKERS,
+                             offline: bool = BACKTEST_OFFLINE) -> pd.DataFrame:
+    """รัน backtest ทุกเหรียญใน TRADING_CONFIG x ทุก combination ของ grid แบบขนานหลาย process
+
+    โหลดแท่งเทียนลง OHLCV cache ครั้งเดียวต่อเหรียญก่อน แล้วทุก process อ่านไฟล์เดียวกัน
+    ผ่าน memory map (ใช้ page cache ร่วมกัน ไม่ต้อง copy ข้อมูลส่งให้แต่ละ process)
+    """
+    paths = list(grid.keys())
+    combinations = [dict(zip(paths, values)) for values in itertools.product(*grid.values())]
+    jobs = [
+        {
+            'symbol': config['symbol'],
+            'params': params,
+            'config': _apply_params(config, params),
+            'start_date': start_date,
+            'end_date': end_date,
+            'initial_balance': initial_balance
+        }
+        for config in TRADING_CONFIG
+        for params in combinations
+    ]
+
+    # เติม cache ให้ครบทุกเหรียญ/timeframe ก่อนแยก process
+    loaded = set()
+    for job in jobs:
+        key = (job['symbol'], job['config']['timeframe'])
+        if key in loaded:
+            continue
+        loaded.add(key)
+        engine = BacktestEngine(job['symbol'], start_date, end_date, job['config'], offline=offline)
+        await engine.load_historical_data()
+    await close_exchange_pool()
+
+    message("SYSTEM", f"เริ่ม Backtest {len(jobs)} ชุด ({len(TRADING_CONFIG)} เหรียญ x {len(combinations)} พารามิเตอร์)", "blue")
+    loop = asyncio.get_running_loop()
+    # ใช้ spawn ทุก OS ไม่ให้ process ลูก fork ตอน thread เขียน log ถือ lock อยู่
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        results = await asyncio.gather(*[loop.run_in_executor(pool, _run_sweep_job, job) for job in jobs])
+
+    results_df = pd.DataFrame(results)
+    if 'total_profit' in results_df:
+        results_df = results_df.sort_values('total_profit', ascending=False, ignore_index=True)
+    os.makedirs(BACKTEST_RESULTS_DIR, exist_ok=True)
+    filepath = os.path.join(BACKTEST_RESULTS_DIR, f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    results_df.to_csv(filepath, index=False)
+    message("SYSTEM", f"บันทึกผล Backtest {len(results_df)} ชุดที่ {filepath}", "green")
+    return results_df
+
 class BacktestConfig:
     def __init__(self):
         self.maker_fee = 0.0002  # 0.02%
@@ -980,5 +1127,10 @@ class BacktestConfig:
 
 if __name__ == "__main__":
     loop = asyncio.get_event_loop()
-    results = loop.run_until_complete(run_backtest_analysis())
+    if len(sys.argv) > 1 and sys.argv[1] == 'sweep':
+        # python backtest.py sweep
+        results = loop.run_until_complete(run_backtest_sweep())
+        print(results.head(20).to_string())
+    else:
+        results = loop.run_until_complete(run_backtest_analysis())
     loop.close()
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""วัดเวลาและ request ต่อรอบของ run_sequential_bot ในสถานการณ์ entry, TP, SL และ swap
+
+แต่ละสถานการณ์ป้อนแท่งเทียนที่กำหนดไว้ให้ SimulatedExchange ผ่าน ReplayEngine แล้วรัน
+run_sequential_bot หนึ่งรอบต่อหนึ่ง tick ของราคา วัด p50/p99 ของเวลาต่อรอบ, request ต่อรอบ
+และค่ากลางของ memory ที่จองเพิ่มต่อรอบ (tracemalloc รันแยกอีกรอบเพื่อไม่ให้กระทบเวลา)
+
+ผลจะเทียบกับ benchmark/cycle_baseline.json ถ้าแย่ลงเกินค่าที่ยอมรับจะจบด้วย exit code 1
+request ต่อรอบและ memory ต่อรอบไม่ขึ้นกับเครื่องจึงตรวจเข้ม ส่วนเวลาตรวจเฉพาะ p50 (p99 ของรอบไม่กี่สิบรอบ
+คือค่าสูงสุด แกว่งเกินกว่าจะใช้ตัดสิน จึงแสดงไว้ดูเท่านั้น)
+
+baseline เป็นเวลาจริงของเครื่องที่สร้าง ถ้าย้ายเครื่อง (หรือ CI) ให้สร้างใหม่บนเครื่องนั้นก่อนด้วย
+--save-baseline จากโค้ดที่ยังไม่ได้แก้ แล้วค่อยเทียบการเปลี่ยนแปลง
+
+การตรวจ regression เดียวกันรันพร้อม test อื่นได้ด้วย python -m pytest tests (tests/test_cycle_benchmark.py)
+
+รัน: python -m benchmark.benchmark_cycle [--save-baseline] [--repeat N]
+"""
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from config import DEFAULT_CONFIG, api_key, api_secret
+from function.binance.futures.system import trade_journal
+from function.binance.futures.system.ohlcv_cache import get_timeframe_ms
+from replay import REPLAY_WARMUP_CANDLES, ReplayEngine, candles_to_events
+
+BENCHMARK_SYMBOL = 'ADAUSDT'
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cycle_baseline.json')
+LATENCY_TOLERANCE = 0.5  # ยอมให้ p50 ช้ากว่า baseline ได้ 50% (เวลาแกว่งตามเครื่อง)
+LATENCY_MIN_DELTA_MS = 1.0  # และต้องช้ากว่าเกินกี่ ms ถึงนับเป็น regression (รอบที่เร็วมากแกว่งเป็นสัดส่วนสูง)
+MEMORY_TOLERANCE = 0.25  # ยอมให้ memory ต่อรอบมากกว่า baseline ได้ 25%
+REQUEST_TOLERANCE = 0.05  # request ต่อรอบเป็นค่าคงที่ (ข้อมูลชุดเดิม) ยอมให้ต่างได้เล็กน้อย
+MEMORY_REPEAT = 3  # จำนวนครั้งที่วัด memory ใช้ค่าต่ำสุด (บางครั้งการจองของส่วนอื่นตกในช่วงที่วัดทำให้สูงเกินจริง)
+
+# ราคาปิดเทียบแท่งก่อนหน้าของแต่ละแท่งหลัง warmup
+# ขาลงแรงทำให้ RSI ตัดลงต่ำกว่า oversold -> ตั้ง sell STOP_MARKET และแท่งถัดไปลงต่อจน entry ทำงาน
+_SELL_OFF = [-0.02] * 3
+SCENARIOS = {
+    'idle': [0.001, -0.001] * 6,
+    'entry': _SELL_OFF + [0.001, -0.001] * 3,
+    'take_profit': _SELL_OFF + [-0.02, -0.02, -0.025],
+    'stoploss': _SELL_OFF + [0.03, 0.03, 0.01],
+    'swap': _SELL_OFF + [-0.01, 0.01, 0.005, 0.015, 0.01, 0.008, 0.001],
+}
+
+def make_candles(changes: list, start_time: int, timeframe_ms: int, start_price: float = 1.0, seed: int = 7) -> np.ndarray:
+    """แท่งเทียนจาก % เปลี่ยนแปลงของราคาปิด (ไส้เทียนสุ่มเล็กน้อยแต่คงที่ด้วย seed)"""
+    rng = np.random.default_rng(seed)
+    candles = []
+    price = start_price
+    for index, change in enumerate(changes):
+        open_price = price
+        price = open_price * (1 + change)
+        wick = rng.uniform(0.001, 0.004)
+        candles.append([start_time + index * timeframe_ms, open_price, max(open_price, price) * (1 + wick),
+                        min(open_price, price) * (1 - wick), price, 1000.0])
+    return np.array(candles)
+
+def make_warmup(timeframe_ms: int, start_time: int) -> np.ndarray:
+    """ประวัติก่อนสถานการณ์: ขึ้นลงสลับกันรอบราคาเดิม RSI อยู่ที่ 50 ไม่มีสัญญาณค้าง"""
+    changes = [0.004, -0.004] * (REPLAY_WARMUP_CANDLES // 2)
+    return make_candles(changes, start_time - REPLAY_WARMUP_CANDLES * timeframe_ms, timeframe_ms, seed=42)
+
+def check_outcome(name: str, engine: ReplayEngine) -> bool:
+    """ตรวจว่าสถานการณ์ไปถึงเหตุการณ์ที่ต้องการจริง (ถ้าไม่ถึง ตัวเลขที่วัดได้ไม่มีความหมาย)"""
+    market_id = BENCHMARK_SYMBOL
+    fills = engine.exchange.trades.get(market_id, [])
+    fill_types = {fill['type'] for fill in fills}
+    reasons = [trade['reason'] for trade in trade_journal.get_trade_journal().get_trades(BENCHMARK_SYMBOL)]
+    if name == 'idle':
+        return not fills
+    if name == 'entry':
+        return market_id in engine.exchange.positions and engine.states[BENCHMARK_SYMBOL].is_in_position
+    if name == 'take_profit':
+        return 'take_profit_market' in fill_types
+    if name == 'stoploss':
+        return any(fill['type'] == 'stop_market' and float(fill['info']['realizedPnl']) < 0 for fill in fills)
+    if name == 'swap':
+        return any('Swapped' in reason for reason in reasons)
+    return False
+
+async def run_scenario(name: str, trace_memory: bool = False) -> dict:
+    """รันสถานการณ์หนึ่งรอบ รัน run_sequential_bot ทุก tick ของราคา"""
+    timeframe = DEFAULT_CONFIG['timeframe']
+    timeframe_ms = get_timeframe_ms(timeframe)
+    start_time = 1_700_006_400_000
+    history = make_warmup(timeframe_ms, start_time)
+    candles = make_candles(SCENARIOS[name], start_time, timeframe_ms, start_price=history[-1, 4])
+
+    engine = ReplayEngine([BENCHMARK_SYMBOL])
+    latencies, requests, allocations = [], [], []
+    try:
+        await engine.setup({BENCHMARK_SYMBOL: history})
+        state = engine.states[BENCHMARK_SYMBOL]
+        exchange = engine.exchange
+
+        # รอบแรกมีการคำนวณ indicator ตั้งต้น ไม่นับรวม
+        await main.run_sequential_bot(api_key, api_secret, BENCHMARK_SYMBOL, state)
+
+        # ปิด gc ระหว่างวัดแบบเดียวกับ timeit ไม่ให้เวลาเก็บขยะไปตกที่รอบใดรอบหนึ่ง
+        gc.collect()
+        gc.disable()
+        if trace_memory:
+            tracemalloc.start()
+        for event in candles_to_events(BENCHMARK_SYMBOL, timeframe, candles):
+            exchange.apply_stream_event(event['data'])
+            await engine.stream_manager.publish(event)
+            if event['data']['e'] != 'kline':
+                continue
+
+            request_count = sum(exchange.request_counts.values())
+            if trace_memory:
+                tracemalloc.reset_peak()
+                memory_before = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            await main.run_sequential_bot(api_key, api_secret, BENCHMARK_SYMBOL, state)
+            latencies.append(time.perf_counter() - started)
+            requests.append(sum(exchange.request_counts.values()) - request_count)
+            if trace_memory:
+                allocations.append(tracemalloc.get_traced_memory()[1] - memory_before)
+        if trace_memory:
+            tracemalloc.stop()
+        gc.enable()
+
+        reached = check_outcome(name, engine)
+    finally:
+        gc.enable()
+        await engine.close()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'cycles': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'requests_per_cycle': float(np.mean(requests)),
+        'max_requests': int(max(requests)),
+        'peak_kb_per_cycle': float(np.median(allocations)) / 1024 if allocations else None,
+        'reached': reached
+    }
+
+async def run_repeated(name: str, repeat: int) -> dict:
+    """รันสถานการณ์ repeat ครั้ง (จับเวลา) และอีก MEMORY_REPEAT ครั้งที่วัด memory"""
+    runs = [await run_scenario(name) for _ in range(repeat)]
+    memory_runs = [await run_scenario(name, trace_memory=True) for _ in range(MEMORY_REPEAT)]
+    # ใช้ค่ากลางของแต่ละครั้ง ลดผลของเครื่องที่ไม่ว่าง
+    return {
+        'cycles': runs[0]['cycles'],
+        'p50_ms': float(np.median([run['p50_ms'] for run in runs])),
+        'p99_ms': float(np.median([run['p99_ms'] for run in runs])),
+        'requests_per_cycle': runs[0]['requests_per_cycle'],
+        'max_requests': runs[0]['max_requests'],
+        'peak_kb_per_cycle': min(run['peak_kb_per_cycle'] for run in memory_runs),
+        'reached': all(run['reached'] for run in runs)
+    }
+
+async def run_all(repeat: int) -> dict:
+    return {name: await run_repeated(name, repeat) for name in SCENARIOS}
+
+def load_baseline() -> dict:
+    """baseline ที่บันทึกไว้ ({} ถ้ายังไม่มี)"""
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, 'r') as f:
+        return json.load(f)
+
+def find_regressions(results: dict, baseline: dict) -> list:
+    """เทียบกับ baseline คืนรายการที่แย่ลงเกินค่าที่ยอมรับ"""
+    regressions = []
+    for name, result in results.items():
+        if not result['reached']:
+            regressions.append(f"{name}: สถานการณ์ไม่ถึงเหตุการณ์ที่ต้องการ")
+        base = baseline.get(name)
+        if not base:
+            continue
+        limits = [
+            ('p50_ms', LATENCY_TOLERANCE, LATENCY_MIN_DELTA_MS),
+            ('requests_per_cycle', REQUEST_TOLERANCE, 0),
+            ('peak_kb_per_cycle', MEMORY_TOLERANCE, 0)
+        ]
+        for key, tolerance, min_delta in limits:
+            if result[key] is None or not base.get(key):
+                continue
+            if result[key] > base[key] * (1 + tolerance) and result[key] - base[key] > min_delta:
+                regressions.append(f"{name}: {key} {result[key]:.2f} > baseline {base[key]:.2f} (+{tolerance:.0%})")
+    return regressions
+
+def main_benchmark():
+    save_baseline = '--save-baseline' in sys.argv
+    repeat = int(sys.argv[sys.argv.index('--repeat') + 1]) if '--repeat' in sys.argv else 5
+
+    # ข้อความของบอทไม่เกี่ยวกับผลการวัด จึงปิด stdout ระหว่างรัน
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = asyncio.run(run_all(repeat))
+
+    print(f"{'สถานการณ์':<12} {'รอบ':>5} {'p50 ms':>8} {'p99 ms':>8} {'req/รอบ':>8} {'req สูงสุด':>10} {'KB/รอบ':>8}  ผล")
+    for name, result in results.items():
+        print(f"{name:<12} {result['cycles']:>5} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['requests_per_cycle']:>8.2f} {result['max_requests']:>10} {result['peak_kb_per_cycle']:>8.1f}  "
+              f"{'ok' if result['reached'] else 'ไม่ถึง'}")
+
+    if save_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"บันทึก baseline ที่ {BASELINE_FILE}")
+        return
+
+    baseline = load_baseline()
+    if not baseline:
+        print("ยังไม่มี baseline (รันด้วย --save-baseline เพื่อสร้าง)")
+        return
+
+    regressions = find_regressions(results, baseline)
+    if regressions:
+        print("พบ regression:")
+        for regression in regressions:
+            print(f"- {regression}")
+        sys.exit(1)
+    print("ไม่พบ regression เทียบกับ baseline")
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,121 @@
+"""วัดจำนวนข้อความ websocket ต่อวินาที (1 core) ตั้งแต่ข้อความดิบจนถึง handler ของ price/kline tracker
+
+เทียบทางเดิม (json.loads ทั้งข้อความ + แปลง t/T เป็น datetime เวลาไทย) กับ StreamDecoder ของแต่ละ
+backend ที่ติดตั้งอยู่ ข้อความผสม aggTrade, kline และ stream ที่ไม่มี handler (markPrice) ซึ่งทางใหม่ข้ามได้
+โดยไม่ต้อง parse
+
+รัน: python -m benchmark.benchmark_decode [จำนวนข้อความ]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from function.binance.futures.order.other.get_future_market_price import BinancePriceTracker
+from function.binance.futures.order.other.get_kline_data import BinanceKlineTracker
+from function.binance.futures.system import stream_decoder
+from function.binance.futures.system.stream_manager import BinanceStreamManager
+
+SYMBOLS = ['ADAUSDT', 'BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'XRPUSDT']
+# สัดส่วนข้อความโดยประมาณของเหรียญที่ซื้อขายมาก (aggTrade มากกว่า kline หลายเท่า)
+MESSAGE_MIX = (('aggTrade', 0.8), ('kline', 0.15), ('markPrice', 0.05))
+
+def make_messages(count: int, seed: int = 42) -> list:
+    """ข้อความ combined stream รูปแบบเดียวกับ Binance Futures"""
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in MESSAGE_MIX]
+    weights = [weight for _, weight in MESSAGE_MIX]
+    messages = []
+    now = 1_700_000_000_000
+    for index in range(count):
+        symbol = rng.choice(SYMBOLS)
+        kind = rng.choices(kinds, weights)[0]
+        event_time = now + index * 10
+        price = f"{rng.uniform(0.5, 1.5):.4f}"
+        if kind == 'aggTrade':
+            stream = f"{symbol.lower()}@aggTrade"
+            data = {"e": "aggTrade", "E": event_time, "a": index, "s": symbol, "p": price, "q": "120",
+                    "f": index, "l": index, "T": event_time, "m": rng.random() < 0.5}
+        elif kind == 'kline':
+            open_time = event_time - event_time % 60_000
+            stream = f"{symbol.lower()}@kline_1m"
+            data = {"e": "kline", "E": event_time, "s": symbol, "k": {
+                "t": open_time, "T": open_time + 59_999, "s": symbol, "i": "1m", "f": index, "L": index,
+                "o": price, "c": price, "h": price, "l": price, "v": "1000", "n": 10,
+                "x": False, "q": "1000", "V": "500", "Q": "500", "B": "0"}}
+        else:
+            stream = f"{symbol.lower()}@markPrice@1s"
+            data = {"e": "markPriceUpdate", "E": event_time, "s": symbol, "p": price, "i": price,
+                    "P": price, "r": "0.0001", "T": event_time}
+        messages.append(json.dumps({"stream": stream, "data": data}, separators=(',', ':')))
+    return messages
+
+def legacy_decode(raw_message: str) -> dict:
+    """การ decode แบบเดิม (เก็บไว้เพื่อวัดเวลาเท่านั้น)"""
+    message = json.loads(raw_message)
+    data = message.get('data', message)
+    if data.get('e') == 'kline':
+        local_tz = pytz.timezone('Asia/Bangkok')
+        kline_data = data['k']
+        kline_data['t'] = datetime.fromtimestamp(int(kline_data['t']) / 1000, tz=pytz.UTC).astimezone(local_tz).timestamp() * 1000
+        kline_data['T'] = datetime.fromtimestamp(int(kline_data['T']) / 1000, tz=pytz.UTC).astimezone(local_tz).timestamp() * 1000
+    return message
+
+def make_manager(backend: str) -> BinanceStreamManager:
+    """stream manager ที่ไม่เชื่อมต่อจริง พร้อม handler ของ price และ kline tracker"""
+    manager = BinanceStreamManager()
+    manager.decoder = stream_decoder.StreamDecoder(backend)
+    manager.add_handler('aggTrade', BinancePriceTracker()._handle_message)
+    manager.add_handler('kline', BinanceKlineTracker()._handle_message)
+    return manager
+
+async def run_legacy(messages: list) -> float:
+    manager = make_manager('json')
+    started = time.perf_counter()
+    for raw_message in messages:
+        await manager._handle_message(legacy_decode(raw_message))
+    return time.perf_counter() - started
+
+async def run_decoder(messages: list, backend: str) -> float:
+    manager = make_manager(backend)
+    started = time.perf_counter()
+    for raw_message in messages:
+        await manager._handle_raw_message(raw_message)
+    return time.perf_counter() - started
+
+def decode_only(messages: list, loads) -> float:
+    started = time.perf_counter()
+    for raw_message in messages:
+        loads(raw_message)
+    return time.perf_counter() - started
+
+def main_benchmark():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    messages = make_messages(count)
+    backends = list(stream_decoder._get_backends())
+
+    print(f"ข้อความ: {count:,} ({', '.join(f'{kind} {weight:.0%}' for kind, weight in MESSAGE_MIX)})")
+    print(f"backend ที่ติดตั้ง: {', '.join(backends)}")
+    print()
+    print(f"{'decode อย่างเดียว':<28} {'msg/s':>12}")
+    for backend in backends:
+        elapsed = decode_only(messages, stream_decoder.get_json_loads(backend))
+        print(f"{backend:<28} {count / elapsed:>12,.0f}")
+
+    print()
+    print(f"{'ข้อความดิบ -> tracker':<28} {'msg/s':>12} {'เร็วขึ้น':>9}")
+    legacy = asyncio.run(run_legacy(messages))
+    print(f"{'เดิม (json + datetime)':<28} {count / legacy:>12,.0f} {'1.00x':>9}")
+    for backend in backends:
+        elapsed = asyncio.run(run_decoder(messages, backend))
+        print(f"{'StreamDecoder ' + backend:<28} {count / elapsed:>12,.0f} {legacy / elapsed:>8.2f}x")
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,120 @@
+"""เปรียบเทียบเวลาคำนวณ indicators ของ backtest แบบเดิม (df.apply + loop) กับแบบ vectorized
+
+รัน: python -m benchmark.benchmark_indicators [จำนวนแท่ง]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from function.binance.futures.system.indicator_engine import (
+    RSI_WINDOW,
+    calculate_atr,
+    calculate_indicator_arrays,
+    calculate_rsi,
+    get_atr_window,
+)
+
+def make_candles(num_bars: int, seed: int = 42) -> pd.DataFrame:
+    """สร้างแท่งเทียนสุ่มแบบ random walk"""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, num_bars))
+    close = np.maximum(close, 1)
+    high = close + rng.random(num_bars)
+    low = np.maximum(close - rng.random(num_bars), 0.5)
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(np.arange(num_bars) * 900_000, unit='ms'),
+        'open': close,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': np.ones(num_bars)
+    })
+
+def legacy_calculate_indicators(df: pd.DataFrame, config: dict) -> pd.DataFrame:
+    """BacktestEngine._calculate_indicators แบบเดิม (เก็บไว้เพื่อวัดเวลาเท่านั้น)"""
+    rsi_config = config['rsi_period']
+
+    def atr(high, low, close, length):
+        tr = np.maximum(high - low, np.maximum(np.abs(high - close.shift(1)), np.abs(low - close.shift(1))))
+        return tr.ewm(alpha=1/length, adjust=False).mean()
+
+    df['atr_length1'] = atr(df['high'], df['low'], df['close'], rsi_config['atr']['length1'])
+    df['atr_length2'] = atr(df['high'], df['low'], df['close'], rsi_config['atr']['length2'])
+
+    def get_dynamic_rsi_period(row):
+        if pd.isna(row['atr_length1']) or pd.isna(row['atr_length2']):
+            return rsi_config['rsi_period_min']
+        atr_diff_percent = ((row['atr_length1'] - row['atr_length2']) / row['atr_length2']) * 100
+        if atr_diff_percent >= rsi_config['atr']['max_percent']:
+            return rsi_config['rsi_period_max']
+        if atr_diff_percent <= rsi_config['atr']['min_percent']:
+            return rsi_config['rsi_period_min']
+        period_range = rsi_config['rsi_period_max'] - rsi_config['rsi_period_min']
+        volatility_range = rsi_config['atr']['max_percent'] - rsi_config['atr']['min_percent']
+        period_step = (atr_diff_percent - rsi_config['atr']['min_percent']) / volatility_range
+        return int(round(rsi_config['rsi_period_min'] + (period_range * period_step)))
+
+    df['rsi_period'] = df.apply(get_dynamic_rsi_period, axis=1)
+
+    close_diff = df['close'].diff()
+    gains = close_diff.where(close_diff > 0, 0)
+    losses = -close_diff.where(close_diff < 0, 0)
+    period = df['rsi_period'].iloc[0]
+    avg_gain = gains.rolling(window=period).mean().iloc[period-1]
+    avg_loss = losses.rolling(window=period).mean().iloc[period-1]
+    rsi_values = []
+    for i in range(len(df)):
+        if i < period:
+            rsi_values.append(np.nan)
+            continue
+        avg_gain = ((avg_gain * (period - 1)) + gains.iloc[i]) / period
+        avg_loss = ((avg_loss * (period - 1)) + losses.iloc[i]) / period
+        rsi_values.append(100 if avg_loss == 0 else 100 - (100 / (1 + avg_gain / avg_loss)))
+    df['rsi'] = rsi_values
+    return df
+
+def check_parity(df: pd.DataFrame, indicators: dict, config: dict, samples: int = 200) -> tuple:
+    """เทียบกับสูตรที่ live ใช้ (calculate_atr / calculate_rsi ต่อหน้าต่าง) ที่แท่งสุ่ม"""
+    rsi_config = config['rsi_period']
+    window = get_atr_window(rsi_config)
+    ohlcv = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].to_numpy()
+    closes = df['close'].to_numpy()
+    rng = np.random.default_rng(0)
+    atr_error = 0.0
+    rsi_error = 0.0
+    for t in rng.integers(window, len(df), samples):
+        atr_long = calculate_atr(ohlcv[t - window + 1:t + 1], rsi_config['atr']['length2'])
+        atr_error = max(atr_error, abs(atr_long - indicators['atr_length2'][t]) / atr_long)
+        rsi = calculate_rsi(closes[t - RSI_WINDOW + 1:t + 1], int(indicators['rsi_period'][t]))
+        rsi_error = max(rsi_error, abs(rsi[-1] - indicators['rsi'][t]), abs(rsi[-2] - indicators['rsi_prev'][t]))
+    return atr_error, rsi_error
+
+def main():
+    num_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = make_candles(num_bars)
+
+    start = time.perf_counter()
+    legacy_calculate_indicators(df.copy(), DEFAULT_CONFIG)
+    legacy_time = time.perf_counter() - start
+
+    # รอบแรกรวมเวลา compile ของ numba (ถ้ามี)
+    calculate_indicator_arrays(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), DEFAULT_CONFIG['rsi_period'])
+    start = time.perf_counter()
+    indicators = calculate_indicator_arrays(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), DEFAULT_CONFIG['rsi_period'])
+    vectorized_time = time.perf_counter() - start
+
+    atr_error, rsi_error = check_parity(df, indicators, DEFAULT_CONFIG)
+    print(f"จำนวนแท่ง: {num_bars:,}")
+    print(f"แบบเดิม (df.apply + loop): {legacy_time:.3f} s")
+    print(f"แบบ vectorized:            {vectorized_time:.3f} s")
+    print(f"เร็วขึ้น:                   {legacy_time / vectorized_time:.0f}x")
+    print(f"ความต่างจากสูตร live: ATR {atr_error:.2e} (relative), RSI {rsi_error:.2e}")
+
+if __name__ == '__main__':
+    main()
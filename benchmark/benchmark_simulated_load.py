@@ -0,0 +1,98 @@
+"""วัดจำนวนรอบต่อวินาทีของ run_sequential_bot เมื่อรันหลายร้อยเหรียญพร้อมกันกับ exchange จำลอง
+
+ใช้ SimulatedExchange (ตั้ง latency/error ได้) และ SimulatedMarketFeed แทน websocket จริง
+รันผ่าน SymbolScheduler แบบเดียวกับ main() แต่ไม่มีช่วงพักระหว่างรอบ
+
+รัน: python -m benchmark.benchmark_simulated_load [จำนวนเหรียญ] [วินาที] [latency ms] [error rate]
+"""
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from functools import partial
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from config import DEFAULT_CONFIG, TRADING_CONFIG, api_key, api_secret
+from function.binance.futures.system.simulated_exchange import SimulatedExchange, SimulatedMarketFeed
+from function.binance.futures.system.symbol_scheduler import SymbolScheduler
+from replay import REPLAY_WARMUP_CANDLES, ReplayEngine
+
+def load_symbols(count: int) -> list:
+    """เหรียญ USDT จาก symbol_precision.json (ใช้ precision จริงของแต่ละเหรียญ)"""
+    with open('json/symbol_precision.json', 'r') as f:
+        markets = json.load(f)
+    return [market['id'] for market in markets if market['id'].endswith('USDT')][:count]
+
+def add_symbol_configs(symbols: list):
+    """เพิ่ม config ของเหรียญที่ยังไม่มีใน TRADING_CONFIG (เฉพาะใน process นี้)"""
+    configured = {config['symbol'] for config in TRADING_CONFIG}
+    TRADING_CONFIG.extend({**DEFAULT_CONFIG, 'symbol': symbol} for symbol in symbols if symbol not in configured)
+
+async def run_benchmark(num_symbols: int, duration: float, latency: float, error_rate: float) -> dict:
+    symbols = load_symbols(num_symbols)
+    add_symbol_configs(symbols)
+
+    exchange = SimulatedExchange(latency=latency, seed=42)
+    engine = ReplayEngine(symbols, exchange=exchange)
+    feed = SimulatedMarketFeed(exchange, engine.stream_manager, {symbol: DEFAULT_CONFIG['timeframe'] for symbol in symbols}, seed=42)
+    scheduler = SymbolScheduler(partial(main.run_sequential_bot, api_key, api_secret), interval=0, jitter=0,
+                                report_interval=duration * 2)
+
+    # ข้อความของบอทมีมากเกินจะแสดงผล จึงปิด stdout ระหว่างวัด
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            await engine.setup({symbol: feed.make_history(symbol, REPLAY_WARMUP_CANDLES) for symbol in symbols})
+            # เริ่มสุ่ม error หลัง warmup เพื่อให้ทุกเหรียญมีแท่งเทียนครบก่อน
+            exchange.error_rate = error_rate
+            setup_requests = sum(exchange.request_counts.values())
+
+            feed_task = asyncio.create_task(feed.run())
+            scheduler_task = asyncio.create_task(scheduler.start(engine.states))
+            start = time.perf_counter()
+            await asyncio.sleep(duration)
+            elapsed = time.perf_counter() - start
+
+            await scheduler.stop()
+            feed.stop()
+            await asyncio.gather(feed_task, scheduler_task, return_exceptions=True)
+        finally:
+            await engine.close()
+
+    latencies = np.concatenate([np.array(samples) for samples in scheduler.latencies.values() if samples]) * 1000
+    cycles = sum(scheduler.cycle_counts.values())
+    requests = sum(exchange.request_counts.values()) - setup_requests
+    return {
+        'symbols': len(symbols),
+        'elapsed': elapsed,
+        'cycles': cycles,
+        'cycles_per_sec': cycles / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        'requests_per_cycle': requests / cycles if cycles else 0.0,
+        'ticks': feed.tick_count,
+        'injected_errors': sum(exchange.injected_errors.values()),
+        'request_counts': exchange.request_counts
+    }
+
+def main_benchmark():
+    num_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.0
+    error_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+
+    result = asyncio.run(run_benchmark(num_symbols, duration, latency, error_rate))
+    print(f"เหรียญ: {result['symbols']}, latency {latency * 1000:.0f} ms, error rate {error_rate:.1%}")
+    print(f"รอบทั้งหมด: {result['cycles']:,} ใน {result['elapsed']:.1f} s = {result['cycles_per_sec']:.1f} รอบ/วินาที")
+    print(f"cycle latency: p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    print(f"request ต่อรอบ: {result['requests_per_cycle']:.1f}, error ที่สุ่มใส่: {result['injected_errors']:,}")
+    print(f"tick ของ feed: {result['ticks']:,}")
+    print("request ทั้งหมด: " + ", ".join(f"{name} {count:,}" for name, count in result['request_counts'].most_common()))
+
+if __name__ == '__main__':
+    main_benchmark()
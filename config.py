@@ -70,6 +70,56 @@ MAX_CANDLES_TO_FETCH = 5
 MIN_CANDLES_TO_FETCH = 3
 MIN_NOTIONAL = 20 
 
+# Scheduler settings (รันหลายเหรียญพร้อมกัน)
+MAX_CONCURRENT_SYMBOLS = 8  # จำนวนเหรียญที่ประมวลผลพร้อมกันสูงสุด
+SYMBOL_CYCLE_INTERVAL = 1  # วินาทีที่รอระหว่างรอบของแต่ละเหรียญ
+SYMBOL_CYCLE_JITTER = 0.5  # สุ่มหน่วงเพิ่ม 0 - n วินาที ไม่ให้ทุกเหรียญยิง request พร้อมกัน
+RATE_LIMIT_WEIGHT_BUDGET = 1800  # used weight ต่อนาทีที่ยอมให้ใช้ (Binance จำกัด 2400)
+SCHEDULER_REPORT_INTERVAL = 300  # วินาทีระหว่างการรายงาน latency ของแต่ละเหรียญ
+SYMBOL_DATA_REFRESH_INTERVAL = 6 * 60 * 60  # วินาทีระหว่างการอัพเดท symbol_precision.json ใน background
+
+# WebSocket settings
+WS_MAX_STREAMS_PER_CONNECTION = 200  # Binance Futures รับได้สูงสุด 200 streams ต่อ connection
+USER_DATA_KEEPALIVE_INTERVAL = 1800  # วินาทีระหว่างการต่ออายุ listenKey (หมดอายุใน 60 นาที)
+KLINE_BACKFILL_DELAY = 1  # วินาทีที่รอรวมช่วงแท่งเทียนที่ขาดหายของทุกเหรียญหลังเชื่อมต่อใหม่ก่อนดึงจาก REST
+KLINE_BACKFILL_CONCURRENCY = 5  # จำนวน request ดึงแท่งที่ขาดหายพร้อมกันสูงสุด
+KLINE_BACKFILL_BATCH = 1500  # จำนวนแท่งต่อ request (Binance Futures ให้สูงสุด 1500)
+CALLBACK_DISPATCH_WORKERS = 4  # จำนวน worker ที่เรียก callback ของ tracker (callback ช้าไม่ทำให้การอ่าน websocket ต้องรอ)
+WS_JSON_BACKEND = 'auto'  # ตัว decode ข้อความ websocket: 'auto' (orjson > msgspec > json ตามที่ติดตั้ง), 'orjson', 'msgspec' หรือ 'json'
+STREAM_RECORD_FILE = None  # path ไฟล์ NDJSON (เช่น 'json/streams/record.ndjson') เพื่อบันทึก stream ไว้ replay ด้วย replay.py
+
+# HTTP server settings (/metrics และ dashboard ที่ http://HTTP_SERVER_HOST:HTTP_SERVER_PORT/)
+HTTP_SERVER_ENABLED = True  # เปิด HTTP server ในตัวบอท
+HTTP_SERVER_HOST = '127.0.0.1'  # ฟังเฉพาะเครื่องตัวเอง (เปลี่ยนเป็น '0.0.0.0' ถ้าต้องการเปิดให้เครื่องอื่น)
+HTTP_SERVER_PORT = 8765
+EXCHANGE_METRICS_ENABLED = True  # เก็บเวลา/error/retry/used weight ของทุก request ที่ส่งไป exchange
+DASHBOARD_PUSH_INTERVAL = 1  # วินาทีระหว่างการส่งส่วนต่างของสถานะให้ page.html (/api/events)
+DASHBOARD_HEARTBEAT_INTERVAL = 15  # วินาทีที่ส่ง ping เมื่อไม่มีข้อมูลใหม่ กัน connection ถูกตัด
+DASHBOARD_CLIENT_QUEUE_SIZE = 100  # จำนวน event ที่ค้างได้ต่อ client ก่อนถูกตัด (client จะเชื่อมต่อใหม่เอง)
+
+# Message log settings
+MESSAGE_LOG_QUEUE_SIZE = 10000  # จำนวน log ที่รอเขียนได้สูงสุด (เกินจะถูกทิ้ง ไม่ให้การเทรดรอ disk)
+MESSAGE_LOG_FLUSH_INTERVAL = 1  # วินาทีที่รวบรวม log ก่อนเขียนลงไฟล์หนึ่งครั้ง
+MESSAGE_LOG_MAX_SEGMENT_BYTES = 1024 * 1024  # ขนาดไฟล์ part สูงสุดก่อนเริ่มไฟล์ใหม่
+MESSAGE_LOG_MAX_SEGMENT_AGE = 60 * 60  # วินาทีที่เขียนไฟล์ part เดิมได้ก่อนเริ่มไฟล์ใหม่
+
+# Backtest settings
+BACKTEST_OFFLINE = False  # True = ใช้แท่งเทียนจาก json/ohlcv เท่านั้น ไม่เชื่อมต่อ exchange
+BACKTEST_HEADLESS_REPORT = False  # True = บันทึกกราฟเป็นไฟล์ใน json/backtest_reports แทนการเปิดหน้าต่าง (สำหรับ server)
+BACKTEST_REPORT_MAX_POINTS = 2000  # จำนวนจุดสูงสุดต่อเส้นในกราฟ (ลดจุดเมื่อ backtest ยาว)
+BACKTEST_MAX_WORKERS = None  # จำนวน process ที่ใช้รัน parameter sweep (None = ตามจำนวน CPU)
+# ชุดพารามิเตอร์ที่ใช้ทดสอบ (key แบบ 'a.b' หมายถึง config['a']['b']) ทุก combination x ทุกเหรียญ
+BACKTEST_SWEEP_GRID = {
+    'rsi_overbought': [65, 68, 70, 75],
+    'rsi_oversold': [25, 30, 32, 35],
+    'rsi_period.atr.length1': [4, 7],
+    'rsi_period.atr.length2': [100, 200],
+    'take_profits.levels': [
+        list(TP_LEVELS.values()),
+        [{'id': 'tp1', 'size': 'MAX', 'target_atr': 1}]
+    ]
+}
+
 default_testnet = False
 default_show_message = [
     True,
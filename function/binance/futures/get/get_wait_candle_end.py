@@ -3,15 +3,11 @@ from datetime import datetime, timedelta
 import pytz
 
 from function.binance.futures.order.other.get_kline_data import fetch_ohlcv
-from function.binance.futures.system.create_future_exchange import create_future_exchange
 
 async def get_wait_candle_end(api_key, api_secret, symbol, timeframe, num_candles=1):
-    exchange = await create_future_exchange(api_key, api_secret)
-    
     try:
         # Fetch the latest candle
         ohlcv = await fetch_ohlcv(symbol, timeframe, limit=1)
-        await exchange.close()
         
         if not ohlcv:
             return {'status': False, 'message': 'Failed to fetch candle data'}
@@ -34,7 +30,6 @@ async def get_wait_candle_end(api_key, api_secret, symbol, timeframe, num_candle
         if current_time >= next_candle_end:
             # Fetch the data of the newly closed candle
             ohlcv = await fetch_ohlcv(symbol, timeframe, limit=1)
-            await exchange.close()
             
             if not ohlcv:
                 return {'status': False, 'message': 'Failed to fetch new candle data'}
@@ -1,15 +1,14 @@
 import traceback
 import ccxt.async_support as ccxt
-from function.binance.futures.order.get_all_order import clear_stoploss
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.order.get_all_order import cancel_order_ids, clear_stoploss
+from function.binance.futures.system.exchange_pool import get_exchange_pool
 from function.message import message
 
-async def change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss_price):
-    exchange = None
+async def change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss_price, orders=None):
     try:
-        exchange = await create_future_exchange(api_key, api_secret)
+        exchange = await get_exchange_pool().acquire(api_key, api_secret)
 
-        await clear_stoploss(api_key, api_secret, symbol)
+        await clear_stoploss(api_key, api_secret, symbol, orders=orders)
         positions = await exchange.fetch_positions([symbol])
         exchange_symbol = symbol
         if 'USDT' in symbol and '/USDT:USDT' not in symbol:
@@ -38,12 +37,16 @@ async def change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss_pri
         
         message(symbol, f"สร้างคำสั่ง stop loss ใหม่ที่ราคา {new_stoploss_price}")
 
-        # ถ้าสร้าง stop loss ใหม่สำเร็จ ค่อยยกเลิกคำสั่งเดิม
-        open_orders = await exchange.fetch_open_orders(symbol)
-        for order in open_orders:
-            if order['type'].lower() == 'stop_market' and order['id'] != new_stoploss_order['id']:
-                await exchange.cancel_order(order['id'], symbol)
-                #message(symbol, f"ยกเลิกคำสั่ง stop loss เดิม: {order['id']}")
+        if orders is not None:
+            # stoploss เดิมใน cache ถูกยกเลิกไปแล้วด้านบน เพิ่มคำสั่งใหม่เข้า cache แทนการดึง orders ใหม่
+            orders.append(new_stoploss_order)
+        else:
+            # ถ้าสร้าง stop loss ใหม่สำเร็จ ค่อยยกเลิกคำสั่งเดิม
+            open_orders = await exchange.fetch_open_orders(symbol)
+            old_stoploss_ids = [order['id'] for order in open_orders
+                if order['type'].lower() == 'stop_market' and order['id'] != new_stoploss_order['id']]
+            if old_stoploss_ids:
+                await cancel_order_ids(exchange, symbol, old_stoploss_ids)
 
         return new_stoploss_order
 
@@ -53,7 +56,4 @@ async def change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss_pri
         message(symbol, "________________________________", "red")
         message(symbol, f"Error: {error_traceback}", "red")
         message(symbol, "________________________________", "red")
-        return None
-    finally:
-        if exchange:
-            await exchange.close()
\ No newline at end of file
+        return None
\ No newline at end of file
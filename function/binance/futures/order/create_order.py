@@ -1,3 +1,4 @@
+import asyncio
 import traceback
 import ccxt.async_support as ccxt
 from config import default_testnet as testnet
@@ -5,7 +6,8 @@ from config import default_testnet as testnet
 from function.binance.futures.order.other.get_position_mode import get_position_mode, change_position_mode
 from function.binance.futures.order.other.get_amount_of_open_order import get_amount_of_open_order
 from function.binance.futures.order.other.get_amount_of_position import get_amount_of_position
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.order.other.get_user_data import get_user_data_tracker
+from function.binance.futures.system.exchange_pool import get_exchange_pool
 from function.message import message
 from function.binance.futures.order.other.get_future_available_balance import get_future_available_balance
 from function.binance.futures.order.other.get_adjust_precision_quantity import get_adjust_precision_quantity
@@ -13,10 +15,101 @@ from function.binance.futures.order.other.get_future_market_price import get_fut
 from function.binance.futures.order.other.get_create_order_adjusted_price import get_adjusted_price
 from function.binance.futures.order.other.get_create_order_adjusted_stop_price import get_adjusted_stop_price
 
+async def build_order_params(api_key, api_secret, symbol, side, price, quantity, temp_quantity, order_type, mode, latest_price, stop_price=None):
+    """สร้าง parameters ของคำสั่งตามประเภท order และ position mode (ใช้ร่วมกันระหว่าง create_order และ batch)"""
+    params = {}
+
+    # จัดการตามประเภทคำสั่ง
+    if order_type.upper() == "EXIT_MARKET":
+        # กรณี EXIT_MARKET (ปิด position)
+        params.update({
+            'type': 'market',
+            'reduceOnly': True
+        })
+        message(symbol, f"สร้างคำสั่ง EXIT_MARKET (Reduce Only)", "blue")
+        
+        if mode == 'hedge':
+            if side == "buy":
+                params.update({'positionSide': 'short'})
+            else:
+                params.update({'positionSide': 'long'})
+        
+        if temp_quantity.upper() == "MAX" or temp_quantity.endswith('100%'):
+            params.update({'closePosition': True})
+            message(symbol, "ตั้งค่าปิด position ทั้งหมด", "blue")
+
+    else:
+        # ตั้งค่า position mode
+        if mode == 'hedge':
+            if order_type.upper() in ["TAKE_PROFIT_MARKET", "STOPLOSS_MARKET"]:
+                if side == "buy":
+                    params.update({'positionSide': 'short'})
+                else:
+                    params.update({'positionSide': 'long'})
+            else:
+                if side == "buy":
+                    params.update({'positionSide': 'long'})
+                else:
+                    params.update({'positionSide': 'short'})
+
+            if order_type.upper() in ["TAKE_PROFIT_MARKET", "STOPLOSS_MARKET"]:
+                if temp_quantity.upper() == "MAX" or temp_quantity.endswith('100%'):
+                    params.update({'closePosition': True})
+        else:
+            if order_type.upper() in ["TAKE_PROFIT_MARKET", "STOPLOSS_MARKET"]:
+                if temp_quantity.upper() == "MAX" or temp_quantity.endswith('100%'):
+                    params.update({'closePosition': True})
+                else:
+                    params.update({'reduceOnly': True})
+
+        # ตั้งค่าประเภทคำสั่ง
+        if order_type.upper() == "MARKET":
+            params.update({'type': 'market'})
+        elif order_type.upper() in ["STOP_MARKET", "STOPLOSS_MARKET"]:
+            params.update({
+                'type': 'stop_market',
+                'stopPrice': price
+            })
+            if quantity == 0:
+                quantity = await get_adjust_precision_quantity(symbol, (latest_price/100))
+        elif order_type.upper() == "STOP_LIMIT":
+            stop_price = await get_adjusted_stop_price(api_key, api_secret, price, stop_price, latest_price, side, symbol)
+            if stop_price is None:
+                message(symbol, "ไม่สามารถปรับราคา stop ได้", "red")
+                return None
+            params.update({
+                'type': 'stop',
+                'price': float('{:.8f}'.format(float(stop_price))),
+                'stopPrice': price
+            })
+        elif order_type.upper() == "TAKE_PROFIT_MARKET":
+            params.update({
+                'type': 'take_profit_market',
+                'stopPrice': price
+            })
+        else:  # LIMIT
+            params.update({
+                'type': 'limit',
+                'price': price
+            })
+
+    # สร้าง parameters สำหรับคำสั่ง
+    order_params = {
+        'symbol': symbol,
+        'side': side,
+        'type': params['type'],
+        'amount': quantity,
+        'params': params
+    }
+
+    if params['type'] not in ['market', 'stop_market', 'take_profit_market']:
+        order_params['price'] = params.get('price', price)
+
+    return order_params
+
 async def create_order(api_key, api_secret, symbol, side, price="now", quantity="30$", order_type="MARKET", stop_price=None, martingale_multiplier=1):
-    exchange = None
     try:
-        exchange = await create_future_exchange(api_key, api_secret)
+        exchange = await get_exchange_pool().acquire(api_key, api_secret)
 
         # ตรวจสอบและแปลงค่าราคาให้ถูกต้อง
         latest_price = await get_future_market_price(api_key, api_secret, symbol)
@@ -49,91 +142,14 @@ async def create_order(api_key, api_secret, symbol, side, price="now", quantity=
         # ดึง position mode
         mode = await get_position_mode(api_key, api_secret)
 
-        # จัดการตามประเภทคำสั่ง
-        if order_type.upper() == "EXIT_MARKET":
-            # กรณี EXIT_MARKET (ปิด position)
-            params.update({
-                'type': 'market',
-                'reduceOnly': True
-            })
-            message(symbol, f"สร้างคำสั่ง EXIT_MARKET (Reduce Only)", "blue")
-            
-            if mode == 'hedge':
-                if side == "buy":
-                    params.update({'positionSide': 'short'})
-                else:
-                    params.update({'positionSide': 'long'})
-            
-            if temp_quantity.upper() == "MAX" or temp_quantity.endswith('100%'):
-                params.update({'closePosition': True})
-                message(symbol, "ตั้งค่าปิด position ทั้งหมด", "blue")
-
-        else:
-            # ตั้งค่า position mode
-            if mode == 'hedge':
-                if order_type.upper() in ["TAKE_PROFIT_MARKET", "STOPLOSS_MARKET"]:
-                    if side == "buy":
-                        params.update({'positionSide': 'short'})
-                    else:
-                        params.update({'positionSide': 'long'})
-                else:
-                    if side == "buy":
-                        params.update({'positionSide': 'long'})
-                    else:
-                        params.update({'positionSide': 'short'})
-
-                if order_type.upper() in ["TAKE_PROFIT_MARKET", "STOPLOSS_MARKET"]:
-                    if temp_quantity.upper() == "MAX" or temp_quantity.endswith('100%'):
-                        params.update({'closePosition': True})
-            else:
-                if order_type.upper() in ["TAKE_PROFIT_MARKET", "STOPLOSS_MARKET"]:
-                    if temp_quantity.upper() == "MAX" or temp_quantity.endswith('100%'):
-                        params.update({'closePosition': True})
-                    else:
-                        params.update({'reduceOnly': True})
-
-            # ตั้งค่าประเภทคำสั่ง
-            if order_type.upper() == "MARKET":
-                params.update({'type': 'market'})
-            elif order_type.upper() in ["STOP_MARKET", "STOPLOSS_MARKET"]:
-                params.update({
-                    'type': 'stop_market',
-                    'stopPrice': price
-                })
-                if quantity == 0:
-                    quantity = await get_adjust_precision_quantity(symbol, (latest_price/100))
-            elif order_type.upper() == "STOP_LIMIT":
-                stop_price = await get_adjusted_stop_price(api_key, api_secret, price, stop_price, latest_price, side, symbol)
-                if stop_price is None:
-                    message(symbol, "ไม่สามารถปรับราคา stop ได้", "red")
-                    return None
-                params.update({
-                    'type': 'stop',
-                    'price': float('{:.8f}'.format(float(stop_price))),
-                    'stopPrice': price
-                })
-            elif order_type.upper() == "TAKE_PROFIT_MARKET":
-                params.update({
-                    'type': 'take_profit_market',
-                    'stopPrice': price
-                })
-            else:  # LIMIT
-                params.update({
-                    'type': 'limit',
-                    'price': price
-                })
-
-        # สร้าง parameters สำหรับคำสั่ง
-        order_params = {
-            'symbol': symbol,
-            'side': side,
-            'type': params['type'],
-            'amount': quantity,
-            'params': params
-        }
-
-        if params['type'] not in ['market', 'stop_market', 'take_profit_market']:
-            order_params['price'] = params.get('price', price)
+        order_params = await build_order_params(
+            api_key, api_secret, symbol, side, price, quantity, temp_quantity,
+            order_type, mode, latest_price, stop_price
+        )
+        if order_params is None:
+            return None
+        params = order_params['params']
+        quantity = order_params['amount']
 
         # แสดงรายละเอียดคำสั่งก่อนส่ง
         message(symbol, f"กำลังส่งคำสั่ง: Symbol: {symbol}, Side: {side}, Type: {params['type']}, Amount: {quantity}, Parameters: {params}", "blue")
@@ -220,16 +236,107 @@ async def create_order(api_key, api_secret, symbol, side, price="now", quantity=
         else:
             message(symbol, f"พบข้อผิดพลาด", "red")
             message(symbol, f"Error: {error_traceback}", "red")
-    finally:
-        if exchange:
-            try:
-                await exchange.close()
-            except Exception as e:
-                message(symbol, f"เกิดข้อผิดพลาดในการปิด exchange: {str(e)}", "red")
     return None
 
-async def get_adjusted_quantity(api_key, api_secret, quantity, price, symbol, order_type=None, martingale_multiplier=1.0):
-    """ปรับปริมาณการเทรดตามรูปแบบที่กำหนด"""
+BATCH_ORDER_LIMIT = 5  # Binance รับได้สูงสุด 5 orders ต่อ batch
+
+async def create_batch_orders(api_key, api_secret, symbol, order_requests):
+    """สร้างหลาย orders ของเหรียญเดียวกันด้วย batch order (ครั้งละ 5)
+
+    order_requests เป็น list ของ dict ที่มี side, price, quantity, order_type และ martingale_multiplier (ถ้ามี)
+    คืนค่า list ของ order ตามลำดับที่ส่งมา (None ถ้าสร้างไม่สำเร็จ)
+    """
+    results = [None] * len(order_requests)
+    try:
+        exchange = await get_exchange_pool().acquire(api_key, api_secret)
+
+        latest_price = await get_future_market_price(api_key, api_secret, symbol)
+        if latest_price is None:
+            message(symbol, "ไม่สามารถดึงราคาตลาดได้", "red")
+            return results
+
+        # ข้อมูลที่ใช้ร่วมกันทุก order ดึงครั้งเดียว
+        mode = await get_position_mode(api_key, api_secret)
+        base_amount = None
+        if any(request['order_type'].upper() in ["TAKE_PROFIT_MARKET", "STOPLOSS_MARKET", "EXIT_MARKET"] for request in order_requests):
+            base_amount = await get_reduce_base_amount(api_key, api_secret, symbol)
+
+        prepared = []  # (index, order_params)
+        for index, request in enumerate(order_requests):
+            side = request['side']
+            order_type = request['order_type']
+            price = await get_adjusted_price(api_key, api_secret, request['price'], latest_price, side, symbol)
+            if price is None:
+                message(symbol, "ไม่สามารถปรับราคาได้", "red")
+                continue
+
+            quantity = await get_adjusted_quantity(
+                api_key, api_secret, request['quantity'], price, symbol, order_type,
+                request.get('martingale_multiplier', 1), base_amount=base_amount
+            )
+            if quantity is None or quantity <= 0:
+                message(symbol, f"ปริมาณที่ปรับแล้วไม่ถูกต้อง: {quantity}", "red")
+                continue
+
+            order_params = await build_order_params(
+                api_key, api_secret, symbol, side,
+                float('{:.8f}'.format(float(price))), float('{:.8f}'.format(float(quantity))),
+                request['quantity'], order_type, mode, latest_price, request.get('stop_price')
+            )
+            if order_params is not None:
+                prepared.append((index, order_params))
+
+        for i in range(0, len(prepared), BATCH_ORDER_LIMIT):
+            chunk = prepared[i:i + BATCH_ORDER_LIMIT]
+            message(symbol, f"กำลังส่งคำสั่งแบบ batch {len(chunk)} orders", "blue")
+            try:
+                orders = await exchange.create_orders([order_params for _, order_params in chunk])
+            except ccxt.NotSupported:
+                # exchange ไม่รองรับ batch สำหรับ order ประเภทนี้ ส่งพร้อมกันทีละ order แทน
+                orders = await asyncio.gather(
+                    *(exchange.create_order(**order_params) for _, order_params in chunk),
+                    return_exceptions=True
+                )
+
+            for (index, order_params), order in zip(chunk, orders):
+                if isinstance(order, dict) and order.get('id'):
+                    results[index] = order
+                    continue
+                # order ที่ล้มเหลวใน batch ส่งใหม่ผ่าน create_order ที่มีการแก้ position mode/fallback ครบ
+                error = order if isinstance(order, Exception) else (order or {}).get('info', {}).get('msg')
+                message(symbol, f"สร้าง order ใน batch ไม่สำเร็จ ({error}) ลองส่งใหม่ทีละ order", "yellow")
+                request = order_requests[index]
+                results[index] = await create_order(
+                    api_key, api_secret, symbol, request['side'],
+                    price=request['price'], quantity=request['quantity'],
+                    order_type=request['order_type'], stop_price=request.get('stop_price'),
+                    martingale_multiplier=request.get('martingale_multiplier', 1)
+                )
+
+        return results
+
+    except Exception as e:
+        error_traceback = traceback.format_exc()
+        message(symbol, f"เกิดข้อผิดพลาดในการสร้าง batch orders: {str(e)}", "red")
+        message(symbol, f"Error: {error_traceback}", "red")
+        return results
+
+async def get_reduce_base_amount(api_key, api_secret, symbol):
+    """ขนาด position (หรือ pending order ถ้ายังไม่มี position) ที่ใช้คำนวณปริมาณ TP/SL"""
+    position_amount = abs(float(await get_amount_of_position(api_key, api_secret, symbol)))
+    if position_amount > 0:
+        return position_amount
+    pending_amount = abs(float(await get_amount_of_open_order(api_key, api_secret, symbol)))
+    if pending_amount > 0:
+        return pending_amount
+    # entry อาจเพิ่ง fill แต่ event ของ user data stream ยังมาไม่ถึง ถามจาก REST อีกครั้ง
+    # (ถ้าได้ 0 ปริมาณแบบ MAX/% ของ TP/SL จะไม่ถูกต้องและคำสั่งป้องกันจะไม่ถูกสร้าง)
+    if get_user_data_tracker().is_ready_for(api_key):
+        return abs(float(await get_amount_of_position(api_key, api_secret, symbol, use_stream=False)))
+    return 0
+
+async def get_adjusted_quantity(api_key, api_secret, quantity, price, symbol, order_type=None, martingale_multiplier=1.0, base_amount=None):
+    """ปรับปริมาณการเทรดตามรูปแบบที่กำหนด (base_amount = ขนาด position ที่ดึงไว้แล้ว สำหรับ TP/SL)"""
     try:
         # ตรวจสอบค่า price
         if price == 'now' or price is None:
@@ -254,12 +361,9 @@ async def get_adjusted_quantity(api_key, api_secret, quantity, price, symbol, or
         # คำนวณปริมาณตามรูปแบบคำสั่ง
         if order_type and order_type.upper() in ["TAKE_PROFIT_MARKET", "STOPLOSS_MARKET", "EXIT_MARKET"]:
             try:
-                # ดึงข้อมูล position และ pending orders
-                position_amount = abs(float(await get_amount_of_position(api_key, api_secret, symbol)))
-                pending_amount = abs(float(await get_amount_of_open_order(api_key, api_secret, symbol)))
-                
-                # เลือกใช้ค่าที่ไม่เป็น 0
-                base_amount = position_amount if position_amount > 0 else pending_amount
+                # ดึงข้อมูล position และ pending orders ถ้ายังไม่ได้ส่งมา
+                if base_amount is None:
+                    base_amount = await get_reduce_base_amount(api_key, api_secret, symbol)
                 
                 if base_amount == 0:
                     message(symbol, "ไม่พบ position หรือ pending order สำหรับคำนวณปริมาณ", "yellow")
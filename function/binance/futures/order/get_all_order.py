@@ -1,152 +1,100 @@
+import asyncio
 import traceback
 import ccxt.async_support as ccxt
 from config import default_testnet as testnet
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.system.exchange_pool import get_exchange, get_exchange_pool
 from function.message import message
 
 async def get_all_order(api_key, api_secret, symbol=None):
-    exchange = await create_future_exchange(api_key, api_secret, warnOnFetchOpenOrdersWithoutSymbol=False)
-
-    orders = await exchange.fetch_open_orders(symbol)
-    await exchange.close()
+    async with get_exchange(api_key, api_secret, warnOnFetchOpenOrdersWithoutSymbol=False) as exchange:
+        orders = await exchange.fetch_open_orders(symbol)
     return orders
 
-async def clear_all_orders(api_key, api_secret, symbol):
-   exchange = await create_future_exchange(api_key, api_secret)
-   try:
-       # Fetch all open orders for the specified symbol
-       open_orders = await get_all_order(api_key, api_secret, symbol)
-       
-       if not open_orders:
-           #message(symbol, "ไม่พบ orders ที่เปิดอยู่", "blue") 
-           return []
-           
-       cancelled_orders = []
-       for order in open_orders:
-           try:
-               # ตรวจสอบว่า order ยังมีอยู่จริงก่อนยกเลิก
-               order_detail = None
-               try:
-                   order_detail = await exchange.fetch_order(order['id'], symbol)
-               except Exception as e:
-                   if 'Unknown order sent' in str(e):
-                       # ข้าม order ที่ไม่มีอยู่แล้ว
-                       continue
-                   raise e
+STOPLOSS_ORDER_TYPES = ['stop_market', 'stop']
+TP_ORDER_TYPES = ['take_profit_market', 'take_profit']
+BATCH_CANCEL_LIMIT = 10  # Binance รับได้สูงสุด 10 orders ต่อ batch cancel
 
-               if order_detail and order_detail['status'] not in ['closed', 'canceled']:
-                   # Cancel the order
-                   await exchange.cancel_order(order['id'], symbol)
-                   cancelled_orders.append(order['id'])
-                   #message(symbol, f"Cancelled order: {order['id']}", "blue")
+def _is_unknown_order_error(e):
+    return 'Unknown order sent' in str(e)
 
-           except Exception as e:
-               if 'Unknown order sent' in str(e):
-                   # ข้าม error นี้
-                   continue
-               else:
-                   error_traceback = traceback.format_exc()
-                   message(symbol,f"Error cancelling order {order['id']}: {str(e)}", "yellow")
-                   message(symbol, "________________________________", "red")
-                   message(symbol, f"Error: {error_traceback}", "red")
-                   message(symbol, "________________________________", "red")
-       
-       return cancelled_orders
+def _remove_cached_orders(orders, order_ids):
+    """ลบ orders ที่ยกเลิกแล้วออกจาก cache (แก้ list เดิมเพื่อให้ SymbolState เห็นด้วย)"""
+    if orders is None:
+        return
+    orders[:] = [order for order in orders if order['id'] not in order_ids]
 
-   except Exception as e:
-       error_traceback = traceback.format_exc()
-       message(symbol, f"เกิดข้อผิดพลาดในการยกเลิก Orders: {str(e)}", "red") 
-       message(symbol, f"Error: {error_traceback}", "red")
-       return []
-       
-   finally:
-       await exchange.close()
+async def cancel_order_ids(exchange, symbol, order_ids):
+    """ยกเลิกหลาย orders ด้วย batch cancel (ครั้งละ 10) ถ้าใช้ไม่ได้จะยกเลิกพร้อมกันทีละ order"""
+    cancelled_orders = []
+    for i in range(0, len(order_ids), BATCH_CANCEL_LIMIT):
+        chunk = order_ids[i:i + BATCH_CANCEL_LIMIT]
+        try:
+            results = await exchange.cancel_orders(chunk, symbol)
+            for order_id, result in zip(chunk, results):
+                # batch cancel ส่ง error กลับมาเป็นรายตัว order ที่ไม่มีอยู่แล้วถือว่ายกเลิกแล้ว
+                info = result.get('info', {}) if isinstance(result, dict) else {}
+                if 'code' in info and not _is_unknown_order_error(info.get('msg', '')):
+                    message(symbol, f"Error cancelling order {order_id}: {info.get('msg')}", "yellow")
+                    continue
+                cancelled_orders.append(order_id)
+        except ccxt.NotSupported:
+            results = await asyncio.gather(
+                *(exchange.cancel_order(order_id, symbol) for order_id in chunk),
+                return_exceptions=True
+            )
+            for order_id, result in zip(chunk, results):
+                if isinstance(result, Exception) and not _is_unknown_order_error(result):
+                    message(symbol, f"Error cancelling order {order_id}: {str(result)}", "yellow")
+                    continue
+                cancelled_orders.append(order_id)
+    return cancelled_orders
 
-async def clear_stoploss(api_key, api_secret, symbol):
-    """ลบเฉพาะ stoploss orders ที่มีอยู่"""
-    exchange = await create_future_exchange(api_key, api_secret)
+async def clear_all_orders(api_key, api_secret, symbol, orders=None):
+    """ยกเลิก orders ทั้งหมดของเหรียญด้วยคำสั่ง cancel-all ครั้งเดียว"""
     try:
-        # ดึง orders ที่เปิดอยู่ทั้งหมด
-        open_orders = await get_all_order(api_key, api_secret, symbol)
-        
-        if not open_orders:
-            return []
-            
-        cancelled_orders = []
-        for order in open_orders:
-            try:
-                # ตรวจสอบว่าเป็น stop_market order หรือไม่
-                if order['type'] in ['stop_market', 'stop']:
-                    # ตรวจสอบว่า order ยังมีอยู่จริง
-                    order_detail = None
-                    try:
-                        order_detail = await exchange.fetch_order(order['id'], symbol)
-                    except Exception as e:
-                        if 'Unknown order sent' in str(e):
-                            continue
-                        raise e
-
-                    if order_detail and order_detail['status'] not in ['closed', 'canceled']:
-                        # ยกเลิก stoploss order
-                        await exchange.cancel_order(order['id'], symbol)
-                        cancelled_orders.append(order['id'])
+        exchange = await get_exchange_pool().acquire(api_key, api_secret)
+        await exchange.cancel_all_orders(symbol)
 
-            except Exception as e:
-                if 'Unknown order sent' in str(e):
-                    continue
-                else:
-                    error_traceback = traceback.format_exc()
-                    message(symbol, f"Error cancelling stoploss order {order['id']}: {str(e)}", "yellow")
-                    message(symbol, f"Error: {error_traceback}", "red")
-        
+        cancelled_orders = [order['id'] for order in orders] if orders else []
+        _remove_cached_orders(orders, set(cancelled_orders))
         return cancelled_orders
 
     except Exception as e:
         error_traceback = traceback.format_exc()
-        message(symbol, f"เกิดข้อผิดพลาดในการยกเลิก Stoploss Orders: {str(e)}", "red")
+        message(symbol, f"เกิดข้อผิดพลาดในการยกเลิก Orders: {str(e)}", "red") 
         message(symbol, f"Error: {error_traceback}", "red")
         return []
-    finally:
-        await exchange.close()
 
-async def clear_tp_orders(api_key: str, api_secret: str, symbol: str):
-    """ลบ take profit orders ที่มีอยู่"""
-    exchange = await create_future_exchange(api_key, api_secret)
+async def _clear_orders_by_type(api_key, api_secret, symbol, order_types, orders=None):
+    """ยกเลิก orders ตามประเภท โดยใช้รายการ orders ที่ cache ไว้ถ้ามี"""
+    exchange = await get_exchange_pool().acquire(api_key, api_secret)
+
+    open_orders = orders if orders is not None else await get_all_order(api_key, api_secret, symbol)
+    order_ids = [order['id'] for order in open_orders if order['type'].lower() in order_types]
+    if not order_ids:
+        return []
+
+    cancelled_orders = await cancel_order_ids(exchange, symbol, order_ids)
+    _remove_cached_orders(orders, set(cancelled_orders))
+    return cancelled_orders
+
+async def clear_stoploss(api_key, api_secret, symbol, orders=None):
+    """ลบเฉพาะ stoploss orders ที่มีอยู่"""
     try:
-        # ดึง orders ที่เปิดอยู่ทั้งหมด
-        open_orders = await get_all_order(api_key, api_secret, symbol)
-        
-        if not open_orders:
-            return []
-            
-        cancelled_orders = []
-        for order in open_orders:
-            try:
-                # ตรวจสอบว่าเป็น take_profit_market order หรือไม่
-                if order['type'].lower() in ['take_profit_market', 'take_profit']:
-                    # ตรวจสอบว่า order ยังมีอยู่จริง
-                    order_detail = None
-                    try:
-                        order_detail = await exchange.fetch_order(order['id'], symbol)
-                    except Exception as e:
-                        if 'Unknown order sent' in str(e):
-                            continue
-                        raise e
+        return await _clear_orders_by_type(api_key, api_secret, symbol, STOPLOSS_ORDER_TYPES, orders)
 
-                    if order_detail and order_detail['status'] not in ['closed', 'canceled']:
-                        # ยกเลิก take profit order
-                        await exchange.cancel_order(order['id'], symbol)
-                        cancelled_orders.append(order['id'])
-                        message(symbol, f"ยกเลิก TP Order {order['id']}", "cyan")
+    except Exception as e:
+        error_traceback = traceback.format_exc()
+        message(symbol, f"เกิดข้อผิดพลาดในการยกเลิก Stoploss Orders: {str(e)}", "red")
+        message(symbol, f"Error: {error_traceback}", "red")
+        return []
 
-            except Exception as e:
-                if 'Unknown order sent' in str(e):
-                    continue
-                else:
-                    error_traceback = traceback.format_exc()
-                    message(symbol, f"Error cancelling TP order {order['id']}: {str(e)}", "yellow")
-                    message(symbol, f"Error: {error_traceback}", "red")
-        
+async def clear_tp_orders(api_key: str, api_secret: str, symbol: str, orders=None):
+    """ลบ take profit orders ที่มีอยู่"""
+    try:
+        cancelled_orders = await _clear_orders_by_type(api_key, api_secret, symbol, TP_ORDER_TYPES, orders)
+        if cancelled_orders:
+            message(symbol, f"ยกเลิก TP Orders {len(cancelled_orders)} รายการ", "cyan")
         return cancelled_orders
 
     except Exception as e:
@@ -154,5 +102,3 @@ async def clear_tp_orders(api_key: str, api_secret: str, symbol: str):
         message(symbol, f"เกิดข้อผิดพลาดในการยกเลิก Take Profit Orders: {str(e)}", "red")
         message(symbol, f"Error: {error_traceback}", "red")
         return []
-    finally:
-        await exchange.close()
\ No newline at end of file
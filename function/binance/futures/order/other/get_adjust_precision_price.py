@@ -1,15 +1,6 @@
-import json
-from decimal import Decimal, ROUND_DOWN, InvalidOperation
+from function.binance.futures.system.symbol_precision_index import get_symbol_precision_index, truncate_to_scale
 from function.message import message
 
-def load_symbol_data():
-    try:
-        with open('json/symbol_precision.json', 'r') as file:
-            return json.load(file)
-    except Exception as e:
-        message("SYSTEM", f"Error loading symbol data: {str(e)}", "red")
-        return []
-
 def get_adjust_precision_price(symbol, price):
     """ปรับความละเอียดของราคาตาม precision ของเหรียญ"""
     try:
@@ -27,34 +18,21 @@ def get_adjust_precision_price(symbol, price):
             message(symbol, f"Invalid price format: {price}", "red")
             return None
 
-        # โหลดข้อมูล symbol
-        symbol_data = load_symbol_data()
-        if not symbol_data:
-            message(symbol, "No symbol data available", "red")
-            return None
-
-        # หา precision ของ symbol
-        precision = next((item["precision"]["price"] for item in symbol_data if item["id"] == symbol), None)
+        # หา precision ของ symbol จาก index ในหน่วยความจำ
+        precision = get_symbol_precision_index().get(symbol)
         if precision is None:
             message(symbol, f"No precision data found for {symbol}", "red")
             return None
 
-        # แปลงเป็น Decimal และปรับความละเอียด
-        try:
-            price_decimal = Decimal(str(numeric_price))
-            adjusted_price = float(price_decimal.quantize(Decimal(f'1e-{precision}'), rounding=ROUND_DOWN))
-            
-            # ตรวจสอบว่าราคาที่ปรับแล้วเป็นค่าที่ถูกต้อง
-            if adjusted_price <= 0:
-                message(symbol, f"Adjusted price is invalid: {adjusted_price}", "red")
-                return None
-                
-            return adjusted_price
+        adjusted_price = truncate_to_scale(numeric_price, precision.price_scale, precision.price_step)
 
-        except InvalidOperation as e:
-            message(symbol, f"Error adjusting price precision: {str(e)}", "red")
+        # ตรวจสอบว่าราคาที่ปรับแล้วเป็นค่าที่ถูกต้อง
+        if adjusted_price <= 0:
+            message(symbol, f"Adjusted price is invalid: {adjusted_price}", "red")
             return None
 
+        return adjusted_price
+
     except Exception as e:
         message(symbol, f"Error in price adjustment: {str(e)}", "red")
         return None
\ No newline at end of file
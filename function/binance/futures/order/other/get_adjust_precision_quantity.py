@@ -1,10 +1,8 @@
-from decimal import ROUND_UP, Decimal, ROUND_DOWN, ROUND_HALF_UP
-from function.binance.futures.order.other.get_future_market_price import get_future_market_price
-from function.binance.futures.system.load_json_data import load_json_data
-from function.message import message
-from config import api_key, api_secret
+from function.binance.futures.system.symbol_precision_index import get_symbol_precision_index, truncate_to_scale
 
 async def get_adjust_precision_quantity(symbol, price):
-    symbol_data = await load_json_data("json/symbol_precision.json")
-    precision = next((item["precision"]["amount"] for item in symbol_data if item["id"] == symbol), 0)
-    return float(Decimal(price).quantize(Decimal('1e-{}'.format(precision)), rounding=ROUND_DOWN))
\ No newline at end of file
+    precision = get_symbol_precision_index().get(symbol)
+    # ไม่พบข้อมูลเหรียญให้ปัดเป็นจำนวนเต็มเหมือนเดิม (precision 0)
+    if precision is None:
+        return truncate_to_scale(float(price), 1)
+    return truncate_to_scale(float(price), precision.amount_scale, precision.amount_step)
\ No newline at end of file
@@ -1,13 +1,10 @@
-import ccxt.async_support as ccxt
 from function.binance.futures.order.other.get_adjust_precision_quantity import get_adjust_precision_quantity
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.system.exchange_pool import get_exchange
 
 async def get_amount_of_open_order(api_key, api_secret, symbol):
 
-  exchange = await create_future_exchange(api_key, api_secret)
-
-  orders = await exchange.fetch_open_orders(symbol)
-  await exchange.close()
+  async with get_exchange(api_key, api_secret) as exchange:
+    orders = await exchange.fetch_open_orders(symbol)
 
   amount = 0
   for order in orders:
@@ -23,3 +20,4 @@ async def get_amount_of_open_order(api_key, api_secret, symbol):
   amount = await get_adjust_precision_quantity(symbol, amount)
   return amount
 
+
@@ -1,14 +1,18 @@
 import traceback
-import ccxt.async_support as ccxt
-from config import default_testnet as testnet
 from function.binance.futures.order.other.get_adjust_precision_quantity import get_adjust_precision_quantity
-from function.binance.futures.system.create_future_exchange import create_future_exchange
-
-async def get_amount_of_position(api_key, api_secret, symbol):
-    exchange = await create_future_exchange(api_key, api_secret)
+from function.binance.futures.order.other.get_user_data import get_user_data_tracker
+from function.binance.futures.system.exchange_pool import get_exchange
 
+async def get_amount_of_position(api_key, api_secret, symbol, use_stream=True):
     try:
-        positions = await exchange.fetch_positions()
+        # ใช้ข้อมูลจาก user data stream ถ้า sync แล้ว (ไม่ต้องเรียก REST)
+        tracker = get_user_data_tracker()
+        if use_stream and tracker.is_ready_for(api_key):
+            amount = tracker.get_position_amount(symbol)
+            return await get_adjust_precision_quantity(symbol, amount) if amount != 0 else 0
+
+        async with get_exchange(api_key, api_secret) as exchange:
+            positions = await exchange.fetch_positions()
         
         # Convert input symbol to the format used by the exchange
         exchange_symbol = symbol
@@ -31,6 +35,3 @@ async def get_amount_of_position(api_key, api_secret, symbol):
         print(f"Error in get_amount_of_position: {e}")
         print(traceback.format_exc())
         return 0
-
-    finally:
-        await exchange.close()
\ No newline at end of file
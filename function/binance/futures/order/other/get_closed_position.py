@@ -1,10 +1,10 @@
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.system.exchange_pool import get_exchange
 
 async def get_closed_position_side(api_key, api_secret, symbol):
-    exchange = await create_future_exchange(api_key, api_secret)
     try:
         # Fetch recent trades
-        trades = await exchange.fetch_my_trades(symbol, limit=1)
+        async with get_exchange(api_key, api_secret) as exchange:
+            trades = await exchange.fetch_my_trades(symbol, limit=1)
         
         if trades:
             last_trade = trades[-1]
@@ -17,15 +17,12 @@ async def get_closed_position_side(api_key, api_secret, symbol):
     except Exception as e:
         print(f"An error occurred while getting closed position side: {str(e)}")
         return None
-    
-    finally:
-        await exchange.close()
 
 async def get_amount_of_closed_position(api_key, api_secret, symbol):
-    exchange = await create_future_exchange(api_key, api_secret)
     try:
         # Fetch recent trades
-        trades = await exchange.fetch_my_trades(symbol, limit=1)
+        async with get_exchange(api_key, api_secret) as exchange:
+            trades = await exchange.fetch_my_trades(symbol, limit=1)
         
         if trades:
             last_trade = trades[-1]
@@ -38,6 +35,3 @@ async def get_amount_of_closed_position(api_key, api_secret, symbol):
     except Exception as e:
         print(f"An error occurred while getting closed position amount: {str(e)}")
         return 0
-    
-    finally:
-        await exchange.close()
\ No newline at end of file
@@ -1,16 +1,18 @@
 import traceback
-import ccxt.async_support as ccxt
-from config import default_testnet
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.order.other.get_user_data import get_user_data_tracker
+from function.binance.futures.system.exchange_pool import get_exchange
 from function.message import message
 
 async def get_future_available_balance(api_key, api_secret):
-    exchange = await create_future_exchange(api_key, api_secret)
-
     try:
-        balance = await exchange.fetch_balance()
+        # ใช้ข้อมูลจาก user data stream ถ้า sync แล้ว (ไม่ต้องเรียก REST)
+        tracker = get_user_data_tracker()
+        if tracker.is_ready_for(api_key) and tracker.get_available_balance() is not None:
+            return tracker.get_available_balance()
+
+        async with get_exchange(api_key, api_secret) as exchange:
+            balance = await exchange.fetch_balance()
         future_balance = balance['info']['availableBalance']
-        await exchange.close()
         return future_balance
     
     except Exception as e:
@@ -18,3 +20,4 @@ async def get_future_available_balance(api_key, api_secret):
         message('MAIN',"พบข้อผิดพลาด", "yellow")
         message('MAIN', f"Error: {error_traceback}", "red")
     return None
+
@@ -1,22 +1,21 @@
-import json
 import asyncio
-import websockets
+import time
 from typing import Dict, Set, Optional
 from datetime import datetime
 import logging
 from collections import defaultdict
 
+from function.binance.futures.system.callback_dispatcher import get_callback_dispatcher
+from function.binance.futures.system.stream_manager import get_stream_manager
+
 class BinancePriceTracker:
     def __init__(self):
-        self.ws_url = "wss://fstream.binance.com/ws"
         self.prices: Dict[str, float] = {}
         self.subscribed_symbols: Set[str] = set()
-        self.websocket = None
         self.is_running = False
         self.callbacks = defaultdict(list)
         self.logger = self._setup_logger()
-        self._lock = asyncio.Lock()
-        self._last_update: Dict[str, datetime] = {}
+        self._last_update: Dict[str, float] = {}  # symbol -> time.time() ที่ได้รับราคาล่าสุด
 
     def _setup_logger(self):
         logger = logging.getLogger('BinancePriceTracker')
@@ -51,67 +50,32 @@ class BinancePriceTracker:
         self.callbacks[symbol.lower()].append(callback)
 
     async def start(self):
-        """เริ่มการเชื่อมต่อ WebSocket และติดตามราคา"""
+        """เริ่มติดตามราคาผ่าน combined stream ที่ใช้ร่วมกับ tracker อื่น"""
         if self.is_running:
             return
 
         self.is_running = True
-        while self.is_running:
-            try:
-                async with websockets.connect(self.ws_url) as websocket:
-                    self.websocket = websocket
-                    #self.logger.info("เชื่อมต่อ WebSocket สำเร็จ")
-
-                    # สมัครติดตามราคาทุกเหรียญที่ต้องการ
-                    for symbol in self.subscribed_symbols:
-                        await self._send_subscription(symbol)
-
-                    # ลูปหลักสำหรับรับข้อความ
-                    while self.is_running:
-                        try:
-                            message = await websocket.recv()
-                            await self._handle_message(json.loads(message))
-                        except websockets.exceptions.ConnectionClosed:
-                            self.logger.warning("การเชื่อมต่อ WebSocket ถูกปิด กำลังพยายามเชื่อมต่อใหม่...")
-                            break
-                        except Exception as e:
-                            self.logger.error(f"เกิดข้อผิดพลาดในการจัดการข้อความ: {str(e)}")
-
-            except Exception as e:
-                self.logger.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ WebSocket: {str(e)}")
-                if self.is_running:
-                    self.logger.info("กำลังพยายามเชื่อมต่อใหม่ในอีก 5 วินาที...")
-                    await asyncio.sleep(5)
+        stream_manager = get_stream_manager()
+        stream_manager.add_handler('aggTrade', self._handle_message)
+        await stream_manager.subscribe([f"{symbol}@aggTrade" for symbol in self.subscribed_symbols])
+        await stream_manager.start()
 
     async def stop(self):
-        """หยุดการเชื่อมต่อ WebSocket และการติดตามราคา"""
+        """หยุดการติดตามราคา และปิด connection ถ้าไม่มี tracker อื่นใช้อยู่"""
         self.is_running = False
-        if self.websocket:
-            await self.websocket.close()
+        stream_manager = get_stream_manager()
+        stream_manager.remove_handler('aggTrade', self._handle_message)
+        await stream_manager.unsubscribe([f"{symbol}@aggTrade" for symbol in self.subscribed_symbols])
+        if not stream_manager.streams:
+            await stream_manager.stop()
 
     async def _send_subscription(self, symbol: str):
         """ส่งคำสั่งสมัครติดตามราคาเหรียญ"""
-        if not self.websocket:
-            return
-
-        subscribe_message = {
-            "method": "SUBSCRIBE",
-            "params": [f"{symbol}@aggTrade"],
-            "id": 1
-        }
-        await self.websocket.send(json.dumps(subscribe_message))
+        await get_stream_manager().subscribe([f"{symbol}@aggTrade"])
 
     async def _send_unsubscription(self, symbol: str):
         """ส่งคำสั่งยกเลิกการติดตามราคาเหรียญ"""
-        if not self.websocket:
-            return
-
-        unsubscribe_message = {
-            "method": "UNSUBSCRIBE",
-            "params": [f"{symbol}@aggTrade"],
-            "id": 1
-        }
-        await self.websocket.send(json.dumps(unsubscribe_message))
+        await get_stream_manager().unsubscribe([f"{symbol}@aggTrade"])
 
     async def _handle_message(self, message: dict):
         """จัดการข้อความที่ได้รับจาก WebSocket"""
@@ -119,24 +83,20 @@ class BinancePriceTracker:
             if 'e' in message and message['e'] == 'aggTrade':
                 symbol = message['s'].lower()
                 price = float(message['p'])
-                
-                async with self._lock:
-                    self.prices[symbol] = price
-                    self._last_update[symbol] = datetime.now()
-
-                # เรียกใช้ callbacks สำหรับเหรียญนี้
-                for callback in self.callbacks[symbol]:
-                    try:
-                        await callback(symbol, price)
-                    except Exception as e:
-                        self.logger.error(f"เกิดข้อผิดพลาดใน callback ของ {symbol}: {str(e)}")
+                # ไม่มี await ระหว่างอัพเดท จึงไม่ต้องใช้ lock
+                self.prices[symbol] = price
+                self._last_update[symbol] = time.time()
+
+                # ส่งให้ callbacks ผ่าน mailbox (ถ้า callback ยังทำงานไม่เสร็จจะได้เฉพาะราคาล่าสุด)
+                get_callback_dispatcher().post(('price', symbol), self.callbacks.get(symbol), symbol, price)
 
         except Exception as e:
             self.logger.error(f"เกิดข้อผิดพลาดในการประมวลผลข้อความ: {str(e)}")
 
     def get_last_update_time(self, symbol: str) -> Optional[datetime]:
         """ดึงเวลาอัพเดทล่าสุดของเหรียญ"""
-        return self._last_update.get(symbol.lower())
+        last_update = self._last_update.get(symbol.lower())
+        return datetime.fromtimestamp(last_update) if last_update is not None else None
 
 # Singleton instance
 _price_tracker: Optional[BinancePriceTracker] = None
@@ -1,17 +1,20 @@
-import json
 import asyncio
-import pytz
-import websockets
 from typing import Dict, Set, Optional, List
-from datetime import datetime
 import logging
-from collections import defaultdict, deque
-from config import api_key, api_secret
+from collections import defaultdict
+import numpy as np
+from config import KLINE_BACKFILL_BATCH, KLINE_BACKFILL_CONCURRENCY, KLINE_BACKFILL_DELAY, api_key, api_secret
 
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.order.other.get_user_data import to_exchange_symbol
+from function.binance.futures.system.callback_dispatcher import get_callback_dispatcher
+from function.binance.futures.system.exchange_pool import get_exchange_pool
+from function.binance.futures.system.ohlcv_cache import get_timeframe_ms
+from function.binance.futures.system.stream_manager import get_stream_manager
 from function.message import message
 
 class KlineData:
+    __slots__ = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'is_closed')
+
     def __init__(self, data: dict):
         self.open_time = int(data['t'])  # Kline start time
         self.open = float(data['o'])     # Open price
@@ -33,22 +36,89 @@ class KlineData:
             self.volume
         ]
 
+KLINE_COLUMNS = 6  # open_time, open, high, low, close, volume (ลำดับเดียวกับ fetch_ohlcv และ OHLCV cache)
+
+class KlineBuffer:
+    """แท่งเทียนของ symbol/timeframe เดียวใน array float64 ขนาด (max_candles, 6) หรือ 48 byte ต่อแท่ง
+
+    แท่งที่กำลังก่อตัวถูกเขียนทับในแถวเดิม เมื่อเต็มแล้วมีแท่งใหม่จะเลื่อนข้อมูลขึ้นหนึ่งแถว
+    (ครั้งเดียวต่อแท่ง) ข้อมูลจึงเรียงต่อกันใน memory เสมอ และผู้อ่านได้ view โดยไม่ต้อง copy
+    """
+    __slots__ = ('data', 'size')
+
+    def __init__(self, max_candles: int):
+        self.data = np.zeros((max_candles, KLINE_COLUMNS))
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        return int(self.data[self.size - 1, 0]) if self.size else None
+
+    def update(self, open_time, open_price, high, low, close, volume) -> bool:
+        """เพิ่มแท่งใหม่หรืออัพเดทแท่งล่าสุด คืน False ถ้าเป็นแท่งเก่ากว่าแท่งล่าสุด"""
+        size = self.size
+        if size:
+            last_open_time = self.data[size - 1, 0]
+            if open_time < last_open_time:
+                return False
+            if open_time > last_open_time:
+                if size == len(self.data):
+                    self.data[:-1] = self.data[1:]
+                else:
+                    size = self.size = size + 1
+        else:
+            size = self.size = 1
+        self.data[size - 1] = (open_time, open_price, high, low, close, volume)
+        return True
+
+    def load(self, ohlcv: List[list]):
+        """ใส่แท่งจาก REST API (ประวัติเริ่มต้นหรือช่วงที่ขาดหาย) แทนที่แท่งเดิมที่ open_time ซ้ำกัน
+
+        แท่งอื่นที่มีอยู่แล้ว (เช่นแท่งจาก websocket ที่ใหม่กว่า) ยังอยู่ เรียงตามเวลาเหมือนเดิม
+        """
+        if not len(ohlcv):
+            return
+        history = np.asarray(ohlcv, dtype=float)[:, :KLINE_COLUMNS]
+        existing = self.view()
+        existing = existing[~np.isin(existing[:, 0], history[:, 0])]
+        rows = np.concatenate([history, existing])
+        rows = rows[np.argsort(rows[:, 0], kind='stable')][-len(self.data):]
+        self.data[:len(rows)] = rows
+        self.size = len(rows)
+
+    def view(self, limit: int = None) -> np.ndarray:
+        """view แบบอ่านอย่างเดียวของ limit แท่งล่าสุด (ใช้ได้จนกว่าจะมีแท่งใหม่ครั้งถัดไป)"""
+        start = max(self.size - limit, 0) if limit else 0
+        view = self.data[start:self.size]
+        view.flags.writeable = False
+        return view
+
+def ohlcv_to_list(ohlcv: np.ndarray) -> List[list]:
+    """แปลง array ของแท่งเทียนเป็น list แบบเดียวกับ ccxt (open_time เป็น int ไม่ใช่ float)"""
+    return [[int(row[0]), *row[1:]] for row in ohlcv.tolist()]
+
 class BinanceKlineTracker:
     def __init__(self, max_candles: int = 1000):
-        self.ws_url = "wss://fstream.binance.com/ws"
         self.subscribed_pairs: Dict[str, Set[str]] = defaultdict(set)  # symbol -> set of timeframes
-        self.klines: Dict[str, Dict[str, deque]] = defaultdict(lambda: defaultdict(lambda: deque(maxlen=max_candles)))
-        self.websocket = None
+        self.klines: Dict[str, Dict[str, KlineBuffer]] = defaultdict(lambda: defaultdict(lambda: KlineBuffer(max_candles)))
         self.is_running = False
         self.callbacks = defaultdict(lambda: defaultdict(list))
+        self.close_callbacks = defaultdict(lambda: defaultdict(list))  # เรียกครั้งเดียวต่อแท่งที่ปิด
+        self._last_closed_open_time: Dict[tuple, int] = {}  # (symbol, timeframe) -> open_time ของแท่งที่ปิดล่าสุดที่ส่ง event แล้ว
         self.logger = self._setup_logger()
-        self._lock = asyncio.Lock()
         self._initialized_pairs: Set[tuple] = set()  # เก็บคู่ symbol/timeframe ที่โหลดข้อมูลเริ่มต้นแล้ว
-        self.local_tz = pytz.timezone('Asia/Bangkok')
+        self._gaps: Dict[tuple, List[tuple]] = defaultdict(list)  # (symbol, timeframe) -> ช่วง (start, end) ที่รอ backfill
+        self._backfilling: Set[tuple] = set()  # คู่ที่กำลังดึงแท่งที่ขาดหาย
+        self._known_holes: Dict[tuple, Set[float]] = defaultdict(set)  # open_time ก่อนช่วงที่ REST ก็ไม่มีแท่ง
+        self._backfill_task: Optional[asyncio.Task] = None
+        self._intervals: Dict[str, int] = {}
 
     async def initialize_symbol_data(self, symbol: str, timeframe: str):
         """โหลดข้อมูลเริ่มต้นจาก API"""
-        if (symbol, timeframe) in self._initialized_pairs:
+        if (symbol.lower(), timeframe) in self._initialized_pairs:
             return
 
         try:
@@ -56,36 +126,22 @@ class BinanceKlineTracker:
             if 'USDT' in exchange_symbol and '/USDT:USDT' not in exchange_symbol:
                 exchange_symbol = exchange_symbol.replace('USDT', '/USDT:USDT')
             
-            exchange = await create_future_exchange(api_key, api_secret)
+            exchange = await get_exchange_pool().acquire(api_key, api_secret)
             
             try:
                 # เพิ่มจำนวนแท่งเทียนเป็น 300
                 ohlcv = await exchange.fetch_ohlcv(exchange_symbol, timeframe, limit=300)
                 
                 if ohlcv and len(ohlcv) > 0:
-                    async with self._lock:
-                        for candle in ohlcv:
-                            kline = KlineData({
-                                't': candle[0],
-                                'T': candle[0] + exchange.parse_timeframe(timeframe) * 1000 - 1,
-                                'o': str(candle[1]),
-                                'h': str(candle[2]),
-                                'l': str(candle[3]),
-                                'c': str(candle[4]),
-                                'v': str(candle[5]),
-                                'x': True
-                            })
-                            self.klines[symbol.lower()][timeframe].append(kline)
+                    self.klines[symbol.lower()][timeframe].load(ohlcv)
                     
-                    self._initialized_pairs.add((symbol, timeframe))
+                    self._initialized_pairs.add((symbol.lower(), timeframe))
                     #message(symbol, f"โหลดข้อมูล {len(ohlcv)} แท่งเทียนสำหรับ {timeframe} สำเร็จ", "blue")
                 else:
                     message(symbol, f"ไม่สามารถโหลดข้อมูลเริ่มต้นสำหรับ {symbol} {timeframe}", "yellow")
 
             except Exception as e:
                 raise e
-            finally:
-                await exchange.close()
 
         except Exception as e:
             self.logger.error(f"เกิดข้อผิดพลาดในการโหลดข้อมูลเริ่มต้น {symbol} {timeframe}: {str(e)}")
@@ -120,89 +176,62 @@ class BinanceKlineTracker:
             asyncio.create_task(self._send_unsubscription(clean_symbol, timeframe))
 
     async def get_klines(self, symbol: str, timeframe: str, limit: int = None) -> List[list]:
-        """ดึงข้อมูลแท่งเทียนล่าสุด"""
-        clean_symbol = symbol.lower()
-        async with self._lock:
-            klines = list(self.klines[clean_symbol][timeframe])
-            if limit:
-                return [k.to_ohlcv() for k in klines[-limit:]]
-            return [k.to_ohlcv() for k in klines]
+        """ดึงข้อมูลแท่งเทียนล่าสุดเป็น list (copy ที่ผู้เรียกเก็บไว้ใช้ต่อได้)"""
+        return ohlcv_to_list(self.get_kline_array(symbol, timeframe, limit))
+
+    def get_kline_array(self, symbol: str, timeframe: str, limit: int = None) -> np.ndarray:
+        """view ของแท่งเทียนล่าสุด (N, 6) แบบไม่ copy ต้องใช้ให้เสร็จก่อน await ครั้งถัดไป"""
+        return self.klines[symbol.lower()][timeframe].view(limit)
 
     def add_kline_callback(self, symbol: str, timeframe: str, callback):
         """เพิ่ม callback function เมื่อได้รับข้อมูลแท่งเทียนใหม่"""
         clean_symbol = symbol.lower()
         self.callbacks[clean_symbol][timeframe].append(callback)
 
+    def add_candle_close_callback(self, symbol: str, timeframe: str, callback):
+        """เพิ่ม callback ที่จะถูกเรียกครั้งเดียวเมื่อแท่งเทียนปิด (x = true)"""
+        clean_symbol = symbol.lower()
+        self.close_callbacks[clean_symbol][timeframe].append(callback)
+
     async def start(self):
-        """เริ่มการเชื่อมต่อ WebSocket และติดตามแท่งเทียน"""
+        """เริ่มติดตามแท่งเทียนผ่าน combined stream ที่ใช้ร่วมกับ tracker อื่น"""
         if self.is_running:
             return
 
         self.is_running = True
-        try:
-            while self.is_running:
-                try:
-                    async with websockets.connect(self.ws_url) as websocket:
-                        self.websocket = websocket
-                        #self.logger.info("เชื่อมต่อ WebSocket สำเร็จ")
-
-                        # สมัครติดตามทุกคู่เหรียญและ timeframe
-                        for symbol, timeframes in self.subscribed_pairs.items():
-                            for timeframe in timeframes:
-                                await self._send_subscription(symbol, timeframe)
-
-                        while self.is_running:
-                            try:
-                                message = await websocket.recv()
-                                await self._handle_message(json.loads(message))
-                            except websockets.exceptions.ConnectionClosed:
-                                self.logger.warning("การเชื่อมต่อ WebSocket ถูกปิด กำลังพยายามเชื่อมต่อใหม่...")
-                                break
-                            except Exception as e:
-                                self.logger.error(f"เกิดข้อผิดพลาดในการจัดการข้อความ: {str(e)}")
-
-                except Exception as e:
-                    self.logger.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ WebSocket: {str(e)}")
-                    if self.is_running:
-                        self.logger.info("กำลังพยายามเชื่อมต่อใหม่ในอีก 5 วินาที...")
-                        await asyncio.sleep(5)
-        finally:
-            self.websocket = None
+        stream_manager = get_stream_manager()
+        stream_manager.add_handler('kline', self._handle_message)
+        await stream_manager.subscribe(self._get_streams())
+        await stream_manager.start()
 
     async def stop(self):
-        """หยุดการเชื่อมต่อ WebSocket"""
+        """หยุดการติดตามแท่งเทียน และปิด connection ถ้าไม่มี tracker อื่นใช้อยู่"""
         self.is_running = False
-        if self.websocket:
-            try:
-                await self.websocket.close()
-            except Exception as e:
-                self.logger.error(f"เกิดข้อผิดพลาดในการปิด WebSocket: {str(e)}")
-            finally:
-                self.websocket = None
+        if self._backfill_task is not None:
+            self._backfill_task.cancel()
+            await asyncio.gather(self._backfill_task, return_exceptions=True)
+            self._backfill_task = None
+        stream_manager = get_stream_manager()
+        stream_manager.remove_handler('kline', self._handle_message)
+        await stream_manager.unsubscribe(self._get_streams())
+        if not stream_manager.streams:
+            await stream_manager.stop()
+
+    def _get_streams(self) -> List[str]:
+        """รายชื่อ stream ของทุกคู่เหรียญและ timeframe ที่ติดตามอยู่"""
+        return [
+            f"{symbol}@kline_{timeframe}"
+            for symbol, timeframes in self.subscribed_pairs.items()
+            for timeframe in timeframes
+        ]
 
     async def _send_subscription(self, symbol: str, timeframe: str):
         """ส่งคำสั่งสมัครติดตามแท่งเทียน"""
-        if not self.websocket:
-            return
-
-        subscribe_message = {
-            "method": "SUBSCRIBE",
-            "params": [f"{symbol}@kline_{timeframe}"],
-            "id": 1
-        }
-        await self.websocket.send(json.dumps(subscribe_message))
+        await get_stream_manager().subscribe([f"{symbol}@kline_{timeframe}"])
 
     async def _send_unsubscription(self, symbol: str, timeframe: str):
         """ส่งคำสั่งยกเลิกการติดตามแท่งเทียน"""
-        if not self.websocket:
-            return
-
-        unsubscribe_message = {
-            "method": "UNSUBSCRIBE",
-            "params": [f"{symbol}@kline_{timeframe}"],
-            "id": 1
-        }
-        await self.websocket.send(json.dumps(unsubscribe_message))
+        await get_stream_manager().unsubscribe([f"{symbol}@kline_{timeframe}"])
 
     async def _handle_message(self, message: dict):
             try:
@@ -210,38 +239,134 @@ class BinanceKlineTracker:
                     symbol = message['s'].lower()
                     kline_data = message['k']
                     timeframe = kline_data['i']
-                    
-                    # แปลงเวลาเป็น local timezone
-                    kline_data['t'] = datetime.fromtimestamp(
-                        int(kline_data['t'])/1000, 
-                        tz=pytz.UTC
-                    ).astimezone(self.local_tz).timestamp() * 1000
-                    
-                    kline_data['T'] = datetime.fromtimestamp(
-                        int(kline_data['T'])/1000, 
-                        tz=pytz.UTC
-                    ).astimezone(self.local_tz).timestamp() * 1000
-                    
+                    # t/T เป็น epoch ms (UTC) อยู่แล้ว แปลงเป็นเวลาไทยเฉพาะตอนแสดงผล
                     kline = KlineData(kline_data)
-                    
-                    async with self._lock:
-                        # อัพเดทหรือเพิ่มแท่งเทียนใหม่
-                        klines = self.klines[symbol][timeframe]
-                        if not klines or klines[-1].open_time != kline.open_time:
-                            klines.append(kline)
-                        else:
-                            klines[-1] = kline
-
-                    # เรียกใช้ callbacks
-                    for callback in self.callbacks[symbol][timeframe]:
-                        try:
-                            await callback(symbol, timeframe, kline)
-                        except Exception as e:
-                            self.logger.error(f"เกิดข้อผิดพลาดใน callback ของ {symbol} {timeframe}: {str(e)}")
+
+                    klines = self.klines[symbol][timeframe]
+                    last_open_time = klines.last_open_time
+                    interval = self._get_interval(timeframe)
+                    if last_open_time is not None and kline.open_time - last_open_time > interval:
+                        # แท่งระหว่างที่หลุดการเชื่อมต่อไม่มีใน websocket ต้องดึงจาก REST
+                        # (รวมแท่งล่าสุดก่อนหลุดซึ่งอาจยังไม่ได้ค่าปิดสุดท้าย)
+                        self._add_gap(symbol, timeframe, last_open_time, kline.open_time - interval)
+
+                    # อัพเดทแท่งที่กำลังก่อตัวในที่เดิมหรือเพิ่มแท่งใหม่
+                    if not klines.update(
+                        kline.open_time, kline.open, kline.high, kline.low, kline.close, kline.volume
+                    ):
+                        # ข้อความของแท่งเก่าที่ส่งซ้ำมา ไม่ต้องประมวลผล
+                        return
+
+                    # ส่งให้ callbacks ผ่าน mailbox (ถ้า callback ยังทำงานไม่เสร็จจะได้เฉพาะแท่งล่าสุด)
+                    get_callback_dispatcher().post(
+                        ('kline', symbol, timeframe), self.callbacks[symbol].get(timeframe), symbol, timeframe, kline
+                    )
+
+                    # ส่ง event แท่งเทียนปิดครั้งเดียวต่อแท่ง (กันข้อความซ้ำตอน reconnect)
+                    if kline.is_closed:
+                        await self._dispatch_candle_close(symbol, timeframe, kline)
 
             except Exception as e:
                 self.logger.error(f"เกิดข้อผิดพลาดในการประมวลผลข้อความ: {str(e)}")
 
+    async def _dispatch_candle_close(self, symbol: str, timeframe: str, kline: KlineData):
+        """เรียก close callbacks ถ้าแท่งนี้ยังไม่เคยถูกส่ง event"""
+        last_open_time = self._last_closed_open_time.get((symbol, timeframe))
+        if last_open_time is not None and kline.open_time <= last_open_time:
+            return
+        self._last_closed_open_time[(symbol, timeframe)] = kline.open_time
+
+        # แท่งที่ปิดต้องส่งครบทุกแท่งตามลำดับ จึงไม่ conflate
+        get_callback_dispatcher().post(
+            ('close', symbol, timeframe), self.close_callbacks[symbol].get(timeframe), symbol, timeframe, kline,
+            conflate=False
+        )
+
+    def _get_interval(self, timeframe: str) -> int:
+        interval = self._intervals.get(timeframe)
+        if interval is None:
+            interval = self._intervals[timeframe] = get_timeframe_ms(timeframe)
+        return interval
+
+    def has_gap(self, symbol: str, timeframe: str) -> bool:
+        """True ถ้ามีช่วงแท่งเทียนที่ขาดหายซึ่งรอหรือกำลัง backfill"""
+        key = (symbol.lower(), timeframe)
+        return key in self._gaps or key in self._backfilling
+
+    def is_contiguous(self, symbol: str, timeframe: str) -> bool:
+        """True ถ้าแท่งเทียนใน buffer ต่อเนื่องกันทั้งหมด ถ้าพบช่วงที่ขาดจะเริ่ม backfill และคืน False"""
+        if self.has_gap(symbol, timeframe):
+            return False
+        holes = self._find_holes(symbol.lower(), timeframe)
+        for start, end in holes:
+            self._add_gap(symbol.lower(), timeframe, start, end)
+        return not holes
+
+    def _find_holes(self, symbol: str, timeframe: str) -> List[tuple]:
+        """ช่วง (start, end) ของแท่งที่ขาดใน buffer ยกเว้นช่วงที่ REST ยืนยันแล้วว่าไม่มีแท่ง"""
+        open_times = self.klines[symbol][timeframe].view()[:, 0]
+        interval = self._get_interval(timeframe)
+        known_holes = self._known_holes.get((symbol, timeframe), ())
+        return [
+            (open_times[i] + interval, open_times[i + 1] - interval)
+            for i in np.flatnonzero(np.diff(open_times) > interval)
+            if open_times[i] not in known_holes
+        ]
+
+    def _add_gap(self, symbol: str, timeframe: str, start: float, end: float):
+        """บันทึกช่วงที่ขาดและเริ่ม task backfill (ช่วงของทุกเหรียญจะถูกดึงรวมในรอบเดียวกัน)"""
+        self._gaps[(symbol, timeframe)].append((start, end))
+        message(symbol.upper(), f"พบแท่งเทียน {timeframe} ขาดหาย {int((end - start) // self._get_interval(timeframe)) + 1} แท่ง กำลังดึงย้อนหลัง", "yellow")
+        if self._backfill_task is None or self._backfill_task.done():
+            self._backfill_task = asyncio.create_task(self._run_backfill())
+
+    async def _run_backfill(self):
+        """ดึงแท่งที่ขาดหายของทุกคู่พร้อมกัน จำกัดจำนวน request พร้อมกันด้วย semaphore"""
+        semaphore = asyncio.Semaphore(KLINE_BACKFILL_CONCURRENCY)
+        while self._gaps:
+            # รอให้ทุก shard เชื่อมต่อใหม่และพบช่วงที่ขาดของทุกเหรียญก่อน แล้วดึงรวมในรอบเดียว
+            await asyncio.sleep(KLINE_BACKFILL_DELAY)
+            gaps, self._gaps = self._gaps, defaultdict(list)
+            self._backfilling.update(gaps)
+            try:
+                await asyncio.gather(*(
+                    self._backfill_pair(symbol, timeframe, ranges, semaphore)
+                    for (symbol, timeframe), ranges in gaps.items()
+                ))
+            finally:
+                self._backfilling.difference_update(gaps)
+
+    async def _backfill_pair(self, symbol: str, timeframe: str, ranges: List[tuple], semaphore: asyncio.Semaphore):
+        """ดึงเฉพาะช่วงที่ขาดของคู่เดียวจาก REST (หลายช่วงรวมเป็นช่วงเดียว) ถ้าล้มเหลวจะลองใหม่รอบถัดไป"""
+        interval = self._get_interval(timeframe)
+        start = min(gap_start for gap_start, _ in ranges)
+        end = max(gap_end for _, gap_end in ranges)
+        rows = []
+        try:
+            async with semaphore:
+                exchange = await get_exchange_pool().acquire(api_key, api_secret)
+                since = start
+                while since <= end:
+                    limit = min(int((end - since) // interval) + 1, KLINE_BACKFILL_BATCH)
+                    ohlcv = await exchange.fetch_ohlcv(to_exchange_symbol(symbol), timeframe, since=int(since), limit=limit)
+                    ohlcv = [candle for candle in ohlcv if since <= candle[0] <= end]
+                    if not ohlcv:
+                        break
+                    rows.extend(ohlcv)
+                    since = ohlcv[-1][0] + interval
+        except Exception as e:
+            self.logger.error(f"เกิดข้อผิดพลาดในการดึงแท่งเทียนที่ขาดหาย {symbol} {timeframe}: {str(e)}")
+            self._gaps[(symbol, timeframe)].extend(ranges)
+            return
+
+        self.klines[symbol][timeframe].load(rows)
+        # ช่วงที่ REST ก็ไม่มีแท่ง (เช่น exchange ปิดปรับปรุง) ถือว่าต่อเนื่องแล้ว ไม่ต้องดึงซ้ำ
+        holes = [hole for hole in self._find_holes(symbol, timeframe) if start <= hole[0] <= end + interval]
+        for hole_start, hole_end in holes:
+            self._known_holes[(symbol, timeframe)].add(hole_start - interval)
+        message(symbol.upper(), f"ดึงแท่งเทียน {timeframe} ที่ขาดหาย {len(rows)} แท่งสำเร็จ"
+                        + (f" (exchange ไม่มีข้อมูล {len(holes)} ช่วง)" if holes else ""), "blue")
+
 # Singleton instance
 _kline_tracker: Optional[BinanceKlineTracker] = None
 
@@ -252,8 +377,8 @@ def get_kline_tracker() -> BinanceKlineTracker:
         _kline_tracker = BinanceKlineTracker()
     return _kline_tracker
 
-async def fetch_ohlcv(symbol: str, timeframe: str, limit: int = None):
-    """ดึงข้อมูล OHLCV โดยใช้ WebSocket หรือ API"""
+async def fetch_ohlcv_array(symbol: str, timeframe: str, limit: int = None) -> np.ndarray:
+    """เหมือน fetch_ohlcv แต่คืน view ของ array ใน tracker (ไม่ copy)"""
     tracker = get_kline_tracker()
     symbol = symbol.lower()
     
@@ -266,11 +391,14 @@ async def fetch_ohlcv(symbol: str, timeframe: str, limit: int = None):
         for _ in range(100):  # 100 * 0.1 = 10 วินาที
             if (symbol, timeframe) in tracker._initialized_pairs:
                 # รอให้มีข้อมูลพอสำหรับ ATR ระยะยาว
-                klines = await tracker.get_klines(symbol, timeframe)
-                if len(klines) >= 200:  # ตรวจสอบว่ามีข้อมูลพอ
+                if len(tracker.klines[symbol][timeframe]) >= 200:  # ตรวจสอบว่ามีข้อมูลพอ
                     break
             await asyncio.sleep(0.1)
         else:
             message(symbol, f"ไม่สามารถโหลดข้อมูลเริ่มต้นได้ภายในเวลาที่กำหนด", "yellow")
     
-    return await tracker.get_klines(symbol, timeframe, limit)
\ No newline at end of file
+    return tracker.get_kline_array(symbol, timeframe, limit)
+
+async def fetch_ohlcv(symbol: str, timeframe: str, limit: int = None):
+    """ดึงข้อมูล OHLCV โดยใช้ WebSocket หรือ API"""
+    return ohlcv_to_list(await fetch_ohlcv_array(symbol, timeframe, limit))
\ No newline at end of file
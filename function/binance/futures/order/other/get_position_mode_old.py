@@ -1,13 +1,8 @@
-import ccxt.async_support as ccxt
-from config import default_testnet as testnet
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.system.exchange_pool import get_exchange
 
 async def get_position_mode(api_key, api_secret, symbol):
-    exchange = await create_future_exchange(api_key, api_secret)
-
-    positions = await exchange.fetch_positions()
-
-    await exchange.close()
+    async with get_exchange(api_key, api_secret) as exchange:
+        positions = await exchange.fetch_positions()
 
     if positions:
         for position in positions:
@@ -16,4 +11,4 @@ async def get_position_mode(api_key, api_secret, symbol):
                     return 'oneway'
                 else:
                     return 'hedge'
-    return 'oneway'
\ No newline at end of file
+    return 'oneway'
@@ -1,10 +1,12 @@
-import ccxt.async_support as ccxt
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.order.other.get_user_data import get_user_data_tracker
+from function.binance.futures.system.exchange_pool import get_exchange
 
 async def get_position_side(api_key, api_secret, symbol):
     try:
-        # สร้าง exchange object
-        exchange = await create_future_exchange(api_key, api_secret)
+        # ใช้ข้อมูลจาก user data stream ถ้า sync แล้ว (ไม่ต้องเรียก REST)
+        tracker = get_user_data_tracker()
+        if tracker.is_ready_for(api_key):
+            return tracker.get_position_side(symbol)
 
         # แปลง symbol เป็นรูปแบบที่ exchange ใช้
         exchange_symbol = symbol
@@ -12,10 +14,8 @@ async def get_position_side(api_key, api_secret, symbol):
             exchange_symbol = symbol.replace("USDT", "/USDT:USDT")
 
         # ดึงข้อมูลตำแหน่งทั้งหมด
-        positions = await exchange.fetch_positions([exchange_symbol])
-
-        # ปิด connection
-        await exchange.close()
+        async with get_exchange(api_key, api_secret) as exchange:
+            positions = await exchange.fetch_positions([exchange_symbol])
 
         # ตรวจสอบตำแหน่งที่เปิดอยู่
         for position in positions:
@@ -32,4 +32,4 @@ async def get_position_side(api_key, api_secret, symbol):
 
     except Exception as e:
         print(f"เกิดข้อผิดพลาดในการดึงข้อมูลตำแหน่ง: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,373 @@
+import asyncio
+import logging
+import random
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import websockets
+
+from config import USER_DATA_KEEPALIVE_INTERVAL, default_testnet
+from function.binance.futures.system.exchange_pool import get_exchange_pool
+from function.binance.futures.system.stream_decoder import get_json_loads
+
+CLOSED_ORDER_STATUSES = {'FILLED', 'CANCELED', 'EXPIRED', 'EXPIRED_IN_MATCH', 'REJECTED'}
+
+def to_market_id(symbol: str) -> str:
+    """แปลง symbol เป็นรูปแบบที่ Binance ใช้ใน event (เช่น ADA/USDT:USDT -> ADAUSDT)"""
+    return symbol.split(':')[0].replace('/', '').upper()
+
+def to_exchange_symbol(symbol: str) -> str:
+    """แปลง symbol เป็นรูปแบบที่ ccxt ใช้ (เช่น ADAUSDT -> ADA/USDT:USDT)"""
+    symbol = symbol.upper()
+    if 'USDT' in symbol and '/USDT:USDT' not in symbol:
+        return symbol.replace('USDT', '/USDT:USDT')
+    return symbol
+
+def _parse_order_update(order: dict) -> dict:
+    """แปลง order จาก ORDER_TRADE_UPDATE ให้อยู่ในรูปแบบเดียวกับ ccxt fetch_open_orders"""
+    info = {
+        'orderId': str(order['i']),
+        'symbol': order['s'],
+        'status': order['X'],
+        'clientOrderId': order.get('c'),
+        'price': order.get('p'),
+        'avgPrice': order.get('ap'),
+        'origQty': order.get('q'),
+        'executedQty': order.get('z'),
+        'type': order.get('o'),
+        'origType': order.get('ot'),
+        'side': order.get('S'),
+        'positionSide': order.get('ps'),
+        'reduceOnly': order.get('R', False),
+        'closePosition': order.get('cp', False),
+        'stopPrice': order.get('sp'),
+        'timeInForce': order.get('f'),
+        'workingType': order.get('wt'),
+        'updateTime': order.get('T'),
+    }
+    amount = float(order.get('q') or 0)
+    filled = float(order.get('z') or 0)
+    stop_price = float(order.get('sp') or 0) or None
+    return {
+        'id': info['orderId'],
+        'clientOrderId': info['clientOrderId'],
+        'symbol': to_exchange_symbol(order['s']),
+        'timestamp': order.get('T'),
+        'type': (order.get('o') or '').lower(),
+        'side': (order.get('S') or '').lower(),
+        'price': float(order.get('p') or 0),
+        'average': float(order.get('ap') or 0) or None,
+        'amount': amount,
+        'filled': filled,
+        'remaining': amount - filled,
+        'status': order['X'].lower(),
+        'reduceOnly': info['reduceOnly'],
+        'stopPrice': stop_price,
+        'triggerPrice': stop_price,
+        'info': info,
+    }
+
+class BinanceUserDataTracker:
+    """ติดตาม position, open orders และ balance ของบัญชีผ่าน user data stream (listenKey)"""
+    def __init__(self, keepalive_interval: int = USER_DATA_KEEPALIVE_INTERVAL, testnet: bool = default_testnet):
+        self.ws_url = "wss://stream.binancefuture.com/ws" if testnet else "wss://fstream.binance.com/ws"
+        self.keepalive_interval = keepalive_interval
+        self.api_key = None
+        self.api_secret = None
+        self.listen_key: Optional[str] = None
+        self.positions: Dict[str, Dict[str, dict]] = defaultdict(dict)  # market id -> positionSide -> position
+        self._position_times: Dict[str, int] = {}  # market id -> transaction time ของ ACCOUNT_UPDATE ล่าสุด หรือ updateTime จาก snapshot ของ resync
+        self.orders: Dict[str, Dict[str, dict]] = defaultdict(dict)  # market id -> order id -> order
+        self.balances: Dict[str, dict] = {}  # asset -> {wallet_balance, cross_wallet_balance}
+        self.available_balance: Optional[float] = None
+        self.is_running = False
+        self.is_synced = False  # True เมื่อข้อมูลตรงกับ exchange (หลัง resync และยังเชื่อมต่ออยู่)
+        self.last_event_time: Optional[int] = None
+        self.logger = self._setup_logger()
+        self._lock = asyncio.Lock()
+        self._websocket = None
+        self._loads = get_json_loads()
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._balance_refresh_task: Optional[asyncio.Task] = None
+
+    def _setup_logger(self):
+        logger = logging.getLogger('BinanceUserDataTracker')
+        logger.setLevel(logging.INFO)
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        return logger
+
+    def is_ready_for(self, api_key: str) -> bool:
+        """ใช้ข้อมูลจาก stream แทน REST ได้หรือไม่ (ต้องเป็นบัญชีเดียวกันและ sync แล้ว)"""
+        return self.is_synced and api_key == self.api_key
+
+    async def start(self, api_key: str, api_secret: str):
+        """เริ่ม user data stream และรอจนกว่าจะถูกหยุด"""
+        if self.is_running:
+            return
+
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.is_running = True
+        reconnect_delay = 1
+
+        while self.is_running:
+            try:
+                exchange = await get_exchange_pool().acquire(api_key, api_secret)
+                response = await exchange.fapiPrivatePostListenKey()
+                self.listen_key = response['listenKey']
+
+                async with websockets.connect(f"{self.ws_url}/{self.listen_key}") as websocket:
+                    self._websocket = websocket
+                    reconnect_delay = 1
+                    self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+                    # event ที่พลาดไประหว่างหลุดการเชื่อมต่อ ให้ดึงจาก REST ใหม่ทั้งหมด
+                    await self.resync()
+
+                    while self.is_running:
+                        try:
+                            raw_message = await websocket.recv()
+                            if await self._handle_message(self._loads(raw_message)):
+                                break
+                        except websockets.exceptions.ConnectionClosed:
+                            if self.is_running:
+                                self.logger.warning("การเชื่อมต่อ user data stream ถูกปิด กำลังพยายามเชื่อมต่อใหม่...")
+                            break
+                        except Exception as e:
+                            self.logger.error(f"เกิดข้อผิดพลาดในการจัดการข้อความ: {str(e)}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ user data stream: {str(e)}")
+            finally:
+                self.is_synced = False
+                self._websocket = None
+                if self._keepalive_task:
+                    self._keepalive_task.cancel()
+                    self._keepalive_task = None
+
+            if self.is_running:
+                await asyncio.sleep(reconnect_delay + random.uniform(0, reconnect_delay))
+                reconnect_delay = min(reconnect_delay * 2, 60)
+
+    async def stop(self):
+        """ปิด user data stream และคืน listenKey"""
+        self.is_running = False
+        self.is_synced = False
+        for task in (self._keepalive_task, self._balance_refresh_task):
+            if task:
+                task.cancel()
+        if self._websocket:
+            try:
+                await self._websocket.close()
+            except Exception as e:
+                self.logger.error(f"เกิดข้อผิดพลาดในการปิด user data stream: {str(e)}")
+        if self.listen_key and self.api_key:
+            try:
+                exchange = await get_exchange_pool().acquire(self.api_key, self.api_secret)
+                await exchange.fapiPrivateDeleteListenKey()
+            except Exception:
+                pass
+            self.listen_key = None
+
+    async def _keepalive_loop(self):
+        """ต่ออายุ listenKey (หมดอายุใน 60 นาทีถ้าไม่ต่อ)"""
+        while self.is_running:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                exchange = await get_exchange_pool().acquire(self.api_key, self.api_secret)
+                await exchange.fapiPrivatePutListenKey()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"ต่ออายุ listenKey ไม่สำเร็จ: {str(e)}")
+
+    async def resync(self):
+        """โหลด positions, open orders และ balance จาก REST แทนที่ข้อมูลเดิมทั้งหมด"""
+        exchange = await get_exchange_pool().acquire(self.api_key, self.api_secret, warnOnFetchOpenOrdersWithoutSymbol=False)
+        positions, open_orders, balance = await asyncio.gather(
+            exchange.fetch_positions(),
+            exchange.fetch_open_orders(),
+            exchange.fetch_balance()
+        )
+
+        async with self._lock:
+            self.positions.clear()
+            self._position_times.clear()
+            for position in positions:
+                info = position.get('info', {})
+                market_id = info.get('symbol') or to_market_id(position['symbol'])
+                # fill ที่มาระหว่างรอ snapshot และเวลาไม่เกิน updateTime รวมอยู่ใน snapshot แล้ว _apply_fill จะข้ามไป
+                update_time = int(info.get('updateTime', 0) or 0)
+                self._position_times[market_id] = max(update_time, self._position_times.get(market_id, 0))
+                self._set_position(
+                    market_id,
+                    info.get('positionSide', 'BOTH'),
+                    float(info.get('positionAmt', 0) or 0),
+                    float(info.get('entryPrice', 0) or 0),
+                    float(info.get('unRealizedProfit', 0) or 0)
+                )
+
+            self.orders.clear()
+            for order in open_orders:
+                self.orders[to_market_id(order['symbol'])][str(order['id'])] = order
+
+            self.available_balance = float(balance['info']['availableBalance'])
+            for asset in balance['info'].get('assets', []):
+                self.balances[asset['asset']] = {
+                    'wallet_balance': float(asset.get('walletBalance', 0) or 0),
+                    'cross_wallet_balance': float(asset.get('crossWalletBalance', 0) or 0)
+                }
+
+        self.is_synced = True
+        self.logger.info(f"sync ข้อมูลบัญชีสำเร็จ: {sum(len(p) for p in self.positions.values())} positions, {len(open_orders)} orders")
+
+    async def _refresh_available_balance(self):
+        """ACCOUNT_UPDATE ไม่มี availableBalance จึงดึงใหม่หนึ่งครั้งหลังบัญชีเปลี่ยน"""
+        try:
+            await asyncio.sleep(0.5)  # รวม event ที่มาติดกันเป็นการดึงครั้งเดียว
+            exchange = await get_exchange_pool().acquire(self.api_key, self.api_secret)
+            balance = await exchange.fetch_balance()
+            self.available_balance = float(balance['info']['availableBalance'])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"ดึง available balance ไม่สำเร็จ: {str(e)}")
+        finally:
+            self._balance_refresh_task = None
+
+    def _set_position(self, market_id: str, position_side: str, amount: float, entry_price: float, unrealized_pnl: float = 0):
+        if amount == 0:
+            self.positions[market_id].pop(position_side, None)
+            return
+        self.positions[market_id][position_side] = {
+            'amount': amount,
+            'entry_price': entry_price,
+            'unrealized_pnl': unrealized_pnl,
+            'position_side': position_side
+        }
+
+    def _apply_fill(self, data: dict):
+        """ปรับ position จาก fill ใน ORDER_TRADE_UPDATE ซึ่งมักมาก่อน ACCOUNT_UPDATE
+
+        ไม่อย่างนั้นช่วงหลัง entry fill ทันที position จะยังเป็น 0 และคำนวณปริมาณ TP/SL ไม่ได้
+        ACCOUNT_UPDATE ที่มาทีหลังจะเขียนทับด้วยค่าจริงจาก exchange
+        """
+        quantity = float(data.get('l', 0) or 0)
+        if data.get('x') != 'TRADE' or quantity == 0:
+            return
+        market_id = data['s']
+        if data.get('T', 0) <= self._position_times.get(market_id, 0):
+            # ACCOUNT_UPDATE ที่รวม fill นี้แล้วมาถึงก่อน
+            return
+
+        position_side = data.get('ps', 'BOTH')
+        position = self.positions[market_id].get(position_side)
+        amount = position['amount'] if position else 0.0
+        entry_price = position['entry_price'] if position else 0.0
+        signed_quantity = quantity if data['S'] == 'BUY' else -quantity
+        new_amount = round(amount + signed_quantity, 12)
+        price = float(data.get('L', 0) or 0)
+        if amount == 0 or (amount > 0) == (signed_quantity > 0):
+            # เปิดหรือเพิ่ม position: ราคาเฉลี่ยถ่วงน้ำหนัก
+            entry_price = (abs(amount) * entry_price + quantity * price) / abs(new_amount)
+        elif new_amount != 0 and (new_amount > 0) != (amount > 0):
+            # ปิดเกินจนกลับด้าน ราคาเข้าคือราคาของ fill นี้
+            entry_price = price
+        self._set_position(market_id, position_side, new_amount, entry_price,
+                           position['unrealized_pnl'] if position else 0)
+
+    async def _handle_message(self, message: dict) -> bool:
+        """อัพเดทข้อมูลจาก event คืน True ถ้าต้องเชื่อมต่อใหม่"""
+        event_type = message.get('e')
+        if 'E' in message:
+            self.last_event_time = message['E']
+
+        if event_type == 'ACCOUNT_UPDATE':
+            account = message.get('a', {})
+            async with self._lock:
+                for balance in account.get('B', []):
+                    self.balances[balance['a']] = {
+                        'wallet_balance': float(balance['wb']),
+                        'cross_wallet_balance': float(balance['cw'])
+                    }
+                for position in account.get('P', []):
+                    self._position_times[position['s']] = message.get('T', message.get('E', 0))
+                    self._set_position(
+                        position['s'],
+                        position.get('ps', 'BOTH'),
+                        float(position['pa']),
+                        float(position['ep']),
+                        float(position.get('up', 0))
+                    )
+            if self._balance_refresh_task is None:
+                self._balance_refresh_task = asyncio.create_task(self._refresh_available_balance())
+
+        elif event_type == 'ORDER_TRADE_UPDATE':
+            order = _parse_order_update(message['o'])
+            market_id = order['info']['symbol']
+            async with self._lock:
+                self._apply_fill(message['o'])
+                if order['info']['status'] in CLOSED_ORDER_STATUSES:
+                    self.orders[market_id].pop(order['id'], None)
+                else:
+                    self.orders[market_id][order['id']] = order
+
+        elif event_type == 'listenKeyExpired':
+            self.logger.warning("listenKey หมดอายุ กำลังขอ listenKey ใหม่...")
+            return True
+
+        return False
+
+    def get_position_side(self, symbol: str) -> Optional[str]:
+        """ทิศทาง position ที่เปิดอยู่ ('buy' / 'sell' / None) เหมือน get_position_side"""
+        amount = self.get_position_amount(symbol)
+        if amount > 0:
+            return 'buy'
+        if amount < 0:
+            return 'sell'
+        return None
+
+    def get_position_amount(self, symbol: str) -> float:
+        """จำนวน position (บวก = long, ลบ = short)"""
+        positions = self.positions.get(to_market_id(symbol), {})
+        for position in positions.values():
+            if position['position_side'] == 'SHORT':
+                return -abs(position['amount'])
+            return position['amount']
+        return 0
+
+    def get_open_orders(self, symbol: str) -> List[dict]:
+        """open orders ของเหรียญ ในรูปแบบเดียวกับ ccxt"""
+        return list(self.orders.get(to_market_id(symbol), {}).values())
+
+    def get_available_balance(self) -> Optional[float]:
+        return self.available_balance
+
+    def get_stoploss(self, symbol: str) -> Optional[float]:
+        """ราคา stop market ที่ปิด position ปัจจุบัน"""
+        side = self.get_position_side(symbol)
+        if side is None:
+            return None
+        close_side = 'sell' if side == 'buy' else 'buy'
+        for order in self.get_open_orders(symbol):
+            if order['type'] == 'stop_market' and order['side'] == close_side:
+                stop_price = order.get('stopPrice') or order.get('info', {}).get('stopPrice')
+                if stop_price:
+                    return float(stop_price)
+        return None
+
+# Singleton instance
+_user_data_tracker: Optional[BinanceUserDataTracker] = None
+
+def get_user_data_tracker() -> BinanceUserDataTracker:
+    """ดึงหรือสร้าง instance ของ user data tracker"""
+    global _user_data_tracker
+    if _user_data_tracker is None:
+        _user_data_tracker = BinanceUserDataTracker()
+    return _user_data_tracker
@@ -1,12 +1,12 @@
 import traceback
 import ccxt.async_support as ccxt
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.system.exchange_pool import get_exchange_pool
 from function.message import message
 
 async def swap_position_side(api_key, api_secret, symbol):
     try:
-        # สร้าง exchange object
-        exchange = await create_future_exchange(api_key, api_secret)
+        # ดึง exchange จาก pool
+        exchange = await get_exchange_pool().acquire(api_key, api_secret)
 
         # ดึงข้อมูลตำแหน่งปัจจุบัน
         positions = await exchange.fetch_positions([symbol])
@@ -20,7 +20,6 @@ async def swap_position_side(api_key, api_secret, symbol):
 
         if current_position is None:
             print(f"ไม่พบตำแหน่งที่เปิดอยู่สำหรับ {symbol}")
-            await exchange.close()
             return None
 
         # คำนวณขนาดตำแหน่งใหม่ (ใช้ค่าสัมบูรณ์เพื่อให้แน่ใจว่าเป็นค่าบวกเสมอ)
@@ -37,8 +36,6 @@ async def swap_position_side(api_key, api_secret, symbol):
             params={'reduceOnly': False}
         )
 
-        await exchange.close()
-
         #print(f"เปลี่ยนตำแหน่งสำเร็จ: จาก {current_position['side']} เป็น {new_side}")
         return order
 
@@ -48,6 +45,4 @@ async def swap_position_side(api_key, api_secret, symbol):
         message(symbol, "________________________________", "red")
         message(symbol, f"Error: {error_traceback}", "red")
         message(symbol, "________________________________", "red")
-        return None
-    finally:
-        await exchange.close()
\ No newline at end of file
+        return None
\ No newline at end of file
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Set
+
+from config import CALLBACK_DISPATCH_WORKERS
+
+class CallbackDispatcher:
+    """ส่งข้อมูลจาก websocket ให้ callback ผ่าน mailbox ต่อ key แยกจากลูปที่อ่าน socket
+
+    tracker อัพเดทข้อมูลของตัวเองทันทีที่ได้รับข้อความ แล้ว post() งานไว้ใน mailbox ของ key
+    (เช่น ('price', 'adausdt')) worker เรียก callback ของแต่ละ key ตามลำดับ ไม่ทำ key เดียวกันซ้อนกัน
+    callback ที่ช้าจึงไม่ทำให้การอ่าน socket หรือเหรียญอื่นต้องรอ
+
+    mailbox แบบ conflate เก็บเฉพาะค่าล่าสุด ค่าที่ยังไม่ได้ส่งจะถูกแทนที่ (นับเป็น drop)
+    ส่วนแบบไม่ conflate (แท่งเทียนปิด) เก็บทุกค่าตามลำดับ
+    """
+    def __init__(self, workers: int = CALLBACK_DISPATCH_WORKERS):
+        self.num_workers = workers
+        self.logger = self._setup_logger()
+        self._mailboxes: Dict[tuple, deque] = {}  # key -> (callbacks, args) ที่ยังไม่ได้ส่ง
+        self._in_flight: Set[tuple] = set()  # key ที่ worker กำลังเรียก callback อยู่
+        self._ready: Optional[asyncio.Queue] = None  # key ที่มีงานรอและยังไม่มี worker ถืออยู่
+        self._workers: List[asyncio.Task] = []
+        self.depth = 0  # จำนวนงานที่รอส่งทั้งหมด
+        self.max_depth = 0
+        self.delivered: Dict[tuple, int] = defaultdict(int)  # (kind, symbol)
+        self.dropped: Dict[tuple, int] = defaultdict(int)  # (kind, symbol) -> ค่าที่ถูกแทนที่ก่อนส่ง
+
+    def _setup_logger(self):
+        logger = logging.getLogger('CallbackDispatcher')
+        logger.setLevel(logging.INFO)
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        return logger
+
+    def post(self, key: tuple, callbacks, *args, conflate: bool = True):
+        """ฝากงานเรียก callbacks(*args) ไว้ใน mailbox ของ key (key[0] คือชนิด key[1] คือเหรียญ)"""
+        if not callbacks:
+            return
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            mailbox = self._mailboxes[key] = deque()
+            if key not in self._in_flight:
+                self._enqueue(key)
+        elif conflate and mailbox:
+            self.dropped[key[:2]] += len(mailbox)
+            self.depth -= len(mailbox)
+            mailbox.clear()
+        mailbox.append((tuple(callbacks), args))
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def _enqueue(self, key: tuple):
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+        self._ready.put_nowait(key)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            mailbox = self._mailboxes.pop(key, None)
+            self._in_flight.add(key)
+            try:
+                while mailbox:
+                    callbacks, args = mailbox.popleft()
+                    self.depth -= 1
+                    for callback in callbacks:
+                        try:
+                            await callback(*args)
+                        except Exception as e:
+                            self.logger.error(f"เกิดข้อผิดพลาดใน callback ของ {key}: {str(e)}")
+                    self.delivered[key[:2]] += 1
+            finally:
+                self._in_flight.discard(key)
+                # มีงานใหม่เข้ามาระหว่างที่ทำอยู่ ให้ worker ตัวถัดไปรับต่อ
+                if key in self._mailboxes:
+                    self._ready.put_nowait(key)
+                self._ready.task_done()
+
+    async def join(self):
+        """รอจนไม่มีงานค้าง (ใช้ตอน replay ให้ callback ทำงานครบก่อนรันรอบของบอท)"""
+        if self._ready is not None:
+            await self._ready.join()
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._ready = None
+        self._mailboxes.clear()
+        self._in_flight.clear()
+        self.depth = 0
+
+    def render_prometheus(self) -> str:
+        """สถิติของ mailbox ในรูปแบบ Prometheus (ต่อท้าย /metrics)"""
+        lines = [
+            '# HELP callback_queue_depth งาน callback ที่รอส่ง',
+            '# TYPE callback_queue_depth gauge',
+            f'callback_queue_depth {self.depth}',
+            '# HELP callback_queue_depth_max งาน callback ที่รอส่งสูงสุดตั้งแต่เริ่มบอท',
+            '# TYPE callback_queue_depth_max gauge',
+            f'callback_queue_depth_max {self.max_depth}'
+        ]
+        counters = [
+            ('callback_delivered_total', 'จำนวนงานที่ส่งให้ callback แล้ว', self.delivered),
+            ('callback_dropped_total', 'จำนวนค่าที่ถูกแทนที่ด้วยค่าใหม่ก่อนส่ง (callback ทำงานไม่ทัน)', self.dropped),
+        ]
+        for name, help_text, values in counters:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (kind, symbol), value in sorted(values.items()):
+                lines.append(f'{name}{{kind="{kind}",symbol="{symbol}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+# Singleton instance
+_callback_dispatcher: Optional[CallbackDispatcher] = None
+
+def get_callback_dispatcher() -> CallbackDispatcher:
+    """ดึงหรือสร้าง instance ของ callback dispatcher"""
+    global _callback_dispatcher
+    if _callback_dispatcher is None:
+        _callback_dispatcher = CallbackDispatcher()
+    return _callback_dispatcher
+
+def render_dispatcher_metrics() -> str:
+    return get_callback_dispatcher().render_prometheus()
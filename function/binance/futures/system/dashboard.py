@@ -0,0 +1,185 @@
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+import numpy as np
+from aiohttp import web
+
+from config import DASHBOARD_CLIENT_QUEUE_SIZE, DASHBOARD_HEARTBEAT_INTERVAL, DASHBOARD_PUSH_INTERVAL
+from function.binance.futures.system.trade_journal import get_trade_journal
+from function.message import message
+
+DASHBOARD_PAGE = 'page.html'
+# cache ที่ไม่ได้บันทึกลง state store แต่หน้า dashboard ใช้แสดงผล
+DASHBOARD_LIVE_FIELDS = ('current_price', 'current_orders', 'current_market_data')
+# key ใน current_market_data ที่ใหญ่เกินจะส่งให้หน้าเว็บ
+_EXCLUDED_MARKET_DATA = ('ohlcv',)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (deque, set, tuple)):
+        return list(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+class DashboardFeed:
+    """ส่งสถานะของทุกเหรียญให้ page.html จาก SymbolState ใน memory (ไม่ต้องเขียนไฟล์ให้หน้าเว็บ)
+
+    /api/snapshot คืนสถานะทั้งหมดและประวัติการเทรดในครั้งเดียว ส่วน /api/events เป็น
+    Server-Sent Events ที่ส่ง snapshot ตอนเชื่อมต่อ แล้วส่งเฉพาะ field ที่เปลี่ยนทุก push_interval
+    วินาที การคำนวณส่วนต่างทำครั้งเดียวต่อรอบแล้วแชร์ให้ทุก client
+    """
+    def __init__(self, push_interval: float = DASHBOARD_PUSH_INTERVAL):
+        self.push_interval = push_interval
+        self.states: Dict[str, object] = {}
+        self.fields = DASHBOARD_LIVE_FIELDS
+        self._clients: Set[asyncio.Queue] = set()
+        self._last_sent: Dict[str, Dict[str, str]] = {}  # symbol -> field -> json ที่ส่งไปล่าสุด
+        self._last_trade_id = 0
+        self._push_task: Optional[asyncio.Task] = None
+
+    def attach(self, symbol_states: dict, fields):
+        """ลงทะเบียน SymbolState ของทุกเหรียญและ field ที่จะส่งให้หน้าเว็บ"""
+        self.states = symbol_states
+        self.fields = tuple(fields) + DASHBOARD_LIVE_FIELDS
+        self._last_trade_id = get_trade_journal().get_last_id()
+
+    def register_routes(self, server):
+        server.add_route('GET', '/', self.handle_page)
+        server.add_route('GET', '/api/snapshot', self.handle_snapshot)
+        server.add_route('GET', '/api/events', self.handle_events)
+
+    def _get_fields(self, state) -> Dict[str, object]:
+        values = {field: getattr(state, field, None) for field in self.fields}
+        market_data = values.get('current_market_data')
+        if isinstance(market_data, dict):
+            values['current_market_data'] = {
+                key: value for key, value in market_data.items() if key not in _EXCLUDED_MARKET_DATA
+            }
+        return values
+
+    def get_states(self) -> Dict[str, dict]:
+        """สถานะปัจจุบันของทุกเหรียญ (แปลงเป็น JSON ได้)"""
+        return {symbol: json.loads(_dumps(self._get_fields(state))) for symbol, state in self.states.items()}
+
+    def get_snapshot(self, include_trades: bool = True) -> dict:
+        snapshot = {'time': int(time.time() * 1000), 'symbols': list(self.states), 'states': self.get_states()}
+        if include_trades:
+            journal = get_trade_journal()
+            snapshot['trades'] = [trade for symbol in self.states for trade in journal.get_trades(symbol, with_id=True)]
+        return snapshot
+
+    def _collect_deltas(self) -> Dict[str, dict]:
+        """field ที่เปลี่ยนไปของแต่ละเหรียญตั้งแต่รอบก่อน"""
+        deltas = {}
+        for symbol, state in self.states.items():
+            last_sent = self._last_sent.setdefault(symbol, {})
+            changed = {}
+            for field, value in self._get_fields(state).items():
+                encoded = _dumps(value)
+                if last_sent.get(field) != encoded:
+                    last_sent[field] = encoded
+                    changed[field] = value
+            if changed:
+                deltas[symbol] = json.loads(_dumps(changed))
+        return deltas
+
+    def _broadcast(self, event: str, data):
+        payload = f"event: {event}\ndata: {_dumps(data)}\n\n"
+        for queue in list(self._clients):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # client ที่อ่านไม่ทันจะถูกตัด EventSource จะเชื่อมต่อใหม่และได้ snapshot ล่าสุดเอง
+                self._close_client(queue)
+
+    def _close_client(self, queue: asyncio.Queue):
+        """ทิ้งข้อมูลที่ค้างและส่ง None ให้ handle_events จบการเชื่อมต่อ"""
+        self._clients.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def _push_loop(self):
+        """คำนวณส่วนต่างทุก push_interval วินาทีจนกว่าจะไม่มี client"""
+        journal = get_trade_journal()
+        # client ใหม่ได้การเทรดที่มีอยู่แล้วจาก /api/snapshot จึงส่งเฉพาะที่บันทึกหลังจากนี้
+        self._last_trade_id = journal.get_last_id()
+        while self._clients:
+            await asyncio.sleep(self.push_interval)
+            try:
+                deltas = self._collect_deltas()
+                if deltas:
+                    self._broadcast('delta', deltas)
+                new_trades = journal.get_trades_after(self._last_trade_id)
+                if new_trades:
+                    self._last_trade_id = new_trades[-1][0]
+                    self._broadcast('trades', [{**trade, 'id': trade_id} for trade_id, trade in new_trades])
+            except Exception as e:
+                message("SYSTEM", f"Dashboard: เกิดข้อผิดพลาดในการส่งข้อมูล: {str(e)}", "red")
+        self._push_task = None
+
+    async def handle_page(self, request: web.Request) -> web.StreamResponse:
+        """GET / หน้า dashboard (origin เดียวกับ API)"""
+        return web.FileResponse(DASHBOARD_PAGE)
+
+    async def handle_snapshot(self, request: web.Request) -> web.Response:
+        """GET /api/snapshot?trades=0 (ไม่ส่งประวัติการเทรด)"""
+        include_trades = request.query.get('trades', '1') != '0'
+        return web.Response(text=_dumps(self.get_snapshot(include_trades)), content_type='application/json')
+
+    async def handle_events(self, request: web.Request) -> web.StreamResponse:
+        """GET /api/events (Server-Sent Events: snapshot, delta, trades)"""
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        await response.prepare(request)
+
+        queue = asyncio.Queue(maxsize=DASHBOARD_CLIENT_QUEUE_SIZE)
+        self._clients.add(queue)
+        if self._push_task is None:
+            self._push_task = asyncio.create_task(self._push_loop())
+
+        try:
+            await response.write(f"event: snapshot\ndata: {_dumps(self.get_snapshot(include_trades=False))}\n\n".encode())
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=DASHBOARD_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    payload = ": ping\n\n"  # กัน proxy ตัด connection ที่เงียบนาน
+                if payload is None:
+                    break
+                await response.write(payload.encode())
+        except ConnectionResetError:
+            pass
+        finally:
+            self._clients.discard(queue)
+        return response
+
+    async def stop(self):
+        for queue in list(self._clients):
+            self._close_client(queue)
+        if self._push_task is not None:
+            self._push_task.cancel()
+            await asyncio.gather(self._push_task, return_exceptions=True)
+            self._push_task = None
+
+# Singleton instance
+_dashboard_feed: Optional[DashboardFeed] = None
+
+def get_dashboard_feed() -> DashboardFeed:
+    """ดึงหรือสร้าง instance ของ dashboard feed"""
+    global _dashboard_feed
+    if _dashboard_feed is None:
+        _dashboard_feed = DashboardFeed()
+    return _dashboard_feed
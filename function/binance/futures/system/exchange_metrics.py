@@ -0,0 +1,204 @@
+import inspect
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from aiohttp import web
+
+USED_WEIGHT_HEADER = 'x-mbx-used-weight-1m'
+# ขอบบนของช่วงเวลาใน histogram (วินาที) แบบเดียวกับ Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+# โฟลเดอร์ของโปรเจกต์ (ใช้แยก frame ของบอทออกจาก frame ของ asyncio และ library)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+def get_used_weight_header(headers) -> Optional[int]:
+    """ดึงค่า used weight (1 นาที) จาก response headers ของ Binance (ไม่สนตัวพิมพ์เล็กใหญ่)"""
+    for name, value in (headers or {}).items():
+        if name.lower() == USED_WEIGHT_HEADER:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+def _symbol_label(args, kwargs) -> str:
+    """เหรียญของ request จาก argument แรกหรือ symbol= (เช่น 'ADA/USDT:USDT' -> 'ADAUSDT')"""
+    symbol = kwargs.get('symbol', args[0] if args else None)
+    if isinstance(symbol, (list, tuple)):
+        symbol = symbol[0] if len(symbol) == 1 else None
+    if not isinstance(symbol, str):
+        return ''
+    return symbol.split(':')[0].replace('/', '').upper()
+
+def _find_caller(frame) -> str:
+    """ชื่อฟังก์ชันของบอทที่ใกล้ที่สุดใน stack (ข้าม frame ของ asyncio, library และ <genexpr>/<lambda>) หรือ 'unknown'"""
+    while frame is not None:
+        code = frame.f_code
+        if (code.co_filename.startswith(PROJECT_DIR) and code.co_filename != __file__
+                and 'site-packages' not in code.co_filename and not code.co_name.startswith('<')):
+            return code.co_name
+        frame = frame.f_back
+    return 'unknown'
+
+def _format_labels(labels: dict) -> str:
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+class LatencyHistogram:
+    """histogram ของเวลาที่ใช้ต่อ request (จำนวนสะสมต่อ bucket, ผลรวม และจำนวนครั้ง)"""
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.total += seconds
+        self.count += 1
+
+class ExchangeMetrics:
+    """เก็บสถิติของทุก request ที่ส่งไป exchange: เวลา, error, retry และ used weight
+
+    แยกตาม endpoint (ชื่อ method ของ ccxt) และเหรียญ ส่วน weight ที่ใช้แยกตาม helper
+    ที่เรียก (ฟังก์ชันใน function/binance/futures) เพื่อดูว่าส่วนไหนใช้ rate limit มากที่สุด
+    """
+    def __init__(self):
+        self.latencies: Dict[tuple, LatencyHistogram] = defaultdict(LatencyHistogram)  # (endpoint, symbol)
+        self.errors: Dict[tuple, int] = defaultdict(int)  # (endpoint, symbol, error)
+        self.retries: Dict[tuple, int] = defaultdict(int)  # (function, symbol)
+        self.retry_failures: Dict[tuple, int] = defaultdict(int)  # (function, symbol)
+        self.weight_used: Dict[tuple, int] = defaultdict(int)  # (endpoint, caller) -> weight โดยประมาณ
+        self.used_weight = 0  # ค่า used weight ล่าสุดจาก header
+        self._last_weight_minute = None
+
+    def record_request(self, endpoint: str, symbol: str, caller: str, seconds: float,
+                       error: Optional[Exception] = None, headers=None):
+        self.latencies[(endpoint, symbol)].observe(seconds)
+        if error is not None:
+            self.errors[(endpoint, symbol, type(error).__name__)] += 1
+
+        used_weight = get_used_weight_header(headers)
+        if used_weight is None:
+            return
+        # header เป็นยอดสะสมของนาทีปัจจุบัน ส่วนต่างจากค่าก่อนหน้าคือ weight ของ request นี้
+        # (เป็นค่าประมาณเมื่อมีหลาย request พร้อมกัน)
+        minute = int(time.time() // 60)
+        if minute != self._last_weight_minute or used_weight < self.used_weight:
+            weight = used_weight
+        else:
+            weight = used_weight - self.used_weight
+        self._last_weight_minute = minute
+        self.used_weight = used_weight
+        self.weight_used[(endpoint, caller)] += weight
+
+    def record_retry(self, function: str, symbol: str = '', failed: bool = False):
+        if failed:
+            self.retry_failures[(function, symbol)] += 1
+        else:
+            self.retries[(function, symbol)] += 1
+
+    def render_prometheus(self) -> str:
+        """แปลงสถิติทั้งหมดเป็น text format ของ Prometheus สำหรับ /metrics"""
+        lines = [
+            '# HELP exchange_request_duration_seconds เวลาที่ใช้ต่อ request ไป exchange',
+            '# TYPE exchange_request_duration_seconds histogram'
+        ]
+        for (endpoint, symbol), histogram in sorted(self.latencies.items()):
+            labels = {'endpoint': endpoint, 'symbol': symbol}
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'exchange_request_duration_seconds_bucket{{{_format_labels({**labels, "le": le})}}} {cumulative}')
+            lines.append(f'exchange_request_duration_seconds_sum{{{_format_labels(labels)}}} {histogram.total}')
+            lines.append(f'exchange_request_duration_seconds_count{{{_format_labels(labels)}}} {histogram.count}')
+
+        counters = [
+            ('exchange_request_errors_total', 'จำนวน request ที่ล้มเหลว', ('endpoint', 'symbol', 'error'), self.errors),
+            ('exchange_retries_total', 'จำนวนครั้งที่ลองใหม่ใน retry_with_backoff', ('function', 'symbol'), self.retries),
+            ('exchange_retry_failures_total', 'จำนวนครั้งที่ลองใหม่ครบแล้วยังล้มเหลว', ('function', 'symbol'), self.retry_failures),
+            ('exchange_used_weight_total', 'weight ที่ใช้โดยประมาณจาก header ของ Binance', ('endpoint', 'caller'), self.weight_used),
+        ]
+        for name, help_text, label_names, values in counters:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{{{_format_labels(dict(zip(label_names, key)))}}} {value}')
+
+        lines.append('# HELP binance_used_weight_1m used weight ล่าสุดของนาทีปัจจุบัน')
+        lines.append('# TYPE binance_used_weight_1m gauge')
+        lines.append(f'binance_used_weight_1m {self.used_weight}')
+        return '\n'.join(lines) + '\n'
+
+class InstrumentedExchange:
+    """ห่อ exchange ของ ccxt ให้ทุก method แบบ async ถูกจับเวลาและบันทึกลง ExchangeMetrics
+
+    attribute อื่น (markets, last_response_headers, options ฯลฯ) ส่งต่อไปยัง exchange จริงตรงๆ
+    """
+    def __init__(self, exchange, metrics: 'ExchangeMetrics'):
+        object.__setattr__(self, '_exchange', exchange)
+        object.__setattr__(self, '_metrics', metrics)
+        object.__setattr__(self, '_wrappers', {})
+
+    def __getattr__(self, name):
+        wrapper = self._wrappers.get(name)
+        if wrapper is not None:
+            return wrapper
+
+        attribute = getattr(self._exchange, name)
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        exchange = self._exchange
+        metrics = self._metrics
+
+        def wrapper(*args, **kwargs):
+            # หา caller ตอนสร้าง coroutine ซึ่งยังอยู่ใน frame ของผู้เรียก ไม่ใช่ตอนเริ่มทำงาน
+            # (ถ้าส่งเข้า asyncio.gather / create_task ตอนนั้น frame ก่อนหน้าจะเป็นของ event loop แล้ว)
+            return timed_call(_find_caller(sys._getframe(1)), args, kwargs)
+
+        async def timed_call(caller: str, args, kwargs):
+            started = time.perf_counter()
+            try:
+                result = await attribute(*args, **kwargs)
+            except Exception as e:
+                metrics.record_request(name, _symbol_label(args, kwargs), caller, time.perf_counter() - started,
+                                       error=e, headers=getattr(exchange, 'last_response_headers', None))
+                raise
+            metrics.record_request(name, _symbol_label(args, kwargs), caller, time.perf_counter() - started,
+                                   headers=getattr(exchange, 'last_response_headers', None))
+            return result
+
+        self._wrappers[name] = wrapper
+        return wrapper
+
+    def __setattr__(self, name, value):
+        setattr(self._exchange, name, value)
+
+# ฟังก์ชันที่คืนข้อความ Prometheus ของส่วนอื่นในบอท ต่อท้าย /metrics
+_metrics_sources: List[Callable[[], str]] = []
+
+def register_metrics_source(render: Callable[[], str]):
+    if render not in _metrics_sources:
+        _metrics_sources.append(render)
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """GET /metrics"""
+    text = get_exchange_metrics().render_prometheus() + ''.join(render() for render in _metrics_sources)
+    return web.Response(text=text, content_type='text/plain', charset='utf-8')
+
+# Singleton instance
+_exchange_metrics: Optional[ExchangeMetrics] = None
+
+def get_exchange_metrics() -> ExchangeMetrics:
+    """ดึงหรือสร้าง instance ของ exchange metrics"""
+    global _exchange_metrics
+    if _exchange_metrics is None:
+        _exchange_metrics = ExchangeMetrics()
+    return _exchange_metrics
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from config import EXCHANGE_METRICS_ENABLED, default_testnet
+from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.system.exchange_metrics import InstrumentedExchange, get_exchange_metrics, get_used_weight_header
+from function.message import message
+
+class ExchangePool:
+    """เก็บ exchange แบบใช้ซ้ำต่อ api key (keep-alive) แทนการสร้าง/ปิดทุกครั้งที่เรียก
+
+    exchange_factory ใช้สร้าง exchange ใหม่ (ค่าเริ่มต้นคือ Binance จริง เปลี่ยนเป็น exchange จำลองตอน replay ได้)
+    ถ้าเปิด EXCHANGE_METRICS_ENABLED ทุก exchange จะถูกห่อด้วย InstrumentedExchange เพื่อเก็บสถิติ request
+    """
+    def __init__(self, exchange_factory=create_future_exchange):
+        self.exchange_factory = exchange_factory
+        self._exchanges: Dict[tuple, object] = {}
+        self._markets: Optional[dict] = None
+        self._weight_seen: Dict[int, tuple] = {}  # id(exchange) -> (headers, นาทีที่เห็น headers ชุดนี้ครั้งแรก)
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, api_key, api_secret, warnOnFetchOpenOrdersWithoutSymbol=True, testnet=default_testnet):
+        """ดึง exchange จาก pool หรือสร้างใหม่ถ้ายังไม่มี"""
+        key = (api_key, testnet, warnOnFetchOpenOrdersWithoutSymbol)
+        exchange = self._exchanges.get(key)
+        if exchange is not None:
+            return exchange
+
+        async with self._lock:
+            # ตรวจสอบอีกครั้งหลังได้ lock เผื่อ coroutine อื่นสร้างไปแล้ว
+            exchange = self._exchanges.get(key)
+            if exchange is not None:
+                return exchange
+
+            exchange = await self.exchange_factory(api_key, api_secret, warnOnFetchOpenOrdersWithoutSymbol, testnet)
+            if EXCHANGE_METRICS_ENABLED:
+                exchange = InstrumentedExchange(exchange, get_exchange_metrics())
+
+            # โหลด markets ครั้งเดียวแล้วแชร์ให้ทุก exchange ใน pool
+            try:
+                if self._markets is None:
+                    self._markets = await exchange.load_markets()
+                else:
+                    exchange.set_markets(self._markets)
+            except Exception as e:
+                message('', f"โหลด markets ไม่สำเร็จ จะโหลดใหม่เมื่อเรียกใช้งาน: {str(e)}", "yellow")
+
+            self._exchanges[key] = exchange
+            return exchange
+
+    def get_used_weight(self) -> int:
+        """ดึงค่า used weight (1 นาที) ล่าสุดที่ Binance ส่งกลับมา จากทุก exchange ใน pool
+
+        header ไม่มีเวลากำกับ จึงจำนาทีที่เห็น headers ชุดนั้นครั้งแรก (ccxt ใช้ headers ชุดใหม่ทุก response)
+        ถ้ายังไม่มี response ใหม่จนขึ้นนาทีใหม่ ค่าเดิมหมดอายุแล้ว (Binance นับ weight ใหม่ทุกนาที) จึงนับเป็น 0
+        """
+        minute = int(time.time() // 60)
+        used_weight = 0
+        for exchange in list(self._exchanges.values()):
+            headers = getattr(exchange, 'last_response_headers', None)
+            seen = self._weight_seen.get(id(exchange))
+            if seen is None or seen[0] is not headers:
+                seen = self._weight_seen[id(exchange)] = (headers, minute)
+            if seen[1] != minute:
+                continue
+            weight = get_used_weight_header(headers)
+            if weight is not None:
+                used_weight = max(used_weight, weight)
+        return used_weight
+
+    async def close_all(self):
+        """ปิด exchange ทั้งหมดใน pool"""
+        async with self._lock:
+            exchanges = list(self._exchanges.values())
+            self._exchanges.clear()
+            self._weight_seen.clear()
+        for exchange in exchanges:
+            try:
+                await exchange.close()
+            except Exception as e:
+                message('', f"เกิดข้อผิดพลาดในการปิด exchange: {str(e)}", "red")
+
+# Singleton instance
+_exchange_pool: Optional[ExchangePool] = None
+
+def get_exchange_pool() -> ExchangePool:
+    """ดึงหรือสร้าง instance ของ exchange pool"""
+    global _exchange_pool
+    if _exchange_pool is None:
+        _exchange_pool = ExchangePool()
+    return _exchange_pool
+
+@asynccontextmanager
+async def get_exchange(api_key, api_secret, warnOnFetchOpenOrdersWithoutSymbol=True, testnet=default_testnet):
+    """Context manager สำหรับยืม exchange จาก pool (ไม่ปิด connection เมื่อจบ block)"""
+    exchange = await get_exchange_pool().acquire(api_key, api_secret, warnOnFetchOpenOrdersWithoutSymbol, testnet)
+    yield exchange
+
+async def close_exchange_pool():
+    """ปิด connection ทั้งหมดใน pool ตอนปิดโปรแกรม"""
+    if _exchange_pool is not None:
+        await _exchange_pool.close_all()
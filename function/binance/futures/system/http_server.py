@@ -0,0 +1,50 @@
+from typing import Optional
+
+from aiohttp import web
+
+from config import HTTP_SERVER_HOST, HTTP_SERVER_PORT
+from function.message import message
+
+class BotHttpServer:
+    """HTTP server เล็กๆ ใน process ของบอท (aiohttp ซึ่งติดมากับ ccxt อยู่แล้ว)
+
+    ส่วนอื่นลงทะเบียน route ผ่าน add_route ก่อนเรียก start() เช่น /metrics
+    """
+    def __init__(self, host: str = HTTP_SERVER_HOST, port: int = HTTP_SERVER_PORT):
+        self.host = host
+        self.port = port
+        self.app = web.Application()
+        self._runner: Optional[web.AppRunner] = None
+
+    def add_route(self, method: str, path: str, handler):
+        self.app.router.add_route(method, path, handler)
+
+    async def start(self):
+        """เริ่มรับ request (ไม่ block) ถ้าเปิด port ไม่ได้บอทยังทำงานต่อ"""
+        if self._runner is not None:
+            return
+        runner = web.AppRunner(self.app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            await runner.cleanup()
+            message("SYSTEM", f"เปิด HTTP server ที่ {self.host}:{self.port} ไม่สำเร็จ: {str(e)}", "yellow")
+            return
+        self._runner = runner
+        message("SYSTEM", f"HTTP server ทำงานที่ http://{self.host}:{self.port}", "green")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+# Singleton instance
+_http_server: Optional[BotHttpServer] = None
+
+def get_http_server() -> BotHttpServer:
+    """ดึงหรือสร้าง instance ของ HTTP server"""
+    global _http_server
+    if _http_server is None:
+        _http_server = BotHttpServer()
+    return _http_server
@@ -0,0 +1,487 @@
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from function.binance.futures.order.other.get_kline_data import fetch_ohlcv_array, get_kline_tracker, ohlcv_to_list
+
+try:
+    from numba import njit
+except ImportError:  # numba เป็น optional ถ้าไม่มีจะใช้ numpy แบบแบ่ง block
+    njit = None
+
+RSI_WINDOW = 99  # จำนวนแท่งที่ปิดแล้วที่ใช้คำนวณ RSI (100 แท่งไม่รวมแท่งที่ยังไม่ปิด)
+
+def calculate_rsi(close_prices, length):
+    """คำนวณ RSI โดยใช้ numpy (คงฟังก์ชันเดิมไว้เพราะทำงานได้ดีอยู่แล้ว)"""
+    if len(close_prices) < length + 1:
+        return np.zeros_like(close_prices)
+
+    deltas = np.diff(close_prices)
+    seed = deltas[:length+1]
+    up = seed[seed >= 0].sum()/length
+    down = -seed[seed < 0].sum()/length
+
+    if down == 0:
+        if up == 0:
+            rs = 1.0
+        else:
+            rs = float('inf')
+    else:
+        rs = up/down
+
+    rsi = np.zeros_like(close_prices)
+    rsi[:length] = 100. - 100./(1. + rs)
+
+    for i in range(length, len(close_prices)):
+        delta = deltas[i-1]
+        if delta > 0:
+            upval = delta
+            downval = 0.
+        else:
+            upval = 0.
+            downval = -delta
+
+        up = (up*(length-1) + upval)/length
+        down = (down*(length-1) + downval)/length
+
+        if down == 0:
+            if up == 0:
+                rs = 1.0
+            else:
+                rs = float('inf')
+        else:
+            rs = up/down
+
+        rsi[i] = 100. - 100./(1. + rs)
+
+    return np.clip(rsi, 0, 100)
+
+def calculate_atr(ohlcv, length):
+    """คำนวณ ATR แบบ Wilder RMA โดย seed ด้วย TR แรกของข้อมูลที่ได้รับ"""
+    tr_values = []
+    for i in range(1, len(ohlcv)):
+        high = ohlcv[i][2]
+        low = ohlcv[i][3]
+        prev_close = ohlcv[i-1][4]
+
+        tr = max(
+            high - low,
+            abs(high - prev_close),
+            abs(low - prev_close)
+        )
+        tr_values.append(tr)
+
+    alpha = 1.0 / length
+    rma = tr_values[0]
+    for tr in tr_values[1:]:
+        rma = (alpha * tr) + ((1 - alpha) * rma)
+    return rma
+
+def _rsi_from_averages(up: float, down: float) -> float:
+    """แปลงค่าเฉลี่ยขึ้น/ลงเป็น RSI ด้วยกติกาเดียวกับ calculate_rsi"""
+    if down == 0:
+        rs = 1.0 if up == 0 else float('inf')
+    else:
+        rs = up / down
+    return min(max(100. - 100. / (1. + rs), 0.), 100.)
+
+def get_atr_window(rsi_config: dict) -> int:
+    """จำนวนแท่งที่ใช้คำนวณ ATR ทุกค่า (ยาวกว่า ATR ที่ยาวที่สุด 20%)"""
+    return int(get_max_atr_length(rsi_config) * 1.2)
+
+def get_max_atr_length(rsi_config: dict) -> int:
+    """ความยาว ATR ที่ยาวที่สุดใน config"""
+    atr_config = rsi_config['atr']
+    return max(atr_config['length2'], atr_config['length1'], atr_config.get('length_tp', 7))
+
+def calculate_dynamic_rsi_periods(atr_short, atr_long, rsi_config: dict) -> np.ndarray:
+    """RSI period แบบไดนามิกจากส่วนต่าง ATR สั้น/ยาว (ค่า NaN ใช้ rsi_period_min)"""
+    atr_short = np.asarray(atr_short, dtype=float)
+    atr_long = np.asarray(atr_long, dtype=float)
+    period_min = rsi_config['rsi_period_min']
+    period_max = rsi_config['rsi_period_max']
+    periods = np.full(atr_short.shape, period_min, dtype=np.int64)
+    if not rsi_config.get('use_dynamic_period', True):
+        return periods
+
+    min_percent = rsi_config['atr']['min_percent']
+    max_percent = rsi_config['atr']['max_percent']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        atr_diff_percent = (atr_short - atr_long) / atr_long * 100
+        period_step = (atr_diff_percent - min_percent) / (max_percent - min_percent)
+        scaled = np.rint(period_min + (period_max - period_min) * period_step)
+    valid = np.isfinite(atr_diff_percent)
+    periods[valid] = np.where(
+        atr_diff_percent[valid] >= max_percent, period_max,
+        np.where(atr_diff_percent[valid] <= min_percent, period_min, scaled[valid])
+    )
+    return periods
+
+def get_dynamic_rsi_period(atr_short: float, atr_long: float, rsi_config: dict) -> int:
+    """RSI period ของแท่งเดียว (ใช้สูตรเดียวกับ backtest)"""
+    return int(calculate_dynamic_rsi_periods([atr_short], [atr_long], rsi_config)[0])
+
+def _ewm_filter_numpy(values: np.ndarray, alpha: float) -> np.ndarray:
+    """y[t] = (1 - alpha) * y[t-1] + alpha * x[t] (y[-1] = 0) คำนวณทีละ block ด้วย cumsum"""
+    decay = 1.0 - alpha
+    out = np.empty(len(values))
+    if decay <= 0:
+        out[:] = values
+        return out
+    # ขนาด block ที่ decay ** -block ไม่ล้นช่วงของ float
+    block = int(min(4096, max(1, 150 / -np.log10(decay))))
+    powers_full = decay ** np.arange(block)
+    carry = 0.0
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = powers_full[:len(chunk)]
+        y = powers * (decay * carry + np.cumsum(alpha * chunk / powers))
+        out[start:start + len(chunk)] = y
+        carry = y[-1]
+    return out
+
+if njit is not None:
+    @njit(cache=True)
+    def _ewm_filter(values, alpha):
+        out = np.empty(len(values))
+        acc = 0.0
+        for i in range(len(values)):
+            acc = (1.0 - alpha) * acc + alpha * values[i]
+            out[i] = acc
+        return out
+else:
+    _ewm_filter = _ewm_filter_numpy
+
+def _rsi_from_average_arrays(up: np.ndarray, down: np.ndarray) -> np.ndarray:
+    """เหมือน _rsi_from_averages แต่ทำทั้ง array"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = np.where(down == 0, np.where(up == 0, 1.0, np.inf), up / down)
+        rsi = 100. - 100. / (1. + rs)
+    return np.clip(rsi, 0., 100.)
+
+def calculate_windowed_atr(high, low, close, length: int, window: int) -> np.ndarray:
+    """ATR ของทุกแท่ง เท่ากับ calculate_atr(ohlcv[t-window+1:t+1], length) ที่แต่ละแท่ง t"""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    atr = np.full(n, np.nan)
+    if n < 2:
+        return atr
+
+    tr = np.empty(n)
+    tr[0] = 0.0
+    prev_close = close[:-1]
+    tr[1:] = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)))
+
+    alpha = 1.0 / length
+    decay = 1.0 - alpha
+    # filtered[t] = ผลรวมถ่วงน้ำหนักของ TR ทั้งหมดจนถึงแท่ง t (tr[0] = 0 ไม่มีผล)
+    filtered = _ewm_filter(tr, alpha)
+    t = np.arange(1, n)
+    k = np.minimum(window - 1, t) - 1  # จำนวนรอบ RMA หลัง TR แรกของหน้าต่าง
+    seed_weight = decay ** k
+    atr[1:] = seed_weight * tr[t - k] + filtered[t] - seed_weight * filtered[t - k]
+    return atr
+
+def calculate_windowed_rsi(close, length: int, window: int = RSI_WINDOW) -> Tuple[np.ndarray, np.ndarray]:
+    """RSI (แท่งก่อนหน้า, แท่งล่าสุด) ของทุกแท่ง เท่ากับ calculate_rsi(closes[t-window+1:t+1], length)[-2:]"""
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    rsi_prev = np.full(n, np.nan)
+    rsi_last = np.full(n, np.nan)
+    m = window - 1  # จำนวน delta ในหน้าต่าง
+    k = m - length + 1  # จำนวนรอบ Wilder หลังจาก seed
+    if n < window or k < 1:
+        return rsi_prev, rsi_last
+
+    deltas = np.zeros(n)
+    deltas[1:] = np.diff(close)
+    ups = np.where(deltas > 0, deltas, 0.)
+    downs = np.where(deltas < 0, -deltas, 0.)
+    cum_ups = np.cumsum(ups)
+    cum_downs = np.cumsum(downs)
+
+    alpha = 1.0 / length
+    seed_weight = (1 - alpha) ** k
+    t = np.arange(window - 1, n)
+
+    # seed คือ length + 1 delta แรกของหน้าต่าง
+    first = t - m + 1
+    seed_up = cum_ups[first + length] - cum_ups[first - 1]
+    seed_down = cum_downs[first + length] - cum_downs[first - 1]
+
+    filtered_up = _ewm_filter(ups, alpha)
+    filtered_down = _ewm_filter(downs, alpha)
+    up = seed_up / length * seed_weight + filtered_up[t] - seed_weight * filtered_up[t - k]
+    down = seed_down / length * seed_weight + filtered_down[t] - seed_weight * filtered_down[t - k]
+    prev_up = (up - alpha * ups[t]) / (1 - alpha)
+    prev_down = (down - alpha * downs[t]) / (1 - alpha)
+
+    # หน้าต่างที่ไม่มีแท่งขึ้น (หรือลง) เลยต้องได้ค่าเฉลี่ยเป็น 0 พอดี ไม่ใช่เศษจากการลบ
+    up_count = np.cumsum(ups > 0)
+    down_count = np.cumsum(downs > 0)
+    up[up_count[t] == up_count[first - 1]] = 0.
+    down[down_count[t] == down_count[first - 1]] = 0.
+    prev_up[up_count[t - 1] == up_count[first - 1]] = 0.
+    prev_down[down_count[t - 1] == down_count[first - 1]] = 0.
+
+    rsi_prev[t] = _rsi_from_average_arrays(prev_up, prev_down)
+    rsi_last[t] = _rsi_from_average_arrays(up, down)
+    return rsi_prev, rsi_last
+
+def calculate_indicator_arrays(high, low, close, rsi_config: dict, rsi_window: int = RSI_WINDOW) -> Dict[str, np.ndarray]:
+    """คำนวณ ATR, RSI period แบบไดนามิก และ RSI ของทุกแท่งในครั้งเดียว
+
+    ค่าของแต่ละแท่งเท่ากับที่ update_market_indicators และ get_rsi_cross_last_candle
+    คำนวณตอนแท่งนั้นปิด (ช่วงต้นที่ข้อมูลยังไม่พอเป็น NaN)
+    """
+    atr_config = rsi_config['atr']
+    window = get_atr_window(rsi_config)
+    n = len(close)
+
+    atr_short = calculate_windowed_atr(high, low, close, atr_config['length1'], window)
+    atr_long = calculate_windowed_atr(high, low, close, atr_config['length2'], window)
+    atr_tp_period = calculate_windowed_atr(high, low, close, atr_config.get('length_tp', 7), window)
+    weight = atr_config.get('weight_percent', 50) / 100.0
+    atr_tp = atr_tp_period * weight + atr_long * (1 - weight)
+
+    # live ต้องมีแท่งที่ปิดแล้วอย่างน้อย max_length + 1 แท่งก่อนเริ่มคำนวณ
+    warmup = min(get_max_atr_length(rsi_config), n)
+    for values in (atr_short, atr_long, atr_tp):
+        values[:warmup] = np.nan
+
+    rsi_periods = calculate_dynamic_rsi_periods(atr_short, atr_long, rsi_config)
+    rsi_prev = np.full(n, np.nan)
+    rsi = np.full(n, np.nan)
+    for period in np.unique(rsi_periods):
+        selected = rsi_periods == period
+        period_prev, period_last = calculate_windowed_rsi(close, int(period), rsi_window)
+        rsi_prev[selected] = period_prev[selected]
+        rsi[selected] = period_last[selected]
+    # live ไม่ตรวจสัญญาณจนกว่า ATR จะคำนวณได้ ช่วงนี้จึงไม่มีค่า RSI
+    rsi_prev[:warmup] = np.nan
+    rsi[:warmup] = np.nan
+
+    return {
+        'atr_length1': atr_short,
+        'atr_length2': atr_long,
+        'atr_tp': atr_tp,
+        'rsi_period': rsi_periods,
+        'rsi_prev': rsi_prev,
+        'rsi': rsi
+    }
+
+class _WindowedEWS:
+    """ผลรวมถ่วงน้ำหนักแบบ Wilder ของค่า span ตัวล่าสุด อัพเดทแบบ O(1)"""
+    def __init__(self, alpha: float, span: int, values):
+        self.alpha = alpha
+        self.span = span
+        self.drop_weight = alpha * (1 - alpha) ** span
+        self.value = 0.0
+        for x in values:
+            self.value = (1 - alpha) * self.value + alpha * x
+
+    def push(self, new_value: float, dropped_value: float):
+        self.value = (1 - self.alpha) * self.value + self.alpha * new_value - self.drop_weight * dropped_value
+
+class _ATRState:
+    """ATR ของหน้าต่าง window แท่งล่าสุด ให้ผลเท่ากับ calculate_atr(ohlcv[-window:], length)"""
+    def __init__(self, length: int, window: int, trs: deque):
+        self.alpha = 1.0 / length
+        self.n = window - 1  # จำนวน TR ในหน้าต่าง
+        self.seed_weight = (1 - self.alpha) ** (self.n - 1)
+        self.ews = _WindowedEWS(self.alpha, self.n - 1, list(trs)[-(self.n - 1):])
+
+    def push(self, trs: deque):
+        """เรียกหลังจาก append TR ใหม่ลงใน trs แล้ว"""
+        self.ews.push(trs[-1], trs[-self.n])
+
+    def value(self, trs: deque) -> float:
+        return self.seed_weight * trs[-self.n] + self.ews.value
+
+class _RSIState:
+    """RSI สองค่าสุดท้ายของหน้าต่าง window closes ให้ผลเท่ากับ calculate_rsi(closes[-window:], length)[-2:]"""
+    def __init__(self, length: int, window: int, ups: deque, downs: deque):
+        self.length = length
+        self.alpha = 1.0 / length
+        self.m = window - 1  # จำนวน delta ในหน้าต่าง
+        self.k = self.m - length + 1  # จำนวนรอบ Wilder หลังจาก seed
+        self.seed_weight = (1 - self.alpha) ** self.k
+        window_ups = list(ups)[-self.m:]
+        window_downs = list(downs)[-self.m:]
+        self.seed_up = sum(window_ups[:length + 1])
+        self.seed_down = sum(window_downs[:length + 1])
+        self.ews_up = _WindowedEWS(self.alpha, self.k, window_ups[-self.k:])
+        self.ews_down = _WindowedEWS(self.alpha, self.k, window_downs[-self.k:])
+        # จำนวน delta ขึ้น/ลงในหน้าต่าง ใช้ตัดเศษทศนิยมเมื่อไม่มีการเคลื่อนไหวด้านนั้นเลย
+        self.up_count = sum(1 for x in window_ups if x > 0)
+        self.down_count = sum(1 for x in window_downs if x > 0)
+
+    def push(self, ups: deque, downs: deque):
+        """เรียกหลังจาก append delta ใหม่ลงใน ups/downs แล้ว"""
+        # seed คือ length + 1 delta แรกของหน้าต่าง เลื่อนไปหนึ่งตำแหน่ง
+        self.seed_up += ups[-self.m + self.length] - ups[-self.m - 1]
+        self.seed_down += downs[-self.m + self.length] - downs[-self.m - 1]
+        self.ews_up.push(ups[-1], ups[-self.k - 1])
+        self.ews_down.push(downs[-1], downs[-self.k - 1])
+        self.up_count += int(ups[-1] > 0) - int(ups[-self.m - 1] > 0)
+        self.down_count += int(downs[-1] > 0) - int(downs[-self.m - 1] > 0)
+
+    def values(self, ups: deque, downs: deque) -> Tuple[float, float]:
+        """คืนค่า (RSI แท่งก่อนหน้า, RSI แท่งล่าสุด)"""
+        up = self.seed_up / self.length * self.seed_weight + self.ews_up.value
+        down = self.seed_down / self.length * self.seed_weight + self.ews_down.value
+        prev_up = (up - self.alpha * ups[-1]) / (1 - self.alpha)
+        prev_down = (down - self.alpha * downs[-1]) / (1 - self.alpha)
+        if self.up_count == 0:
+            up = 0.
+        if self.up_count - int(ups[-1] > 0) == 0:
+            prev_up = 0.
+        if self.down_count == 0:
+            down = 0.
+        if self.down_count - int(downs[-1] > 0) == 0:
+            prev_down = 0.
+        return _rsi_from_averages(prev_up, prev_down), _rsi_from_averages(up, down)
+
+class _PairIndicators:
+    """ประวัติแท่งที่ปิดแล้วและ state ของ indicator ทั้งหมดของ symbol/timeframe เดียว"""
+    def __init__(self, ohlcv: List[list], max_candles: int):
+        self.candles = deque(maxlen=max_candles)
+        self.trs = deque(maxlen=max_candles)
+        self.ups = deque(maxlen=max_candles)
+        self.downs = deque(maxlen=max_candles)
+        self.atr_states: Dict[tuple, _ATRState] = {}
+        self.rsi_states: Dict[tuple, _RSIState] = {}
+        for candle in ohlcv:
+            self._append(candle)
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        return self.candles[-1][0] if self.candles else None
+
+    @property
+    def interval(self) -> Optional[int]:
+        return self.candles[-1][0] - self.candles[-2][0] if len(self.candles) >= 2 else None
+
+    def _append(self, candle: list):
+        if self.candles:
+            prev_close = self.candles[-1][4]
+            high, low, close = candle[2], candle[3], candle[4]
+            self.trs.append(max(high - low, abs(high - prev_close), abs(low - prev_close)))
+            delta = close - prev_close
+            self.ups.append(delta if delta > 0 else 0.)
+            self.downs.append(-delta if delta < 0 else 0.)
+        self.candles.append(candle)
+
+    def push(self, candle: list):
+        """เพิ่มแท่งที่ปิดใหม่ และอัพเดท state ทุกตัวแบบ O(1)"""
+        self._append(candle)
+        for state in self.atr_states.values():
+            state.push(self.trs)
+        for state in self.rsi_states.values():
+            state.push(self.ups, self.downs)
+
+class IndicatorEngine:
+    """คำนวณ ATR/RSI จากแท่งที่ปิดแล้วแบบ incremental ต่อ (symbol, timeframe, length)"""
+    def __init__(self, max_candles: int = 1000):
+        self.max_candles = max_candles
+        self.pairs: Dict[tuple, _PairIndicators] = {}
+
+    def seed(self, symbol: str, timeframe: str, ohlcv: List[list]):
+        """ตั้งต้นประวัติแท่งที่ปิดแล้วใหม่ทั้งหมด (O(n) ครั้งเดียว)"""
+        self.pairs[(symbol.lower(), timeframe)] = _PairIndicators(ohlcv, self.max_candles)
+
+    async def on_candle_closed(self, symbol: str, timeframe: str, kline):
+        """callback จาก kline tracker เมื่อแท่งเทียนปิด"""
+        self.push(symbol, timeframe, kline.to_ohlcv())
+
+    def push(self, symbol: str, timeframe: str, candle: list) -> bool:
+        """เพิ่มแท่งที่ปิดแล้ว คืน False ถ้าแท่งไม่ต่อเนื่อง (จะ seed ใหม่ตอน sync)"""
+        pair = self.pairs.get((symbol.lower(), timeframe))
+        if pair is None or pair.last_open_time is None:
+            return False
+        if candle[0] <= pair.last_open_time:
+            # แท่งเดิมที่ส่งซ้ำมา ไม่ต้องทำอะไร
+            return True
+        if pair.interval is not None and candle[0] - pair.last_open_time != pair.interval:
+            del self.pairs[(symbol.lower(), timeframe)]
+            return False
+        pair.push(candle)
+        return True
+
+    async def sync(self, symbol: str, timeframe: str, until_time=None) -> bool:
+        """ตรวจว่า engine มีแท่งที่ปิดล่าสุดแล้ว ถ้าไม่มีให้ seed จาก kline tracker"""
+        pair = self.pairs.get((symbol.lower(), timeframe))
+        if pair is not None and until_time is not None and pair.last_open_time == until_time:
+            return True
+
+        # view ของ array ใน tracker ใช้ให้เสร็จก่อน await ครั้งถัดไป และ copy เฉพาะตอน seed
+        ohlcv = await fetch_ohlcv_array(symbol, timeframe)
+        # ไม่คำนวณจากข้อมูลที่มีช่วงขาดหาย รอจนกว่า tracker จะ backfill เสร็จ
+        if not get_kline_tracker().is_contiguous(symbol, timeframe):
+            return False
+        if until_time is None:
+            # แท่งสุดท้ายของ tracker คือแท่งที่ยังไม่ปิด
+            closed_ohlcv = ohlcv[:-1]
+        else:
+            closed_ohlcv = ohlcv[:np.searchsorted(ohlcv[:, 0], until_time, side='right')]
+        if not len(closed_ohlcv):
+            return False
+
+        if pair is not None and pair.last_open_time == closed_ohlcv[-1, 0]:
+            return True
+        self.seed(symbol, timeframe, ohlcv_to_list(closed_ohlcv))
+        return True
+
+    def get_closed_candles(self, symbol: str, timeframe: str, limit: int = None) -> List[list]:
+        """ดึงแท่งที่ปิดแล้วที่ engine เก็บไว้"""
+        pair = self.pairs.get((symbol.lower(), timeframe))
+        if pair is None:
+            return []
+        candles = list(pair.candles)
+        return candles[-limit:] if limit else candles
+
+    def get_atr(self, symbol: str, timeframe: str, length: int, window: int) -> Optional[float]:
+        """ATR ของ window แท่งที่ปิดล่าสุด (เท่ากับ calculate_atr(ohlcv[-window:], length))"""
+        pair = self.pairs.get((symbol.lower(), timeframe))
+        if pair is None or len(pair.candles) < 2:
+            return None
+        if len(pair.candles) < window or window < 3:
+            # ข้อมูลยังไม่พอสำหรับหน้าต่างเต็ม คำนวณตรงจากที่มี
+            return calculate_atr(list(pair.candles)[-window:], length)
+
+        key = (length, window)
+        state = pair.atr_states.get(key)
+        if state is None:
+            state = _ATRState(length, window, pair.trs)
+            pair.atr_states[key] = state
+        return state.value(pair.trs)
+
+    def get_rsi(self, symbol: str, timeframe: str, length: int, window: int) -> Optional[Tuple[float, float]]:
+        """RSI (แท่งก่อนหน้า, แท่งล่าสุด) ของ window closes ล่าสุด (เท่ากับ calculate_rsi(closes[-window:], length)[-2:])"""
+        pair = self.pairs.get((symbol.lower(), timeframe))
+        if pair is None or len(pair.candles) < 2:
+            return None
+        if len(pair.candles) < window or window < length + 3:
+            closes = np.array([candle[4] for candle in list(pair.candles)[-window:]], dtype=float)
+            rsi = calculate_rsi(closes, length)
+            return float(rsi[-2]), float(rsi[-1])
+
+        key = (length, window)
+        state = pair.rsi_states.get(key)
+        if state is None:
+            state = _RSIState(length, window, pair.ups, pair.downs)
+            pair.rsi_states[key] = state
+        return state.values(pair.ups, pair.downs)
+
+# Singleton instance
+_indicator_engine: Optional[IndicatorEngine] = None
+
+def get_indicator_engine() -> IndicatorEngine:
+    """ดึงหรือสร้าง instance ของ indicator engine"""
+    global _indicator_engine
+    if _indicator_engine is None:
+        _indicator_engine = IndicatorEngine()
+    return _indicator_engine
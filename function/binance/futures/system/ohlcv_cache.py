@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+import ccxt
+import numpy as np
+
+from function.message import message
+
+OHLCV_CACHE_DIR = 'json/ohlcv'
+OHLCV_COLUMNS = 6  # timestamp, open, high, low, close, volume (ลำดับเดียวกับ fetch_ohlcv)
+OHLCV_FETCH_LIMIT = 1000
+
+def get_timeframe_ms(timeframe: str) -> int:
+    """แปลง timeframe (เช่น '15m', '4h', '1d') เป็นมิลลิวินาที"""
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+class OHLCVCache:
+    """เก็บแท่งเทียนย้อนหลังเป็นไฟล์ .npy ต่อเหรียญและ timeframe อ่านแบบ memory map
+
+    ไฟล์เป็น array float64 ขนาด (จำนวนแท่ง, 6) เรียงตามเวลา ไม่มีแท่งซ้ำ
+    และเก็บเฉพาะแท่งที่ปิดแล้ว ดึงจาก exchange เฉพาะช่วงที่ยังไม่มีในไฟล์
+    """
+    def __init__(self, directory: str = OHLCV_CACHE_DIR):
+        self.directory = directory
+
+    def get_path(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.directory, f"{symbol.replace('/', '')}_{timeframe}.npy")
+
+    def _open(self, symbol: str, timeframe: str, mmap_mode: Optional[str] = 'r') -> np.ndarray:
+        path = self.get_path(symbol, timeframe)
+        if not os.path.exists(path):
+            return np.empty((0, OHLCV_COLUMNS))
+        return np.load(path, mmap_mode=mmap_mode)
+
+    def read(self, symbol: str, timeframe: str, since: Optional[int] = None, until: Optional[int] = None) -> np.ndarray:
+        """คืนแท่งเทียนช่วง [since, until] (ms) เป็น view ของไฟล์ที่ map ไว้ ไม่โหลดทั้งไฟล์เข้า memory"""
+        candles = self._open(symbol, timeframe)
+        timestamps = candles[:, 0]
+        start = 0 if since is None else np.searchsorted(timestamps, since, side='left')
+        end = len(candles) if until is None else np.searchsorted(timestamps, until, side='right')
+        return candles[start:end]
+
+    def get_range(self, symbol: str, timeframe: str) -> Optional[tuple]:
+        """ช่วงเวลา (แท่งแรก, แท่งสุดท้าย) ที่มีในไฟล์ หรือ None ถ้ายังไม่มี"""
+        candles = self._open(symbol, timeframe)
+        if not len(candles):
+            return None
+        return int(candles[0, 0]), int(candles[-1, 0])
+
+    def _write(self, symbol: str, timeframe: str, candles: np.ndarray):
+        """เขียนไฟล์ใหม่ทั้งไฟล์ผ่านไฟล์ชั่วคราว (ไม่ให้ไฟล์เสียถ้าโปรแกรมหยุดกลางคัน)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.get_path(symbol, timeframe)
+        temp_path = path + '.tmp.npy'
+        np.save(temp_path, candles)
+        try:
+            os.replace(temp_path, path)
+        except OSError as e:
+            # Windows ไม่ยอมให้แทนที่ไฟล์ที่ยังถูก map อยู่
+            os.remove(temp_path)
+            message(symbol, f"บันทึก OHLCV cache ไม่สำเร็จ: {str(e)}", "yellow")
+
+    async def _fetch_range(self, exchange, symbol: str, timeframe: str, since: int, until: int) -> list:
+        """ดึงแท่งเทียนที่ปิดแล้วช่วง [since, until) ทีละ OHLCV_FETCH_LIMIT แท่ง"""
+        timeframe_ms = get_timeframe_ms(timeframe)
+        last_closed = int(time.time() * 1000) - timeframe_ms
+        until = min(until, last_closed + 1)
+        candles = []
+        while since < until:
+            batch = await exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=OHLCV_FETCH_LIMIT)
+            if not batch:
+                break
+            candles.extend(c for c in batch if c[0] < until)
+            since = batch[-1][0] + timeframe_ms
+
+            # รอสักครู่เพื่อไม่ให้เกิน rate limit
+            await asyncio.sleep(0.1)
+        return candles
+
+    async def update(self, exchange, symbol: str, timeframe: str, since: int, until: int) -> int:
+        """ดึงเฉพาะช่วงที่ยังไม่มี (ก่อนแท่งแรกและหลังแท่งสุดท้ายในไฟล์) คืนจำนวนแท่งที่เพิ่ม"""
+        timeframe_ms = get_timeframe_ms(timeframe)
+        cached_range = self.get_range(symbol, timeframe)
+
+        if cached_range is None:
+            new_candles = await self._fetch_range(exchange, symbol, timeframe, since, until + 1)
+        else:
+            first, last = cached_range
+            new_candles = []
+            if since < first:
+                new_candles += await self._fetch_range(exchange, symbol, timeframe, since, first)
+            if until > last:
+                new_candles += await self._fetch_range(exchange, symbol, timeframe, last + timeframe_ms, until + 1)
+
+        if not new_candles:
+            return 0
+
+        # อ่านไฟล์เดิมเข้า memory ก่อน (ไม่ map) เพื่อให้เขียนทับได้
+        existing = self._open(symbol, timeframe, mmap_mode=None)
+        candles = np.concatenate([existing, np.asarray(new_candles, dtype=float).reshape(-1, OHLCV_COLUMNS)])
+        _, unique_index = np.unique(candles[:, 0], return_index=True)
+        candles = candles[unique_index]
+        self._write(symbol, timeframe, candles)
+        return len(candles) - len(existing)
+
+    async def get_candles(self, symbol: str, timeframe: str, since: int, until: int, exchange=None) -> np.ndarray:
+        """แท่งเทียนช่วง [since, until] จาก cache (ถ้าส่ง exchange มาจะเติมช่วงที่ขาดก่อน ไม่ส่ง = offline)"""
+        if exchange is not None:
+            added = await self.update(exchange, symbol, timeframe, since, until)
+            if added:
+                message(symbol, f"เพิ่มแท่งเทียน {timeframe} ลง cache {added} แท่ง", "blue")
+        else:
+            cached_range = self.get_range(symbol, timeframe)
+            last_closed = int(time.time() * 1000) - get_timeframe_ms(timeframe)
+            if cached_range is None:
+                message(symbol, f"โหมด offline: ไม่มีข้อมูล {timeframe} ใน cache", "yellow")
+            elif since < cached_range[0] or min(until, last_closed) > cached_range[1]:
+                message(symbol, "โหมด offline: cache มีข้อมูลไม่ครบช่วงที่ต้องการ ใช้เท่าที่มี", "yellow")
+        return self.read(symbol, timeframe, since, until)
+
+# Singleton instance
+_ohlcv_cache: Optional[OHLCVCache] = None
+
+def get_ohlcv_cache() -> OHLCVCache:
+    """ดึงหรือสร้าง instance ของ OHLCV cache"""
+    global _ohlcv_cache
+    if _ohlcv_cache is None:
+        _ohlcv_cache = OHLCVCache()
+    return _ohlcv_cache
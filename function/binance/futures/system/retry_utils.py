@@ -2,6 +2,7 @@
 import asyncio
 from functools import wraps
 
+from function.binance.futures.system.exchange_metrics import get_exchange_metrics
 from function.message import message
 
 def retry_with_backoff(max_retries=3, initial_delay=1, max_delay=60):
@@ -17,11 +18,13 @@ def retry_with_backoff(max_retries=3, initial_delay=1, max_delay=60):
                 except Exception as e:
                     last_exception = e
                     if retry < max_retries - 1:
+                        get_exchange_metrics().record_retry(func.__name__, kwargs.get('symbol', ''))
                         message(kwargs.get('symbol', ''), 
                             f"เกิดข้อผิดพลาด (พยายามอีกครั้งใน {delay} วินาที): {str(e)}", "yellow")
                         await asyncio.sleep(delay)
                         delay = min(delay * 2, max_delay)
                     else:
+                        get_exchange_metrics().record_retry(func.__name__, kwargs.get('symbol', ''), failed=True)
                         message(kwargs.get('symbol', ''), 
                             f"เกิดข้อผิดพลาดหลังจากลองซ้ำ {max_retries} ครั้ง: {str(e)}", "red")
             raise last_exception
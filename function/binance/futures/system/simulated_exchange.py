@@ -0,0 +1,519 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple, Union
+
+import ccxt
+
+from function.binance.futures.order.other.get_user_data import to_exchange_symbol, to_market_id
+from function.binance.futures.system.callback_dispatcher import get_callback_dispatcher
+from function.binance.futures.system.stream_manager import BinanceStreamManager
+
+SIMULATED_INITIAL_BALANCE = 1000.0
+SIMULATED_TAKER_FEE = 0.0004
+SIMULATED_MAKER_FEE = 0.0002
+SIMULATED_LEVERAGE = 20
+SIMULATED_OHLCV_LIMIT = 500  # จำนวนแท่งเริ่มต้นของ fetch_ohlcv เหมือน Binance
+SIMULATED_LATENCY = 0.0  # วินาทีที่หน่วงต่อ request (หรือ (min, max) เพื่อสุ่มในช่วง)
+SIMULATED_ERROR_RATE = 0.0  # โอกาส (0-1) ที่ request จะล้มเหลวด้วย error ของ network/exchange
+SIMULATED_TICKS_PER_CANDLE = 20  # จำนวน aggTrade ต่อแท่งของ SimulatedMarketFeed
+SIMULATED_TICK_INTERVAL = 0.05  # วินาทีระหว่าง tick ของ SimulatedMarketFeed
+
+# error ที่สุ่มส่งกลับตอน error injection (ประเภทเดียวกับที่ ccxt โยนเมื่อ Binance มีปัญหา)
+_INJECTED_ERRORS = (ccxt.RequestTimeout, ccxt.NetworkError, ccxt.ExchangeNotAvailable, ccxt.DDoSProtection)
+
+# order แบบมีเงื่อนไข: (ประเภท, side) -> ทิศทางราคาที่ทำให้ trigger (1 = ราคาขึ้นถึง, -1 = ราคาลงถึง)
+_TRIGGER_DIRECTIONS = {
+    ('stop_market', 'buy'): 1, ('stop_market', 'sell'): -1,
+    ('stop', 'buy'): 1, ('stop', 'sell'): -1,
+    ('take_profit_market', 'buy'): -1, ('take_profit_market', 'sell'): 1,
+    ('take_profit', 'buy'): -1, ('take_profit', 'sell'): 1,
+}
+
+class SimulatedExchange:
+    """exchange จำลอง Binance futures (one-way mode) ที่มี method ของ ccxt เท่าที่บอทเรียกใช้
+
+    ราคามาจาก stream ที่ป้อนผ่าน apply_stream_event/on_price (aggTrade) และจับคู่ order กับราคานั้น
+    แท่งเทียนสำหรับ fetch_ohlcv มาจาก load_ohlcv และ kline event จึงไม่มีข้อมูลอนาคตรั่วเข้ามา
+
+    latency และ error_rate ใช้จำลอง network: ทุก request จะหน่วงตาม latency และล้มเหลว
+    ตามโอกาส error_rate (เฉพาะ method ใน error_methods ถ้าระบุ) ก่อนจะมีผลกับบัญชี
+    """
+    def __init__(self, initial_balance: float = SIMULATED_INITIAL_BALANCE, leverage: int = SIMULATED_LEVERAGE,
+                 taker_fee: float = SIMULATED_TAKER_FEE, maker_fee: float = SIMULATED_MAKER_FEE,
+                 latency: Union[float, Tuple[float, float]] = SIMULATED_LATENCY, error_rate: float = SIMULATED_ERROR_RATE,
+                 error_methods=None, seed: Optional[int] = None):
+        self.wallet_balance = float(initial_balance)
+        self.leverage = leverage
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.now = 0  # เวลาปัจจุบันของตลาดจำลอง (ms)
+        self.prices: Dict[str, float] = {}  # market id -> ราคาล่าสุด
+        self.positions: Dict[str, dict] = {}  # market id -> {'amount': ขนาดแบบมีเครื่องหมาย, 'entry_price'}
+        self.orders: Dict[str, Dict[str, dict]] = defaultdict(dict)  # market id -> order id -> order
+        self.trades: Dict[str, List[dict]] = defaultdict(list)  # market id -> fills
+        self.klines: Dict[tuple, List[list]] = defaultdict(list)  # (market id, timeframe) -> ohlcv
+        self.closed_orders: Dict[str, dict] = {}  # order id -> order ที่ fill/ยกเลิก/หมดอายุแล้ว (สำหรับ fetch_order)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_methods = set(error_methods) if error_methods else None
+        self.request_counts = Counter()  # ชื่อ method -> จำนวนครั้งที่ถูกเรียก
+        self.injected_errors = Counter()  # ชื่อ method -> จำนวน error ที่สุ่มส่งกลับ
+        self._random = random.Random(seed)
+        self.last_response_headers = {}
+        self._ids = itertools.count(1)
+
+    # ---------- ข้อมูลตลาดที่ป้อนเข้ามา ----------
+
+    def load_ohlcv(self, symbol: str, timeframe: str, ohlcv):
+        """ตั้งประวัติแท่งเทียน (แท่งที่ปิดแล้ว) ของเหรียญและ timeframe"""
+        self.klines[(to_market_id(symbol), timeframe)] = [[int(c[0])] + [float(v) for v in c[1:6]] for c in ohlcv]
+
+    def update_kline(self, symbol: str, timeframe: str, candle: list):
+        """เพิ่มแท่งใหม่หรืออัพเดทแท่งล่าสุดที่ยังไม่ปิด"""
+        klines = self.klines[(to_market_id(symbol), timeframe)]
+        candle = [int(candle[0])] + [float(v) for v in candle[1:6]]
+        if klines and klines[-1][0] == candle[0]:
+            klines[-1] = candle
+        elif not klines or candle[0] > klines[-1][0]:
+            klines.append(candle)
+
+    def apply_stream_event(self, data: dict):
+        """อัพเดทตลาดจาก event รูปแบบเดียวกับ Binance stream (aggTrade และ kline)"""
+        event_type = data.get('e')
+        if event_type == 'aggTrade':
+            self.on_price(data['s'], float(data['p']), int(data.get('T') or data.get('E') or self.now))
+        elif event_type == 'kline':
+            k = data['k']
+            self.now = max(self.now, int(data.get('E') or k['t']))
+            self.update_kline(data['s'], k['i'], [k['t'], k['o'], k['h'], k['l'], k['c'], k['v']])
+
+    def on_price(self, symbol: str, price: float, timestamp: Optional[int] = None):
+        """ราคาใหม่ของเหรียญ ตรวจ order ที่ trigger หรือ fill ได้ที่ราคานี้"""
+        market_id = to_market_id(symbol)
+        self.prices[market_id] = price
+        if timestamp is not None:
+            self.now = max(self.now, timestamp)
+
+        for order in list(self.orders[market_id].values()):
+            if order['id'] not in self.orders[market_id]:
+                continue  # ถูกยกเลิกไประหว่างรอบนี้
+            if order['stopPrice'] is not None and not order['info'].get('triggered'):
+                if not self._is_triggered(order, price):
+                    continue
+                if order['type'] in ('stop', 'take_profit'):
+                    # stop limit กลายเป็น limit order ที่ราคา price ของ order
+                    order['info']['triggered'] = True
+                else:
+                    self._execute(market_id, order, price, self.taker_fee)
+                    continue
+            if order['type'] in ('limit', 'stop', 'take_profit') and self._is_limit_fillable(order, price):
+                self._execute(market_id, order, order['price'], self.maker_fee)
+
+    # ---------- ccxt API ----------
+
+    async def _request(self, name: str):
+        """นับ request หน่วงเวลา และสุ่ม error ตามที่ตั้งไว้"""
+        self.request_counts[name] += 1
+        latency = self._random.uniform(*self.latency) if isinstance(self.latency, tuple) else self.latency
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if self.error_rate > 0 and (self.error_methods is None or name in self.error_methods):
+            if self._random.random() < self.error_rate:
+                self.injected_errors[name] += 1
+                raise self._random.choice(_INJECTED_ERRORS)(f'binance simulated {name} failure')
+
+    @staticmethod
+    def parse_timeframe(timeframe: str) -> int:
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    async def load_markets(self, reload=False):
+        await self._request('load_markets')
+        return {}
+
+    def set_markets(self, markets):
+        pass
+
+    async def fetch_status(self, params={}):
+        await self._request('fetch_status')
+        return {'status': 'ok', 'updated': self.now}
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        await self._request('fetch_ohlcv')
+        klines = self.klines[(to_market_id(symbol), timeframe)]
+        limit = limit or SIMULATED_OHLCV_LIMIT
+        if since is not None:
+            return [list(c) for c in klines if c[0] >= since][:limit]
+        return [list(c) for c in klines[-limit:]]
+
+    async def fetch_positions(self, symbols=None, params={}):
+        await self._request('fetch_positions')
+        market_ids = None if symbols is None else {to_market_id(symbol) for symbol in symbols}
+        return [
+            self._format_position(market_id, position)
+            for market_id, position in self.positions.items()
+            if position['amount'] != 0 and (market_ids is None or market_id in market_ids)
+        ]
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        await self._request('fetch_open_orders')
+        market_ids = list(self.orders) if symbol is None else [to_market_id(symbol)]
+        return [dict(order, info=dict(order['info'])) for market_id in market_ids for order in self.orders[market_id].values()]
+
+    async def fetch_order(self, id, symbol=None, params={}):
+        await self._request('fetch_order')
+        order = self.orders[to_market_id(symbol)].get(str(id)) if symbol else None
+        order = order or self.closed_orders.get(str(id))
+        if order is None:
+            raise ccxt.OrderNotFound('binance {"code":-2013,"msg":"Order does not exist."}')
+        return dict(order, info=dict(order['info']))
+
+    async def fetch_balance(self, params={}):
+        await self._request('fetch_balance')
+        unrealized = sum(self._unrealized_pnl(market_id) for market_id in self.positions)
+        margin = sum(
+            abs(position['amount']) * self.prices.get(market_id, position['entry_price']) / self.leverage
+            for market_id, position in self.positions.items()
+        )
+        available = self.wallet_balance + unrealized - margin
+        return {
+            'info': {
+                'totalWalletBalance': str(self.wallet_balance),
+                'totalUnrealizedProfit': str(unrealized),
+                'availableBalance': str(available),
+            },
+            'USDT': {'free': available, 'used': margin, 'total': self.wallet_balance + unrealized},
+            'free': {'USDT': available},
+            'used': {'USDT': margin},
+            'total': {'USDT': self.wallet_balance + unrealized},
+        }
+
+    async def fetch_my_trades(self, symbol=None, since=None, limit=None, params={}):
+        await self._request('fetch_my_trades')
+        trades = self.trades[to_market_id(symbol)] if symbol else [t for ts in self.trades.values() for t in ts]
+        if since is not None:
+            trades = [trade for trade in trades if trade['timestamp'] >= since]
+        return [dict(trade) for trade in (trades[-limit:] if limit else trades)]
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        await self._request('create_order')
+        return self._create_order(symbol, type, side, amount, price, params)
+
+    async def create_orders(self, orders, params={}):
+        """batch order: order ที่ไม่ผ่านคืนเป็น error รายตัวเหมือน Binance"""
+        await self._request('create_orders')
+        results = []
+        for order in orders:
+            try:
+                results.append(self._create_order(
+                    order['symbol'], order['type'], order['side'], order['amount'],
+                    order.get('price'), order.get('params', {})
+                ))
+            except ccxt.BaseError as e:
+                results.append({'info': {'code': -2021, 'msg': str(e)}})
+        return results
+
+    async def create_market_order(self, symbol, side, amount, price=None, params={}):
+        await self._request('create_order')
+        return self._create_order(symbol, 'market', side, amount, None, params)
+
+    async def cancel_order(self, id, symbol=None, params={}):
+        await self._request('cancel_order')
+        order = self.orders[to_market_id(symbol)].pop(str(id), None)
+        if order is None:
+            raise ccxt.OrderNotFound('binance {"code":-2011,"msg":"Unknown order sent."}')
+        return self._close_order(order, 'canceled')
+
+    async def cancel_orders(self, ids, symbol=None, params={}):
+        await self._request('cancel_orders')
+        results = []
+        for order_id in ids:
+            order = self.orders[to_market_id(symbol)].pop(str(order_id), None)
+            if order is None:
+                results.append({'info': {'code': -2011, 'msg': 'Unknown order sent.'}})
+            else:
+                results.append(self._close_order(order, 'canceled'))
+        return results
+
+    async def cancel_all_orders(self, symbol=None, params={}):
+        await self._request('cancel_all_orders')
+        orders = self.orders.pop(to_market_id(symbol), {})
+        return [self._close_order(order, 'canceled') for order in orders.values()]
+
+    async def close(self):
+        pass
+
+    # ---------- การจับคู่ order ----------
+
+    def _create_order(self, symbol, order_type, side, amount, price, params) -> dict:
+        market_id = to_market_id(symbol)
+        order_type = order_type.lower()
+        side = side.lower()
+        params = params or {}
+        if params.get('positionSide', 'BOTH').upper() != 'BOTH':
+            raise ccxt.InvalidOrder('binance {"code":-4061,"msg":"Order\'s position side does not match user\'s setting."}')
+
+        last_price = self.prices.get(market_id)
+        if last_price is None:
+            raise ccxt.BadSymbol(f'ยังไม่มีราคาของ {market_id}')
+
+        stop_price = params.get('stopPrice')
+        order_id = str(next(self._ids))
+        order = {
+            'id': order_id,
+            'clientOrderId': None,
+            'symbol': to_exchange_symbol(market_id),
+            'timestamp': self.now,
+            'type': order_type,
+            'side': side,
+            'price': float(price or params.get('price') or 0),
+            'average': None,
+            'amount': float(amount or 0),
+            'filled': 0.0,
+            'remaining': float(amount or 0),
+            'status': 'open',
+            'reduceOnly': bool(params.get('reduceOnly', False)),
+            'stopPrice': float(stop_price) if stop_price is not None else None,
+            'triggerPrice': float(stop_price) if stop_price is not None else None,
+            'info': {
+                'orderId': order_id,
+                'symbol': market_id,
+                'status': 'NEW',
+                'type': order_type.upper(),
+                'origType': order_type.upper(),
+                'side': side.upper(),
+                'positionSide': 'BOTH',
+                'reduceOnly': bool(params.get('reduceOnly', False)),
+                'closePosition': bool(params.get('closePosition', False)),
+                'stopPrice': str(stop_price) if stop_price is not None else '0',
+                'price': str(price or 0),
+                'origQty': str(amount or 0),
+            },
+        }
+
+        if order_type == 'market':
+            return self._execute(market_id, order, last_price, self.taker_fee)
+
+        if order['stopPrice'] is not None:
+            if order_type not in ('stop_market', 'stop', 'take_profit_market', 'take_profit'):
+                raise ccxt.InvalidOrder(f'ไม่รองรับ order ประเภท {order_type}')
+            if self._is_triggered(order, last_price):
+                raise ccxt.OrderImmediatelyFillable('binance {"code":-2021,"msg":"Order would immediately trigger."}')
+        elif order_type == 'limit' and self._is_limit_fillable(order, last_price):
+            # limit ที่ราคาข้ามตลาดแล้ว fill ทันทีแบบ taker ที่ราคาตลาด
+            return self._execute(market_id, order, last_price, self.taker_fee)
+
+        self.orders[market_id][order_id] = order
+        return dict(order, info=dict(order['info']))
+
+    @staticmethod
+    def _is_triggered(order: dict, price: float) -> bool:
+        direction = _TRIGGER_DIRECTIONS.get((order['type'], order['side']))
+        if direction is None:
+            return False
+        return price >= order['stopPrice'] if direction > 0 else price <= order['stopPrice']
+
+    @staticmethod
+    def _is_limit_fillable(order: dict, price: float) -> bool:
+        return price <= order['price'] if order['side'] == 'buy' else price >= order['price']
+
+    def _execute(self, market_id: str, order: dict, price: float, fee_rate: float) -> dict:
+        """fill order ทั้งจำนวนที่ราคา price (reduceOnly/closePosition จำกัดไม่เกินขนาด position)"""
+        self.orders[market_id].pop(order['id'], None)
+        position = self.positions.setdefault(market_id, {'amount': 0.0, 'entry_price': 0.0})
+        direction = 1 if order['side'] == 'buy' else -1
+        amount = order['amount']
+
+        if order['info']['closePosition'] or order['reduceOnly']:
+            if position['amount'] == 0 or position['amount'] * direction > 0:
+                # ไม่มี position ให้ลด order หมดอายุเหมือน Binance
+                return self._close_order(order, 'expired')
+            amount = abs(position['amount']) if order['info']['closePosition'] else min(amount, abs(position['amount']))
+
+        realized_pnl = 0.0
+        delta = amount * direction
+        if position['amount'] == 0 or position['amount'] * delta > 0:
+            total = abs(position['amount']) + amount
+            position['entry_price'] = (abs(position['amount']) * position['entry_price'] + amount * price) / total
+            position['amount'] += delta
+        else:
+            closed = min(amount, abs(position['amount']))
+            realized_pnl = closed * (price - position['entry_price']) * (1 if position['amount'] > 0 else -1)
+            position['amount'] += delta
+            if abs(position['amount']) < 1e-12:
+                position['amount'] = 0.0
+                position['entry_price'] = 0.0
+            elif position['amount'] * delta > 0:
+                # กลับฝั่ง (swap) ส่วนที่เกินเปิด position ใหม่ที่ราคานี้
+                position['entry_price'] = price
+
+        fee = amount * price * fee_rate
+        self.wallet_balance += realized_pnl - fee
+        self.trades[market_id].append({
+            'id': str(next(self._ids)),
+            'order': order['id'],
+            'symbol': order['symbol'],
+            'timestamp': self.now,
+            'side': order['side'],
+            'type': order['type'],
+            'price': price,
+            'amount': amount,
+            'cost': amount * price,
+            'fee': {'cost': fee, 'currency': 'USDT'},
+            'info': {'realizedPnl': str(realized_pnl)},
+        })
+
+        order.update({'amount': amount, 'filled': amount, 'remaining': 0.0, 'average': price})
+        return self._close_order(order, 'closed')
+
+    def _close_order(self, order: dict, status: str) -> dict:
+        order['status'] = status
+        order['info']['status'] = {'closed': 'FILLED', 'canceled': 'CANCELED', 'expired': 'EXPIRED'}[status]
+        self.closed_orders[order['id']] = order
+        return dict(order, info=dict(order['info']))
+
+    def _unrealized_pnl(self, market_id: str) -> float:
+        position = self.positions[market_id]
+        price = self.prices.get(market_id, position['entry_price'])
+        return position['amount'] * (price - position['entry_price'])
+
+    def _format_position(self, market_id: str, position: dict) -> dict:
+        price = self.prices.get(market_id, position['entry_price'])
+        return {
+            'symbol': to_exchange_symbol(market_id),
+            'contracts': abs(position['amount']),
+            'side': 'long' if position['amount'] > 0 else 'short',
+            'entryPrice': position['entry_price'],
+            'markPrice': price,
+            'notional': abs(position['amount']) * price,
+            'unrealizedPnl': self._unrealized_pnl(market_id),
+            'leverage': self.leverage,
+            'marginMode': 'cross',
+            'marginType': 'cross',
+            'info': {
+                'symbol': market_id,
+                'positionAmt': str(position['amount']),
+                'entryPrice': str(position['entry_price']),
+                'positionSide': 'BOTH',
+            },
+        }
+
+class SimulatedStreamManager(BinanceStreamManager):
+    """stream manager ที่ไม่เชื่อมต่อ websocket จริง ข้อความมาจาก publish() แทน (ใช้กับ exchange จำลอง)"""
+    async def _run_shard(self, shard):
+        shard.task = None
+
+    async def publish(self, message: dict):
+        """ส่งข้อความรูปแบบ combined stream ({'stream', 'data'}) หรือ event เดี่ยวให้ handler ของ tracker
+
+        รอ callback ของ tracker ทำงานครบก่อนคืนค่า ให้ผลของ replay ไม่ขึ้นกับจังหวะของ worker
+        """
+        await self._handle_message(message)
+        await get_callback_dispatcher().join()
+
+class SimulatedMarketFeed:
+    """สร้าง aggTrade/kline แบบ random walk ของหลายเหรียญแทน websocket จริง
+
+    ทุก tick จะส่งราคาใหม่ของทุกเหรียญให้ exchange จำลองและ trackers (ผ่าน stream manager)
+    เวลาตลาดเดินเร็วกว่าจริง: แท่งเทียนปิดทุก ticks_per_candle tick
+    """
+    def __init__(self, exchange: SimulatedExchange, stream_manager: SimulatedStreamManager, pairs: Dict[str, str],
+                 ticks_per_candle: int = SIMULATED_TICKS_PER_CANDLE, tick_interval: float = SIMULATED_TICK_INTERVAL,
+                 volatility: float = 0.002, start_time: Optional[int] = None, seed: Optional[int] = None):
+        self.exchange = exchange
+        self.stream_manager = stream_manager
+        self.pairs = {symbol.upper(): timeframe for symbol, timeframe in pairs.items()}  # symbol -> timeframe
+        self.ticks_per_candle = ticks_per_candle
+        self.tick_interval = tick_interval
+        self.volatility = volatility
+        self.is_running = False
+        self.tick_count = 0
+        self._random = random.Random(seed)
+        start_time = int(time.time() * 1000) if start_time is None else start_time
+        self._prices = {symbol: self._random.uniform(1, 100) for symbol in self.pairs}
+        self._candles = {}  # symbol -> แท่งที่กำลังก่อตัว [t, o, h, l, c, v]
+        for symbol, timeframe in self.pairs.items():
+            timeframe_ms = SimulatedExchange.parse_timeframe(timeframe) * 1000
+            self._candles[symbol] = self._new_candle(start_time - start_time % timeframe_ms, self._prices[symbol])
+        self._step = 0  # tick ที่เท่าไรของแท่งปัจจุบัน
+
+    @staticmethod
+    def _new_candle(timestamp: int, price: float) -> list:
+        return [timestamp, price, price, price, price, 0.0]
+
+    def _next_price(self, symbol: str) -> float:
+        price = self._prices[symbol] * (1 + self._random.gauss(0, self.volatility))
+        self._prices[symbol] = price
+        return price
+
+    def make_history(self, symbol: str, count: int) -> List[list]:
+        """แท่งเทียนย้อนหลัง count แท่งที่จบก่อนแท่งแรกของ feed (ใช้เป็น warmup ของ indicator)"""
+        symbol = symbol.upper()
+        timeframe_ms = SimulatedExchange.parse_timeframe(self.pairs[symbol]) * 1000
+        first_time = self._candles[symbol][0]
+        price = self._prices[symbol]
+        candles = []
+        for index in range(count, 0, -1):
+            open_price = price
+            closes = [open_price * (1 + self._random.gauss(0, self.volatility)) for _ in range(4)]
+            price = closes[-1]
+            candles.append([first_time - index * timeframe_ms, open_price, max(open_price, *closes),
+                            min(open_price, *closes), price, float(self._random.randint(1, 1000))])
+        # ราคาเริ่มของ feed ต่อจากแท่งสุดท้ายของประวัติ
+        self._prices[symbol] = price
+        self._candles[symbol] = self._new_candle(first_time, price)
+        return candles
+
+    async def tick(self):
+        """ส่งราคาใหม่หนึ่ง tick ของทุกเหรียญ (และปิดแท่งเมื่อครบ ticks_per_candle)"""
+        self._step += 1
+        is_closed = self._step >= self.ticks_per_candle
+        for symbol, timeframe in self.pairs.items():
+            candle = self._candles[symbol]
+            timeframe_ms = SimulatedExchange.parse_timeframe(timeframe) * 1000
+            event_time = candle[0] + timeframe_ms * self._step // self.ticks_per_candle - (1 if is_closed else 0)
+            price = self._next_price(symbol)
+            quantity = float(self._random.randint(1, 50))
+            candle[2] = max(candle[2], price)
+            candle[3] = min(candle[3], price)
+            candle[4] = price
+            candle[5] += quantity
+
+            await self.publish({
+                'stream': f"{symbol.lower()}@aggTrade",
+                'data': {'e': 'aggTrade', 'E': event_time, 's': symbol, 'p': str(price), 'q': str(quantity), 'T': event_time}
+            })
+            await self.publish({
+                'stream': f"{symbol.lower()}@kline_{timeframe}",
+                'data': {
+                    'e': 'kline', 'E': event_time + (1 if is_closed else 0), 's': symbol,
+                    'k': {
+                        't': candle[0], 'T': candle[0] + timeframe_ms - 1, 's': symbol, 'i': timeframe,
+                        'o': str(candle[1]), 'h': str(candle[2]), 'l': str(candle[3]), 'c': str(candle[4]),
+                        'v': str(candle[5]), 'x': is_closed
+                    }
+                }
+            })
+            if is_closed:
+                self._candles[symbol] = self._new_candle(candle[0] + timeframe_ms, price)
+
+        self.tick_count += 1
+        if is_closed:
+            self._step = 0
+
+    async def publish(self, event: dict):
+        """อัพเดท exchange ก่อนแล้วส่งให้ trackers (ลำดับเดียวกับที่ order ถูก fill ก่อนบอทเห็นราคา)"""
+        self.exchange.apply_stream_event(event['data'])
+        await self.stream_manager.publish(event)
+
+    async def run(self):
+        """ส่ง tick ทุก tick_interval วินาทีจนกว่าจะเรียก stop()"""
+        self.is_running = True
+        while self.is_running:
+            await self.tick()
+            await asyncio.sleep(self.tick_interval)
+
+    def stop(self):
+        self.is_running = False
@@ -0,0 +1,99 @@
+import json
+import os
+import sqlite3
+from typing import Dict, Optional
+
+from function.message import message
+
+STATE_STORE_FILE = 'json/state/state.db'
+
+class StateStore:
+    """เก็บ state ของแต่ละเหรียญแบบ field ละแถวใน SQLite (WAL) เขียนเฉพาะ field ที่เปลี่ยน"""
+    def __init__(self, filepath: str = STATE_STORE_FILE):
+        self.filepath = filepath
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        self.conn = sqlite3.connect(filepath)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS symbol_state (
+                symbol TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (symbol, field)
+            )
+        """)
+        self.conn.commit()
+        self._written: Dict[str, Dict[str, str]] = {}  # symbol -> field -> ค่า JSON ล่าสุดที่อยู่ใน database
+
+    def _get_written(self, symbol: str) -> Dict[str, str]:
+        written = self._written.get(symbol)
+        if written is None:
+            rows = self.conn.execute("SELECT field, value FROM symbol_state WHERE symbol = ?", (symbol,)).fetchall()
+            written = dict(rows)
+            self._written[symbol] = written
+        return written
+
+    def load(self, symbol: str) -> Optional[dict]:
+        """โหลด state ของเหรียญ (อ่าน disk ครั้งแรกครั้งเดียว) คืน None ถ้ายังไม่เคยบันทึก"""
+        written = self._get_written(symbol)
+        if not written:
+            return None
+
+        state = {}
+        for field, value in written.items():
+            try:
+                state[field] = json.loads(value)
+            except json.JSONDecodeError:
+                # field ที่เสียหายข้ามไปใช้ค่าเริ่มต้น ไม่ต้องทิ้ง state ทั้งหมด
+                message(symbol, f"ข้อมูลสถานะ {field} เสียหาย ใช้ค่าเริ่มต้นแทน", "yellow")
+        return state
+
+    def save(self, symbol: str, snapshot: dict) -> int:
+        """บันทึกเฉพาะ field ที่เปลี่ยนใน transaction เดียว คืนจำนวน field ที่เขียน"""
+        written = self._get_written(symbol)
+        dirty = {}
+        for field, value in snapshot.items():
+            serialized = json.dumps(value, sort_keys=True, default=str)
+            if written.get(field) != serialized:
+                dirty[field] = serialized
+        if not dirty:
+            return 0
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO symbol_state (symbol, field, value) VALUES (?, ?, ?)",
+                [(symbol, field, value) for field, value in dirty.items()]
+            )
+        written.update(dirty)
+        return len(dirty)
+
+    def import_legacy_file(self, symbol: str, filepath: str, fields=None) -> bool:
+        """ย้าย state จากไฟล์ json/state/{symbol}.json แบบเดิม (ถ้ามีและอ่านได้) เฉพาะ fields ที่ระบุ"""
+        if not os.path.exists(filepath):
+            return False
+        try:
+            with open(filepath, 'r') as f:
+                legacy_state = json.load(f)
+            if fields is not None:
+                legacy_state = {k: v for k, v in legacy_state.items() if k in fields}
+            self.save(symbol, legacy_state)
+            os.replace(filepath, filepath + '.migrated')
+            message(symbol, "ย้ายไฟล์สถานะเดิมเข้า state store แล้ว", "blue")
+            return True
+        except (json.JSONDecodeError, OSError) as e:
+            message(symbol, f"ไม่สามารถย้ายไฟล์สถานะเดิม: {str(e)}", "yellow")
+            return False
+
+    def close(self):
+        self.conn.close()
+
+# Singleton instance
+_state_store: Optional[StateStore] = None
+
+def get_state_store() -> StateStore:
+    """ดึงหรือสร้าง instance ของ state store"""
+    global _state_store
+    if _state_store is None:
+        _state_store = StateStore()
+    return _state_store
@@ -0,0 +1,85 @@
+import json
+from typing import Callable, Optional
+
+from config import WS_JSON_BACKEND
+
+try:
+    import orjson
+except ImportError:  # orjson เป็น optional ถ้าไม่มีจะใช้ตัวถัดไป
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec เป็น optional เช่นกัน
+    msgspec = None
+
+# ชื่อ stream (ส่วนหลัง @ ก่อน _ หรือ @) -> event type ใน field 'e' ของข้อมูล
+STREAM_EVENT_TYPES = {
+    'aggTrade': 'aggTrade',
+    'trade': 'trade',
+    'kline': 'kline',
+    'markPrice': 'markPriceUpdate',
+    'bookTicker': 'bookTicker',
+    'depth': 'depthUpdate',
+    'forceOrder': 'forceOrder',
+}
+_STREAM_PREFIX = '{"stream":"'
+
+def _get_backends() -> dict:
+    backends = {}
+    if orjson is not None:
+        backends['orjson'] = orjson.loads
+    if msgspec is not None:
+        backends['msgspec'] = msgspec.json.Decoder().decode
+    backends['json'] = json.loads
+    return backends
+
+def get_json_loads(backend: str = WS_JSON_BACKEND) -> Callable:
+    """ฟังก์ชัน decode JSON ของ backend ที่เลือก ('auto' ใช้ตัวที่เร็วที่สุดที่ติดตั้งอยู่)"""
+    backends = _get_backends()
+    if backend == 'auto':
+        return next(iter(backends.values()))
+    if backend not in backends:
+        raise ValueError(f"ไม่มี JSON backend '{backend}' (ที่ใช้ได้: {', '.join(backends)})")
+    return backends[backend]
+
+def get_json_backend_name(backend: str = WS_JSON_BACKEND) -> str:
+    return next(iter(_get_backends())) if backend == 'auto' else backend
+
+def peek_event_type(raw_message) -> Optional[str]:
+    """event type ของข้อความ combined stream จากชื่อ stream ต้นข้อความ โดยไม่ต้อง parse ทั้งข้อความ
+
+    คืน None ถ้าไม่ใช่รูปแบบ {"stream":"<symbol>@<name>",...} หรือเป็น stream ที่ไม่รู้จัก
+    (ผู้เรียกต้อง parse เต็มแทน)
+    """
+    if isinstance(raw_message, bytes):
+        raw_message = raw_message[:64].decode('utf-8', 'ignore')
+    if not raw_message.startswith(_STREAM_PREFIX):
+        return None
+    end = raw_message.find('"', len(_STREAM_PREFIX))
+    at = raw_message.find('@', len(_STREAM_PREFIX), end)
+    if end < 0 or at < 0:
+        return None
+    name = raw_message[at + 1:end].split('@', 1)[0].split('_', 1)[0]
+    return STREAM_EVENT_TYPES.get(name)
+
+class StreamDecoder:
+    """decode ข้อความ websocket ด้วย backend ที่เร็วที่สุด และข้ามข้อความที่ไม่มี handler ก่อน parse
+
+    ข้อความที่ได้เป็น dict รูปแบบเดียวกับ json.loads ทุก backend (timestamp เป็น int epoch ms ตามที่ Binance ส่งมา)
+    """
+    def __init__(self, backend: str = WS_JSON_BACKEND):
+        self.backend = get_json_backend_name(backend)
+        self.loads = get_json_loads(backend)
+        self.decoded = 0
+        self.skipped = 0
+
+    def decode(self, raw_message, wanted_events=None) -> Optional[dict]:
+        """คืนข้อความที่ decode แล้ว หรือ None ถ้า event type ไม่อยู่ใน wanted_events"""
+        if wanted_events is not None:
+            event_type = peek_event_type(raw_message)
+            if event_type is not None and event_type not in wanted_events:
+                self.skipped += 1
+                return None
+        self.decoded += 1
+        return self.loads(raw_message)
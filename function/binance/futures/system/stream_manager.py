@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+import websockets
+
+from config import WS_MAX_STREAMS_PER_CONNECTION
+from function.binance.futures.system.stream_decoder import StreamDecoder
+
+class _StreamShard:
+    """connection เดียวของ combined stream พร้อมรายชื่อ stream ที่ถืออยู่"""
+    def __init__(self, shard_id: int):
+        self.shard_id = shard_id
+        self.streams: Set[str] = set()
+        self.websocket = None
+        self.task: Optional[asyncio.Task] = None
+
+class BinanceStreamManager:
+    """รวม stream ของทุก tracker ไว้ใน combined-stream connection เดียว (แบ่ง shard เมื่อ stream เต็ม)"""
+    def __init__(self, max_streams_per_connection: int = WS_MAX_STREAMS_PER_CONNECTION):
+        self.ws_url = "wss://fstream.binance.com/stream"
+        self.max_streams_per_connection = max_streams_per_connection
+        self.shards: List[_StreamShard] = []
+        self.handlers = defaultdict(list)  # event type (เช่น aggTrade, kline) -> handlers
+        self.decoder = StreamDecoder()
+        self._wanted_events: Set[str] = set()  # event type ที่มี handler (ข้อความอื่นข้ามได้โดยไม่ต้อง parse)
+        self.is_running = False
+        self.logger = self._setup_logger()
+        self._next_request_id = 1
+        self._pending_requests: Dict[int, dict] = {}  # request id -> {method, params, shard, sent_at}
+        self._stopped = asyncio.Event()
+        self._record_file = None  # ไฟล์ NDJSON ที่บันทึกข้อความดิบไว้ replay ภายหลัง
+
+    def _setup_logger(self):
+        logger = logging.getLogger('BinanceStreamManager')
+        logger.setLevel(logging.INFO)
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        return logger
+
+    def add_handler(self, event_type: str, handler):
+        """ลงทะเบียน coroutine ที่จะรับข้อมูลของ event type ที่ระบุ"""
+        if handler not in self.handlers[event_type]:
+            self.handlers[event_type].append(handler)
+        self._wanted_events.add(event_type)
+
+    def remove_handler(self, event_type: str, handler):
+        """ยกเลิก handler ของ event type ที่ระบุ"""
+        if handler in self.handlers[event_type]:
+            self.handlers[event_type].remove(handler)
+        if not self.handlers[event_type]:
+            self._wanted_events.discard(event_type)
+
+    @property
+    def streams(self) -> Set[str]:
+        """stream ทั้งหมดที่สมัครอยู่ในทุก shard"""
+        return set().union(*(shard.streams for shard in self.shards))
+
+    @property
+    def pending_requests(self) -> Dict[int, dict]:
+        """คำขอ SUBSCRIBE/UNSUBSCRIBE ที่ยังไม่ได้รับการตอบกลับ"""
+        return dict(self._pending_requests)
+
+    async def subscribe(self, streams: List[str]):
+        """สมัคร stream หลายตัวพร้อมกัน ส่งเป็น request เดียวต่อ shard"""
+        new_streams = [stream for stream in dict.fromkeys(streams) if stream not in self.streams]
+        if not new_streams:
+            return
+
+        by_shard = defaultdict(list)
+        for stream in new_streams:
+            shard = self._get_shard_with_capacity()
+            shard.streams.add(stream)
+            by_shard[shard].append(stream)
+
+        for shard, shard_streams in by_shard.items():
+            if shard.websocket:
+                await self._send_request(shard, "SUBSCRIBE", shard_streams)
+            elif self.is_running and shard.task is None:
+                shard.task = asyncio.create_task(self._run_shard(shard))
+
+    async def unsubscribe(self, streams: List[str]):
+        """ยกเลิก stream หลายตัวพร้อมกัน"""
+        by_shard = defaultdict(list)
+        for stream in dict.fromkeys(streams):
+            for shard in self.shards:
+                if stream in shard.streams:
+                    shard.streams.discard(stream)
+                    by_shard[shard].append(stream)
+                    break
+
+        for shard, shard_streams in by_shard.items():
+            if shard.websocket:
+                await self._send_request(shard, "UNSUBSCRIBE", shard_streams)
+
+    def _get_shard_with_capacity(self) -> _StreamShard:
+        """หา shard ที่ยังรับ stream เพิ่มได้ หรือสร้าง shard ใหม่"""
+        for shard in self.shards:
+            if len(shard.streams) < self.max_streams_per_connection:
+                return shard
+        shard = _StreamShard(len(self.shards))
+        self.shards.append(shard)
+        return shard
+
+    def start_recording(self, filepath: str):
+        """บันทึกทุกข้อความที่ได้รับลงไฟล์ (บรรทัดละข้อความ) สำหรับ replay.py"""
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        self.stop_recording()
+        self._record_file = open(filepath, 'a', encoding='utf-8')
+
+    def stop_recording(self):
+        if self._record_file:
+            self._record_file.close()
+            self._record_file = None
+
+    async def start(self):
+        """เริ่มทุก shard และรอจนกว่าจะถูกหยุด (เรียกซ้ำได้ จะรอ instance เดิม)"""
+        if not self.is_running:
+            self.is_running = True
+            self._stopped.clear()
+            for shard in self.shards:
+                if shard.streams and shard.task is None:
+                    shard.task = asyncio.create_task(self._run_shard(shard))
+        await self._stopped.wait()
+
+    async def stop(self):
+        """ปิดทุก connection"""
+        self.is_running = False
+        tasks = []
+        for shard in self.shards:
+            if shard.websocket:
+                try:
+                    await shard.websocket.close()
+                except Exception as e:
+                    self.logger.error(f"เกิดข้อผิดพลาดในการปิด WebSocket shard {shard.shard_id}: {str(e)}")
+            if shard.task:
+                shard.task.cancel()
+                tasks.append(shard.task)
+                shard.task = None
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pending_requests.clear()
+        self.stop_recording()
+        self._stopped.set()
+
+    async def _run_shard(self, shard: _StreamShard):
+        """ลูปเชื่อมต่อของ shard เดียว พร้อม reconnect แบบ backoff"""
+        reconnect_delay = 1
+        while self.is_running and shard.streams:
+            try:
+                async with websockets.connect(self.ws_url) as websocket:
+                    shard.websocket = websocket
+                    reconnect_delay = 1
+
+                    # สมัคร stream ทั้งหมดของ shard ใน request เดียว
+                    await self._send_request(shard, "SUBSCRIBE", sorted(shard.streams))
+
+                    while self.is_running:
+                        try:
+                            raw_message = await websocket.recv()
+                            if self._record_file:
+                                self._record_file.write(raw_message + '\n')
+                            await self._handle_raw_message(raw_message)
+                        except websockets.exceptions.ConnectionClosed:
+                            if not self.is_running:
+                                break
+                            self.logger.warning(f"การเชื่อมต่อ WebSocket shard {shard.shard_id} ถูกปิด กำลังพยายามเชื่อมต่อใหม่...")
+                            break
+                        except Exception as e:
+                            self.logger.error(f"เกิดข้อผิดพลาดในการจัดการข้อความ: {str(e)}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ WebSocket shard {shard.shard_id}: {str(e)}")
+            finally:
+                shard.websocket = None
+                self._drop_pending_requests(shard)
+
+            if self.is_running:
+                # สุ่มหน่วงเวลาไม่ให้ทุก shard เชื่อมต่อใหม่พร้อมกัน
+                await asyncio.sleep(reconnect_delay + random.uniform(0, reconnect_delay))
+                reconnect_delay = min(reconnect_delay * 2, 60)
+
+        shard.task = None
+
+    async def _send_request(self, shard: _StreamShard, method: str, params: List[str]):
+        """ส่ง SUBSCRIBE/UNSUBSCRIBE พร้อม request id ที่ไม่ซ้ำกัน"""
+        if not params or not shard.websocket:
+            return
+
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        self._pending_requests[request_id] = {
+            'method': method,
+            'params': params,
+            'shard': shard.shard_id,
+            'sent_at': time.time()
+        }
+        await shard.websocket.send(json.dumps({
+            "method": method,
+            "params": params,
+            "id": request_id
+        }))
+
+    def _drop_pending_requests(self, shard: _StreamShard):
+        """ลบคำขอที่ค้างของ shard ที่หลุดการเชื่อมต่อ (จะส่งใหม่ตอนเชื่อมต่อ)"""
+        for request_id, request in list(self._pending_requests.items()):
+            if request['shard'] == shard.shard_id:
+                del self._pending_requests[request_id]
+
+    async def _handle_raw_message(self, raw_message):
+        """decode ข้อความดิบจาก websocket (ข้อความของ stream ที่ไม่มี handler จะไม่ถูก parse)"""
+        message = self.decoder.decode(raw_message, self._wanted_events)
+        if message is not None:
+            await self._handle_message(message)
+
+    async def _handle_message(self, message: dict):
+        """แยกข้อความตอบกลับ (ack) และข้อมูล stream แล้วส่งต่อให้ handler"""
+        if 'id' in message and ('result' in message or 'error' in message):
+            request = self._pending_requests.pop(message['id'], None)
+            if 'error' in message:
+                self.logger.error(f"คำขอ {message['id']} ({request['method'] if request else '-'}) ล้มเหลว: {message['error']}")
+            return
+
+        data = message.get('data', message)
+        event_type = data.get('e') if isinstance(data, dict) else None
+        for handler in self.handlers.get(event_type, []):
+            try:
+                await handler(data)
+            except Exception as e:
+                self.logger.error(f"เกิดข้อผิดพลาดใน handler ของ {event_type}: {str(e)}")
+
+# Singleton instance
+_stream_manager: Optional[BinanceStreamManager] = None
+
+def get_stream_manager() -> BinanceStreamManager:
+    """ดึงหรือสร้าง instance ของ stream manager"""
+    global _stream_manager
+    if _stream_manager is None:
+        _stream_manager = BinanceStreamManager()
+    return _stream_manager
@@ -0,0 +1,86 @@
+import json
+import math
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from function.message import message
+
+SYMBOL_PRECISION_FILE = 'json/symbol_precision.json'
+
+def _parse_precision(value):
+    """แปลง precision เป็น (จำนวนทศนิยม, ขนาด step ในหน่วยที่เล็กที่สุด)
+
+    ไฟล์เดิมเก็บเป็นจำนวนทศนิยม (int) แต่ ccxt รุ่นใหม่ส่ง tick size มา (float เช่น 0.1)
+    """
+    if isinstance(value, int):
+        return value, 1
+    exponent = Decimal(str(value)).normalize().as_tuple().exponent
+    decimals = max(0, -exponent)
+    return decimals, max(1, round(float(value) * 10 ** decimals))
+
+class SymbolPrecision:
+    """precision และ limits ของเหรียญเดียว พร้อมตัวคูณที่คำนวณไว้ล่วงหน้า"""
+    __slots__ = ('id', 'symbol', 'price_precision', 'amount_precision', 'price_scale', 'amount_scale',
+                 'price_step', 'amount_step', 'min_amount', 'min_notional')
+
+    def __init__(self, item: dict):
+        self.id = item['id']
+        self.symbol = item.get('symbol')
+        self.price_precision, self.price_step = _parse_precision(item['precision']['price'])
+        self.amount_precision, self.amount_step = _parse_precision(item['precision']['amount'])
+        self.price_scale = 10 ** self.price_precision
+        self.amount_scale = 10 ** self.amount_precision
+        limits = item.get('limits') or {}
+        self.min_amount = (limits.get('amount') or {}).get('min')
+        self.min_notional = (item.get('info') or {}).get('minNotional')
+
+def truncate_to_scale(value: float, scale: int, step: int = 1) -> float:
+    """ตัดทศนิยมทิ้ง (ROUND_DOWN เข้าหาศูนย์) ด้วย integer ของหน่วยที่เล็กที่สุด"""
+    scaled = value * scale
+    # เผื่อ error ของ float เช่น 0.29 * 100 = 28.999999999999996
+    units = math.trunc(scaled + math.copysign(max(abs(scaled), 1.0) * 1e-12, scaled))
+    if step > 1:
+        units = int(math.copysign(abs(units) // step * step, units))
+    return units / scale
+
+class SymbolPrecisionIndex:
+    """index ของ precision ทุกเหรียญ โหลดจากไฟล์ครั้งเดียวแล้วค้นหาด้วย dict"""
+    def __init__(self, filepath: str = SYMBOL_PRECISION_FILE):
+        self.filepath = filepath
+        self.symbols: Dict[str, SymbolPrecision] = {}
+        self.is_loaded = False
+
+    def load(self):
+        """โหลด (หรือโหลดใหม่) จากไฟล์ symbol_precision.json"""
+        try:
+            with open(self.filepath, 'r') as file:
+                self.update(json.load(file))
+        except Exception as e:
+            message("SYSTEM", f"Error loading symbol data: {str(e)}", "red")
+            self.is_loaded = True
+
+    def update(self, symbol_data: List[dict]):
+        """แทนที่ index ทั้งหมดด้วยข้อมูลชุดใหม่ (สร้างเสร็จก่อนแล้วค่อยสลับ)"""
+        symbols = {}
+        for item in symbol_data:
+            try:
+                symbols[item['id']] = SymbolPrecision(item)
+            except (KeyError, TypeError, ValueError):
+                continue
+        self.symbols = symbols
+        self.is_loaded = True
+
+    def get(self, symbol: str) -> Optional[SymbolPrecision]:
+        if not self.is_loaded:
+            self.load()
+        return self.symbols.get(symbol)
+
+# Singleton instance
+_symbol_precision_index: Optional[SymbolPrecisionIndex] = None
+
+def get_symbol_precision_index() -> SymbolPrecisionIndex:
+    """ดึงหรือสร้าง instance ของ symbol precision index"""
+    global _symbol_precision_index
+    if _symbol_precision_index is None:
+        _symbol_precision_index = SymbolPrecisionIndex()
+    return _symbol_precision_index
@@ -0,0 +1,123 @@
+import asyncio
+import random
+import time
+import traceback
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+from config import (
+    MAX_CONCURRENT_SYMBOLS,
+    RATE_LIMIT_WEIGHT_BUDGET,
+    SCHEDULER_REPORT_INTERVAL,
+    SYMBOL_CYCLE_INTERVAL,
+    SYMBOL_CYCLE_JITTER,
+)
+from function.binance.futures.system.exchange_pool import get_exchange_pool
+from function.message import message
+
+class SymbolScheduler:
+    """รันแต่ละเหรียญเป็น task ของตัวเอง จำกัดจำนวนที่ทำงานพร้อมกันด้วย semaphore"""
+    def __init__(self, run_cycle, max_concurrency=MAX_CONCURRENT_SYMBOLS, interval=SYMBOL_CYCLE_INTERVAL,
+                 jitter=SYMBOL_CYCLE_JITTER, weight_budget=RATE_LIMIT_WEIGHT_BUDGET,
+                 report_interval=SCHEDULER_REPORT_INTERVAL):
+        self.run_cycle = run_cycle  # coroutine function(symbol, state)
+        self.interval = interval
+        self.jitter = jitter
+        self.weight_budget = weight_budget
+        self.report_interval = report_interval
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.latencies = defaultdict(lambda: deque(maxlen=100))
+        self.cycle_counts = defaultdict(int)
+        self.is_running = False
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._report_task: Optional[asyncio.Task] = None
+
+    async def start(self, symbol_states: dict):
+        """เริ่ม task ของทุกเหรียญและรอจนกว่าจะถูกหยุด"""
+        self.is_running = True
+        for symbol, state in symbol_states.items():
+            self.tasks[symbol] = asyncio.create_task(self._supervise(symbol, state))
+        self._report_task = asyncio.create_task(self._report_loop())
+
+        try:
+            await asyncio.gather(*self.tasks.values())
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """หยุด task ทั้งหมด"""
+        self.is_running = False
+        tasks = list(self.tasks.values())
+        if self._report_task:
+            tasks.append(self._report_task)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks.clear()
+        self._report_task = None
+
+    async def _supervise(self, symbol: str, state):
+        """รัน loop ของเหรียญ และเริ่มใหม่ถ้า loop หลุดด้วย error"""
+        restart_delay = 1
+        while self.is_running:
+            cycles_before = self.cycle_counts[symbol]
+            try:
+                await self._run_symbol(symbol, state)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # รอบก่อนหน้าทำงานสำเร็จอย่างน้อยหนึ่งรอบ ไม่ใช่การล้มติดกัน เริ่มนับเวลารอใหม่
+                if self.cycle_counts[symbol] > cycles_before:
+                    restart_delay = 1
+                error_traceback = traceback.format_exc()
+                message(symbol, f"Scheduler: task หลุดด้วยข้อผิดพลาด เริ่มใหม่ใน {restart_delay} วินาที: {str(e)}", "red")
+                message(symbol, f"Error: {error_traceback}", "red")
+                await asyncio.sleep(restart_delay)
+                restart_delay = min(restart_delay * 2, 60)
+
+    async def _run_symbol(self, symbol: str, state):
+        """loop หลักของแต่ละเหรียญ"""
+        # กระจายเวลาเริ่มต้นของแต่ละเหรียญ
+        await asyncio.sleep(random.uniform(0, self.jitter))
+
+        while self.is_running:
+            await self._wait_for_weight_budget()
+
+            async with self._semaphore:
+                started = time.perf_counter()
+                await self.run_cycle(symbol, state)
+                self.latencies[symbol].append(time.perf_counter() - started)
+                self.cycle_counts[symbol] += 1
+
+            await asyncio.sleep(self.interval + random.uniform(0, self.jitter))
+
+    async def _wait_for_weight_budget(self):
+        """รอถ้า used weight ของ ccxt เกินงบที่ตั้งไว้ จนกว่าจะขึ้นนาทีใหม่"""
+        while self.is_running and get_exchange_pool().get_used_weight() >= self.weight_budget:
+            await asyncio.sleep(60 - (time.time() % 60) + random.uniform(0, self.jitter))
+
+    def get_latency_stats(self, symbol: str) -> Optional[dict]:
+        """สรุป latency ของรอบการทำงานล่าสุดของเหรียญ (วินาที)"""
+        samples = sorted(self.latencies[symbol])
+        if not samples:
+            return None
+        return {
+            'cycles': self.cycle_counts[symbol],
+            'last': self.latencies[symbol][-1],
+            'p50': samples[len(samples) // 2],
+            'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            'max': samples[-1]
+        }
+
+    async def _report_loop(self):
+        """รายงาน latency ของแต่ละเหรียญเป็นระยะ"""
+        while self.is_running:
+            await asyncio.sleep(self.report_interval)
+            for symbol in list(self.tasks):
+                stats = self.get_latency_stats(symbol)
+                if stats:
+                    message("SYSTEM",
+                        f"{symbol} cycle latency: p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s, " +
+                        f"max {stats['max']:.2f}s ({stats['cycles']} รอบ)", "blue")
+            message("SYSTEM", f"Used weight ล่าสุด: {get_exchange_pool().get_used_weight()}/{self.weight_budget}", "blue")
@@ -0,0 +1,156 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from function.message import message
+
+TRADE_JOURNAL_FILE = 'json/trade_records/trades.db'
+
+_SUMMARY_SQL = """
+    SELECT COUNT(*),
+           COALESCE(SUM(profit_loss > 0), 0),
+           COALESCE(SUM(profit_loss <= 0), 0),
+           COALESCE(SUM(profit_loss), 0),
+           COALESCE(MAX(profit_loss), 0),
+           COALESCE(MIN(profit_loss), 0),
+           MIN(timestamp)
+    FROM trades WHERE symbol = ?
+"""
+
+class TradeJournal:
+    """บันทึกการเทรดแบบ append-only ใน SQLite (WAL) พร้อม index ตาม symbol และเวลา"""
+    def __init__(self, filepath: str = TRADE_JOURNAL_FILE):
+        self.filepath = filepath
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        is_new = not os.path.exists(filepath)
+
+        self.conn = sqlite3.connect(filepath)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS trades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                action TEXT,
+                entry_price REAL,
+                exit_price REAL,
+                amount REAL,
+                profit_loss REAL,
+                profit_loss_percentage REAL,
+                reason TEXT,
+                data TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_symbol_time ON trades (symbol, timestamp)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_symbol_id ON trades (symbol, id)")
+        self.conn.commit()
+
+        if is_new:
+            self.import_legacy_records(os.path.dirname(filepath))
+
+    def import_legacy_records(self, directory: str):
+        """ย้ายประวัติจากไฟล์ json/trade_records/{symbol}.json แบบเดิมเข้ามาครั้งเดียว"""
+        for path in sorted(Path(directory).glob('*.json')):
+            try:
+                with open(path, 'r') as f:
+                    trades = json.load(f)
+                for trade in trades:
+                    self._insert(trade)
+                self.conn.commit()
+                message(path.stem, f"ย้ายประวัติการเทรด {len(trades)} รายการเข้า trade journal", "blue")
+            except Exception as e:
+                message(path.stem, f"ย้ายประวัติการเทรดจาก {path} ไม่สำเร็จ: {str(e)}", "yellow")
+
+    def _insert(self, trade: dict):
+        self.conn.execute(
+            """INSERT INTO trades (timestamp, symbol, action, entry_price, exit_price, amount,
+                                   profit_loss, profit_loss_percentage, reason, data)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                trade.get('timestamp') or datetime.now().isoformat(),
+                trade['symbol'],
+                trade.get('action'),
+                trade.get('entry_price'),
+                trade.get('exit_price'),
+                trade.get('amount'),
+                trade.get('profit_loss', 0),
+                trade.get('profit_loss_percentage'),
+                trade.get('reason'),
+                json.dumps(trade)
+            )
+        )
+
+    def append(self, trade: dict):
+        """เพิ่มการเทรดหนึ่งรายการ (เวลาคงที่ไม่ขึ้นกับจำนวนประวัติ)"""
+        self._insert(trade)
+        self.conn.commit()
+
+    def get_trades(self, symbol: str, since: Optional[str] = None, limit: Optional[int] = None,
+                   with_id: bool = False) -> List[dict]:
+        """ดึงการเทรดของเหรียญ เรียงจากเก่าไปใหม่ (since เป็น ISO timestamp, with_id ใส่ id ของแถวไว้ใน key 'id')"""
+        query = "SELECT id, data FROM trades WHERE symbol = ?"
+        params = [symbol]
+        if since:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        query += " ORDER BY timestamp DESC, id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self.conn.execute(query, params).fetchall()
+        if with_id:
+            return [{**json.loads(row[1]), 'id': row[0]} for row in reversed(rows)]
+        return [json.loads(row[1]) for row in reversed(rows)]
+
+    def get_trades_after(self, trade_id: int) -> List[tuple]:
+        """การเทรดของทุกเหรียญที่ id มากกว่า trade_id เรียงตาม id คืน [(id, trade), ...]"""
+        rows = self.conn.execute("SELECT id, data FROM trades WHERE id > ? ORDER BY id", (trade_id,)).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def get_last_id(self) -> int:
+        """id ของการเทรดล่าสุด (0 ถ้ายังไม่มี)"""
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM trades").fetchone()[0]
+
+    def get_summary(self, symbol: str) -> dict:
+        """สรุปผลการเทรดของเหรียญ (ใช้ชื่อ key เดียวกับ performance_data)"""
+        count, wins, losses, total, largest_profit, largest_loss, start_time = self.conn.execute(_SUMMARY_SQL, (symbol,)).fetchone()
+        return {
+            'trades_count': count,
+            'winning_trades': wins,
+            'losing_trades': losses,
+            'total_profit': total,
+            'largest_profit': max(largest_profit, 0),
+            'largest_loss': min(largest_loss, 0),
+            'start_time': start_time
+        }
+
+    def get_consecutive_losses(self, symbol: str, loss_threshold: float = -1) -> int:
+        """นับจำนวนเทรดขาดทุนติดกันล่าสุด (ขาดทุนมากกว่า loss_threshold) สำหรับ martingale"""
+        # อ่านย้อนหลังจากเทรดล่าสุดจนเจอเทรดที่ไม่ขาดทุน (ไม่ต้องอ่านประวัติทั้งหมด)
+        cursor = self.conn.execute(
+            "SELECT profit_loss FROM trades WHERE symbol = ? ORDER BY id DESC",
+            (symbol,)
+        )
+        losses = 0
+        for (profit_loss,) in cursor:
+            if profit_loss is None or profit_loss >= loss_threshold:
+                break
+            losses += 1
+        return losses
+
+    def close(self):
+        self.conn.close()
+
+# Singleton instance
+_trade_journal: Optional[TradeJournal] = None
+
+def get_trade_journal() -> TradeJournal:
+    """ดึงหรือสร้าง instance ของ trade journal"""
+    global _trade_journal
+    if _trade_journal is None:
+        _trade_journal = TradeJournal()
+    return _trade_journal
@@ -1,17 +1,17 @@
 import json
 import os
 import traceback
-from config import TRADING_CONFIG
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+import asyncio
+from config import SYMBOL_DATA_REFRESH_INTERVAL, TRADING_CONFIG
+from function.binance.futures.system.exchange_pool import get_exchange
+from function.binance.futures.system.symbol_precision_index import get_symbol_precision_index
 from function.message import message
 
 async def update_symbol_data(api_key, api_secret):
-    exchange = None
     try:
-        exchange = await create_future_exchange(api_key, api_secret)
-        
         # เพิ่ม await สำหรับ fetch_markets
-        data = await exchange.fetch_markets()
+        async with get_exchange(api_key, api_secret) as exchange:
+            data = await exchange.fetch_markets()
 
         filtered_data = []
         for item in data:
@@ -36,6 +36,9 @@ async def update_symbol_data(api_key, api_secret):
         with open('json/symbol_precision.json', 'w') as f:
             json.dump(filtered_data, f, indent=4)
 
+        # อัพเดท index ในหน่วยความจำให้ทุก module เห็นข้อมูลใหม่ทันที
+        get_symbol_precision_index().update(filtered_data)
+
         message("SYSTEM", f"อัพเดท symbol_data เรียบร้อย! จำนวน {len(filtered_data)} symbols", "green")
         
         return filtered_data
@@ -45,11 +48,9 @@ async def update_symbol_data(api_key, api_secret):
         message("SYSTEM", f"เกิดข้อผิดพลาดในการอัพเดท symbol_data: {str(e)}", "red")
         message("SYSTEM", f"Error: {error_traceback}", "red")
         return None
-        
-    finally:
-        # ปิด exchange ใน finally block
-        if exchange:
-            try:
-                await exchange.close()
-            except Exception as e:
-                message("MAIN", f"เกิดข้อผิดพลาดในการปิด exchange: {str(e)}", "red")
\ No newline at end of file
+
+async def refresh_symbol_data_periodically(api_key, api_secret, interval=SYMBOL_DATA_REFRESH_INTERVAL):
+    """อัพเดท symbol_data เป็นระยะใน background (precision/limits ของ Binance เปลี่ยนได้)"""
+    while True:
+        await asyncio.sleep(interval)
+        await update_symbol_data(api_key, api_secret)
@@ -1,51 +1,67 @@
-import os
+import atexit
 import json
+import queue
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-import math
+
+from config import (
+    MESSAGE_LOG_FLUSH_INTERVAL,
+    MESSAGE_LOG_MAX_SEGMENT_AGE,
+    MESSAGE_LOG_MAX_SEGMENT_BYTES,
+    MESSAGE_LOG_QUEUE_SIZE,
+)
+
+class _Segment:
+    """ไฟล์ part ที่กำลังเขียนอยู่ของ symbol/วันที่หนึ่ง"""
+    __slots__ = ('part', 'path', 'size', 'opened_at')
+
+    def __init__(self, part: int, path: Path):
+        self.part = part
+        self.path = path
+        self.size = path.stat().st_size if path.exists() else 0
+        self.opened_at = time.monotonic()
 
 class MessageLogger:
-    MESSAGES_PER_FILE = 20
-    
-    def __init__(self):
+    """เขียน log ลงไฟล์ newline-delimited JSON ด้วย thread เบื้องหลัง (message() ไม่ต้องรอ disk)"""
+
+    def __init__(self, queue_size: int = MESSAGE_LOG_QUEUE_SIZE):
         self.base_dir = Path('json/message_logs')
         self.last_message_content = {}
-        
+        self.flush_interval = MESSAGE_LOG_FLUSH_INTERVAL
+        self.max_segment_bytes = MESSAGE_LOG_MAX_SEGMENT_BYTES
+        self.max_segment_age = MESSAGE_LOG_MAX_SEGMENT_AGE
+        self.dropped_messages = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._segments = {}  # (symbol, date) -> _Segment ที่กำลังเขียน
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
     def ensure_directory(self, symbol: str, date: str):
         """Ensure the directory structure exists for given symbol and date"""
         directory = self.base_dir / symbol / date
         directory.mkdir(parents=True, exist_ok=True)
         return directory
-        
+
     def get_latest_part_number(self, directory: Path) -> int:
         """Get the latest part number in the directory"""
-        parts = list(directory.glob(f'*_part_*.json'))
+        parts = list(directory.glob('*_part_*.json*'))
         if not parts:
             return 0
-        
-        part_numbers = [int(p.stem.split('_part_')[1]) for p in parts]
+
+        part_numbers = [int(p.name.split('_part_')[1].split('.')[0]) for p in parts]
         return max(part_numbers)
-        
+
     def save_message(self, symbol: str, message: str, color: str = 'white'):
-        """Save a message to the appropriate JSON file"""
+        """ส่ง message เข้าคิวให้ writer thread เขียนลงไฟล์ (ไม่ block)"""
         # Check for duplicate message
         current_message = f"[{symbol}] {message}" if symbol else message
-        last_message = self.last_message_content.get(symbol, "")
-        
-        # If message is duplicate, don't save or print
-        if current_message == last_message:
+        if current_message == self.last_message_content.get(symbol, ""):
             return
-            
-        # Update last message
         self.last_message_content[symbol] = current_message
-        
+
         current_time = datetime.now()
-        date_str = current_time.strftime("%Y_%m_%d")
-        
-        # Ensure directory exists
-        directory = self.ensure_directory(symbol, date_str)
-        
-        # Create message data
         message_data = {
             'timestamp': current_time.isoformat(),
             'time': current_time.strftime("%H:%M:%S"),
@@ -54,30 +70,99 @@ class MessageLogger:
             'message': message,
             'color': color
         }
-        
-        # Get latest part file
-        latest_part = self.get_latest_part_number(directory)
-        latest_file = directory / f'{symbol}_part_{latest_part:03d}.json'
-        
-        # Load existing messages or create new list
-        messages = []
-        if latest_file.exists():
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                messages = json.load(f)
-                
-        # If current file is full, create new part
-        if len(messages) >= self.MESSAGES_PER_FILE:
-            latest_part += 1
-            latest_file = directory / f'{symbol}_part_{latest_part:03d}.json'
-            messages = []
-            
-        # Add new message and save
-        messages.append(message_data)
-        with open(latest_file, 'w', encoding='utf-8') as f:
-            json.dump(messages, f, indent=2, ensure_ascii=False)
+
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(message_data)
+        except queue.Full:
+            # คิวเต็มแปลว่า disk ช้ากว่า log ที่เข้ามา ทิ้ง log ดีกว่าให้การเทรดรอ
+            self.dropped_messages += 1
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._writer_loop, name='MessageLogWriter', daemon=True)
+                self._thread.start()
+
+    def _writer_loop(self):
+        """รวบรวม message ที่เข้าคิวแล้วเขียนเป็น batch"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5):
+        """รอให้ message ที่ค้างในคิวถูกเขียนลงไฟล์ (ใช้ตอนปิดโปรแกรม)"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def _write_batch(self, batch):
+        grouped = {}
+        for message_data in batch:
+            date_str = message_data['date'].replace('-', '_')
+            grouped.setdefault((message_data['symbol'], date_str), []).append(message_data)
+
+        for (symbol, date_str), messages in grouped.items():
+            try:
+                lines = [(json.dumps(m, ensure_ascii=False) + '\n').encode('utf-8') for m in messages]
+                while lines:
+                    # เขียนให้มากที่สุดที่ไฟล์ part ปัจจุบันรับได้ ที่เหลือไปไฟล์ถัดไป
+                    segment = self._get_segment(symbol, date_str, len(lines[0]))
+                    chunk_size = 0
+                    count = 0
+                    for line in lines:
+                        if count and segment.size + chunk_size + len(line) > self.max_segment_bytes:
+                            break
+                        chunk_size += len(line)
+                        count += 1
+                    with open(segment.path, 'ab') as f:
+                        f.write(b''.join(lines[:count]))
+                    segment.size += chunk_size
+                    lines = lines[count:]
+            except Exception as e:
+                print(f"[MessageLogger] เขียน log ของ {symbol} ไม่สำเร็จ: {str(e)}")
+
+    def _get_segment(self, symbol: str, date_str: str, incoming_bytes: int) -> _Segment:
+        """ดึงไฟล์ part ปัจจุบัน (cache ไว้ ไม่ต้อง glob ทุกครั้ง) และหมุนไฟล์ใหม่เมื่อใหญ่หรือเก่าเกิน"""
+        key = (symbol, date_str)
+        segment = self._segments.get(key)
+        if segment is None:
+            # วันใหม่ของ symbol เดิม ไม่ต้องเก็บ segment ของวันก่อนไว้
+            for old_key in [k for k in self._segments if k[0] == symbol]:
+                del self._segments[old_key]
+            directory = self.ensure_directory(symbol, date_str)
+            part = self.get_latest_part_number(directory)
+            segment = _Segment(part, directory / f'{symbol}_part_{part:03d}.jsonl')
+            if segment.path.exists():
+                segment.opened_at = segment.path.stat().st_mtime - time.time() + time.monotonic()
+            self._segments[key] = segment
+
+        is_full = segment.size > 0 and segment.size + incoming_bytes > self.max_segment_bytes
+        is_old = segment.size > 0 and time.monotonic() - segment.opened_at > self.max_segment_age
+        if is_full or is_old:
+            part = segment.part + 1
+            segment = _Segment(part, segment.path.with_name(f'{symbol}_part_{part:03d}.jsonl'))
+            self._segments[key] = segment
+        return segment
 
 # Global instance
 logger = MessageLogger()
+atexit.register(logger.flush)
 
 def message(symbol: str = '', message: str = '', color: str = 'white'):
     """Wrapper function for backwards compatibility"""
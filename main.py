@@ -4,7 +4,8 @@ import json
 import os
 import time
 import traceback
-from functools import wraps
+from collections import deque
+from functools import partial, wraps
 import pytz
 import pandas as pd
 import numpy as np
@@ -13,7 +14,7 @@ from function.binance.futures.check.check_position import check_position
 from function.binance.futures.check.check_server_status import check_server_status
 from function.binance.futures.check.check_user_api_status import check_user_api_status
 from function.binance.futures.order.change_stoploss_to_price import change_stoploss_to_price
-from function.binance.futures.order.create_order import create_order, get_adjusted_quantity
+from function.binance.futures.order.create_order import create_batch_orders, create_order, get_adjusted_quantity
 from function.binance.futures.order.get_all_order import clear_all_orders, clear_stoploss, clear_tp_orders
 from function.binance.futures.order.other.get_adjust_precision_quantity import get_adjust_precision_quantity
 from function.binance.futures.order.other.get_closed_position import get_amount_of_closed_position, get_closed_position_side
@@ -22,18 +23,46 @@ from function.binance.futures.order.other.get_future_available_balance import ge
 from function.binance.futures.order.other.get_future_market_price import get_future_market_price, get_price_tracker
 from function.binance.futures.order.other.get_kline_data import fetch_ohlcv, get_kline_tracker
 from function.binance.futures.order.other.get_position_side import get_position_side
+from function.binance.futures.order.other.get_user_data import get_user_data_tracker
 from function.binance.futures.order.swap_position_side import swap_position_side
-from function.binance.futures.system.create_future_exchange import create_future_exchange
+from function.binance.futures.system.dashboard import get_dashboard_feed
+from function.binance.futures.system.exchange_metrics import handle_metrics, register_metrics_source
+from function.binance.futures.system.callback_dispatcher import get_callback_dispatcher, render_dispatcher_metrics
+from function.binance.futures.system.exchange_pool import close_exchange_pool, get_exchange, get_exchange_pool
+from function.binance.futures.system.http_server import get_http_server
+from function.binance.futures.system.indicator_engine import (
+    RSI_WINDOW,
+    calculate_rsi,
+    get_atr_window,
+    get_dynamic_rsi_period,
+    get_indicator_engine,
+    get_max_atr_length,
+)
 from function.binance.futures.system.retry_utils import run_with_error_handling
+from function.binance.futures.system.state_store import get_state_store
+from function.binance.futures.system.stream_manager import get_stream_manager
+from function.binance.futures.system.symbol_scheduler import SymbolScheduler
+from function.binance.futures.system.trade_journal import get_trade_journal
 from function.message import message
-from function.binance.futures.system.update_symbol_data import update_symbol_data
+from function.binance.futures.system.update_symbol_data import refresh_symbol_data_periodically, update_symbol_data
 from config import DEFAULT_CONFIG, MIN_NOTIONAL, PRICE_CHANGE_MAXPERCENT, PRICE_CHANGE_THRESHOLD, api_key, api_secret
 from config import (
+    HTTP_SERVER_ENABLED,
+    STREAM_RECORD_FILE,
     TRADING_CONFIG,
     PRICE_INCREASE,
     PRICE_DECREASE,
 )
 
+# field ของ SymbolState ที่บันทึกลง state store (ไม่รวม cache ที่ดึงใหม่ทุกรอบ)
+PERSISTED_STATE_FIELDS = (
+    'current_stoploss', 'current_rsi_period', 'current_atr_length_1', 'current_atr_length_2',
+    'current_atr_tp', 'last_checked_candle', 'is_in_position', 'is_swapping', 'is_wait_candle',
+    'global_position_data', 'entry_orders', 'entry_side', 'entry_price', 'entry_stoploss_price',
+    'last_candle_time', 'last_candle_cross', 'entry_candle', 'last_focus_price', 'last_focus_stopprice',
+    'tp_levels_hit', 'martingale_multiplier', 'consecutive_losses', 'performance_data'
+)
+
 class SymbolState:
     """คลาสสำหรับจัดการสถานะของแต่ละเหรียญ แบบ optimized"""
     def __init__(self, symbol: str):
@@ -62,6 +91,10 @@ class SymbolState:
         self.current_atr_tp = None
         self.last_checked_candle = None
         
+        # แท่งเทียนที่ปิดแล้วจาก websocket ที่ยังไม่ได้ประมวลผล (ไม่บันทึกลงไฟล์)
+        self.pending_closed_candles = deque()
+        self.indicators_ready = False
+        
         # Position tracking
         self.is_in_position = False
         self.is_swapping = False
@@ -114,6 +147,11 @@ class SymbolState:
             'largest_loss': 0
         }
 
+    async def on_candle_closed(self, symbol: str, timeframe: str, kline):
+        """callback จาก kline tracker เมื่อแท่งเทียนปิด เก็บไว้ประมวลผลในรอบถัดไปของเหรียญ"""
+        if timeframe == self.config.timeframe:
+            self.pending_closed_candles.append(kline.to_ohlcv())
+
     def reset_order_state(self):
         """รีเซ็ตสถานะที่เกี่ยวข้องกับ orders"""
         self.entry_orders = None
@@ -125,6 +163,12 @@ class SymbolState:
     async def update_market_data(self, api_key: str, api_secret: str):
         """อัพเดทข้อมูลตลาดทั้งหมดในครั้งเดียว"""
         try:
+            # ข้อมูลบัญชีอ่านจาก user data stream ได้เลยถ้า sync แล้ว (ไม่มี network call)
+            user_data = get_user_data_tracker()
+            if user_data.is_ready_for(api_key):
+                await self._update_market_data_from_stream(api_key, api_secret, user_data)
+                return True
+
             # Fetch all market data concurrently
             tasks = [
                 get_future_market_price(api_key, api_secret, self.symbol),
@@ -157,13 +201,34 @@ class SymbolState:
             message(self.symbol, f"Error updating market data: {str(e)}", "red")
             return False
     
+    async def _update_market_data_from_stream(self, api_key: str, api_secret: str, user_data):
+        """อัพเดท cache จาก websocket ทั้งหมด: ราคา/แท่งเทียนจาก market stream และข้อมูลบัญชีจาก user data stream"""
+        price, candle = await asyncio.gather(
+            get_future_market_price(api_key, api_secret, self.symbol),
+            get_current_candle(api_key, api_secret, self.symbol, self.config.timeframe)
+        )
+        self.current_price = price if price is not None else self.current_price
+        self.current_candle = candle if candle is not None else self.current_candle
+
+        position_side = user_data.get_position_side(self.symbol)
+        if position_side is None:
+            self.current_stoploss = None
+        else:
+            self.current_stoploss = user_data.get_stoploss(self.symbol) or self.current_stoploss
+
+        self.current_market_data.update({
+            'position_side': position_side,
+            'available_balance': user_data.get_available_balance(),
+            'ohlcv': self.current_candle,
+            'last_update': datetime.now(pytz.UTC)
+        })
+        self.current_orders = user_data.get_open_orders(self.symbol)
+
     async def _fetch_current_orders(self, api_key: str, api_secret: str):
         """ดึงข้อมูล orders ปัจจุบัน"""
         try:
-            exchange = await create_future_exchange(api_key, api_secret)
-            orders = await exchange.fetch_open_orders(self.symbol)
-            await exchange.close()
-            return orders
+            async with get_exchange(api_key, api_secret) as exchange:
+                return await exchange.fetch_open_orders(self.symbol)
         except Exception as e:
             message(self.symbol, f"Error fetching orders: {str(e)}", "red")
             return []
@@ -201,7 +266,7 @@ class SymbolState:
         }
 
     def save_state(self):
-        """บันทึกสถานะทั้งหมดลงไฟล์"""
+        """บันทึกสถานะลง state store"""
         def datetime_to_iso(dt):
             """แปลง datetime เป็น ISO format string"""
             if isinstance(dt, datetime):
@@ -216,12 +281,9 @@ class SymbolState:
                 for k, v in d.items()}
 
         try:
+            # ไม่เก็บ cache ที่ดึงใหม่ทุกรอบ (orders, แท่งเทียน, ราคา, current_market_data)
             current_state = {
-                'current_orders': self.current_orders,
-                'current_candle': self.current_candle,
-                'current_price': self.current_price,
                 'current_stoploss': self.current_stoploss,
-                'current_market_data': process_dict(self.current_market_data),
                 'current_rsi_period': self.current_rsi_period,
                 'current_atr_length_1': self.current_atr_length_1,
                 'current_atr_length_2': self.current_atr_length_2,
@@ -246,9 +308,8 @@ class SymbolState:
                 'performance_data': process_dict(self.performance_data)
             }
             
-            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
-            with open(self.state_file, 'w') as f:
-                json.dump(current_state, f, indent=2)
+            # เขียนเฉพาะ field ที่เปลี่ยน ถ้าไม่มีอะไรเปลี่ยนจะไม่แตะ disk
+            get_state_store().save(self.symbol, current_state)
 
         except Exception as e:
             error_traceback = traceback.format_exc()
@@ -256,21 +317,15 @@ class SymbolState:
             message(self.symbol, f"Error: {error_traceback}", "red")
 
     def load_state(self):
-        """โหลดสถานะทั้งหมดจากไฟล์"""
+        """โหลดสถานะจาก state store"""
         try:
-            # ตรวจสอบไฟล์มีอยู่จริง
-            if not os.path.exists(self.state_file):
+            store = get_state_store()
+            saved_state = store.load(self.symbol)
+            if saved_state is None and store.import_legacy_file(self.symbol, self.state_file, PERSISTED_STATE_FIELDS):
+                saved_state = store.load(self.symbol)
+            if saved_state is None:
                 message(self.symbol, f"ไม่พบไฟล์สถานะ เริ่มต้นด้วยค่าเริ่มต้น", "yellow")
                 return False
-
-            # พยายามอ่านไฟล์
-            try:
-                with open(self.state_file, 'r') as f:
-                    saved_state = json.load(f)
-            except json.JSONDecodeError:
-                message(self.symbol, f"ไฟล์สถานะเสียหาย ลบไฟล์เดิมและเริ่มใหม่", "yellow")
-                os.remove(self.state_file)
-                return False
                     
             def parse_datetime(dt_str):
                 """แปลง ISO format string กลับเป็น datetime"""
@@ -288,17 +343,13 @@ class SymbolState:
                 return {k: parse_datetime(v) if k.endswith('_time') or k.endswith('_update') 
                     else process_dict(v) for k, v in d.items()}
             
-            # Reset state ก่อนโหลดค่าใหม่
+            # Reset state ก่อนโหลดค่าใหม่ (cache ที่ไม่ได้บันทึกให้คงค่าเดิมไว้)
+            cache = (self.current_orders, self.current_candle, self.current_price, self.current_market_data)
             self._initialize_state()
+            self.current_orders, self.current_candle, self.current_price, self.current_market_data = cache
             
             # Load state values with validation
             try:
-                # Load current market data
-                if 'current_market_data' in saved_state:
-                    self.current_market_data = process_dict(saved_state['current_market_data'])
-                self.current_orders = saved_state.get('current_orders', [])
-                self.current_candle = saved_state.get('current_candle')
-                self.current_price = saved_state.get('current_price')
                 self.current_stoploss = saved_state.get('current_stoploss')
                 self.current_rsi_period = saved_state.get('current_rsi_period')
                 self.current_atr_length_1 = saved_state.get('current_atr_length_1')
@@ -346,8 +397,7 @@ class SymbolState:
                 message(self.symbol, f"เกิดข้อผิดพลาดในการแปลงข้อมูล: {str(e)}", "red")
                 message(self.symbol, f"Error: {error_traceback}", "red")
                 
-                # ถ้าเกิดข้อผิดพลาดให้ลบไฟล์เดิมและเริ่มใหม่
-                os.remove(self.state_file)
+                # ข้อมูลใน store ยังอยู่ครบ ใช้ค่าเริ่มต้นเฉพาะรอบนี้
                 self._initialize_state()
                 return False
                 
@@ -513,14 +563,21 @@ class TradingConfig:
             
 async def run_sequential_bot(api_key: str, api_secret: str, symbol: str, state: SymbolState):
     """ฟังก์ชันหลักสำหรับการเทรดของแต่ละเหรียญแบบทำงานตามลำดับ"""
-    exchange = None
     try:
         state.load_state()
-        exchange = await create_future_exchange(api_key, api_secret)
+        exchange = await get_exchange_pool().acquire(api_key, api_secret)
 
-        if not await update_market_indicators(api_key, api_secret, symbol, state):
-            message(symbol, "ไม่สามารถอัพเดทค่าตลาดได้ ข้ามรอบนี้", "yellow")
-            return
+        # คำนวณค่าตลาดครั้งแรกตอนเริ่มโปรแกรม หลังจากนี้จะคำนวณเมื่อแท่งเทียนปิดเท่านั้น
+        if not state.indicators_ready:
+            if not await update_market_indicators(api_key, api_secret, symbol, state):
+                message(symbol, "ไม่สามารถอัพเดทค่าตลาดได้ ข้ามรอบนี้", "yellow")
+                return
+            state.indicators_ready = True
+
+            # ตรวจแท่งที่ปิดไปแล้วระหว่างที่โปรแกรมไม่ได้ทำงาน
+            ohlcv = await fetch_ohlcv(symbol, state.config.timeframe, limit=2)
+            if ohlcv and len(ohlcv) >= 2:
+                state.pending_closed_candles.appendleft(ohlcv[-2])
         
         # อัพเดทข้อมูลตลาดทั้งหมดในครั้งเดียว
         await state.update_market_data(api_key, api_secret)
@@ -560,26 +617,13 @@ async def run_sequential_bot(api_key: str, api_secret: str, symbol: str, state:
         # Candle check and signals
         current_candle = state.current_candle
         if current_candle:
-            ohlcv = await exchange.fetch_ohlcv(symbol, state.config.timeframe, limit=3)
-            rsi_cross = await get_rsi_cross_last_candle(
-                api_key, api_secret, symbol,
-                state.config.timeframe,
-                state
-            )
-
-            if ohlcv and len(ohlcv) >= 3:
-                last_closed_candle = ohlcv[-2]
-                bangkok_tz = pytz.timezone('Asia/Bangkok')
-                last_closed_time = datetime.fromtimestamp(last_closed_candle[0] / 1000, tz=pytz.UTC).astimezone(bangkok_tz)
-
-                if (state.last_candle_time is None or 
-                    last_closed_time > state.last_candle_time.astimezone(bangkok_tz)):
-                    
-                    await _handle_new_candle(
-                        api_key, api_secret, symbol, state, last_closed_time,
-                        state.current_market_data['position_side'],
-                        [last_closed_candle], rsi_cross
-                    )
+            # ประมวลผลแท่งเทียนที่ปิดแล้วจาก websocket แท่งละครั้ง
+            while state.pending_closed_candles:
+                # แท่งเทียนขาดหายระหว่างหลุดการเชื่อมต่อ รอ backfill ก่อน แท่งที่ค้างจะประมวลผลรอบถัดไป
+                if get_kline_tracker().has_gap(symbol, state.config.timeframe):
+                    break
+                closed_candle = state.pending_closed_candles.popleft()
+                await _handle_closed_candle(api_key, api_secret, symbol, state, closed_candle)
                     
             # เพิ่มการตรวจสอบและสร้าง stoploss หลังจากการตรวจสอบแท่งเทียน
             if state.is_in_position:
@@ -592,9 +636,31 @@ async def run_sequential_bot(api_key: str, api_secret: str, symbol: str, state:
         error_traceback = traceback.format_exc()
         message(symbol, f"เกิดข้อผิดพลาดในการประมวลผล {symbol}: {str(e)}", "red")
         message(symbol, f"Error: {error_traceback}", "red")
-    finally:
-        if exchange:
-            await exchange.close()
+
+async def _handle_closed_candle(api_key, api_secret, symbol, state, closed_candle):
+    """คำนวณค่าตลาดและสัญญาณ RSI ของแท่งที่ปิดแล้ว แล้วส่งต่อให้ _handle_new_candle"""
+    bangkok_tz = pytz.timezone('Asia/Bangkok')
+    closed_time = datetime.fromtimestamp(closed_candle[0] / 1000, tz=pytz.UTC).astimezone(bangkok_tz)
+
+    if state.last_candle_time is not None and closed_time <= state.last_candle_time.astimezone(bangkok_tz):
+        return
+
+    if not await update_market_indicators(api_key, api_secret, symbol, state, until_time=closed_candle[0]):
+        message(symbol, "ไม่สามารถอัพเดทค่าตลาดของแท่งที่ปิดได้", "yellow")
+        return
+
+    rsi_cross = await get_rsi_cross_last_candle(
+        api_key, api_secret, symbol,
+        state.config.timeframe,
+        state,
+        until_time=closed_candle[0]
+    )
+
+    await _handle_new_candle(
+        api_key, api_secret, symbol, state, closed_time,
+        state.current_market_data['position_side'],
+        [closed_candle], rsi_cross
+    )
 
 async def _handle_position_close(api_key, api_secret, symbol, state, price):
     """จัดการการปิด position และจัดการการเข้า position ใหม่ถ้าอยู่ในเงื่อนไข"""
@@ -602,7 +668,7 @@ async def _handle_position_close(api_key, api_secret, symbol, state, price):
         message(symbol, f"Position ถูกปิด!", "red")
         
         # ล้าง orders ทั้งหมดก่อน
-        await clear_all_orders(api_key, api_secret, symbol)
+        await clear_all_orders(api_key, api_secret, symbol, orders=state.current_orders)
 
         # บันทึกการเทรด
         await record_trade(api_key, api_secret, symbol,
@@ -752,7 +818,7 @@ async def _handle_position_close(api_key, api_secret, symbol, state, price):
                             state.save_state()
                         else:
                             message(symbol, "ไม่สามารถสร้าง Stoploss Order ได้ ยกเลิก Entry Order", "red")
-                            await clear_all_orders(api_key, api_secret, symbol)
+                            await clear_all_orders(api_key, api_secret, symbol, orders=state.current_orders)
                     else:
                         message(symbol, "ไม่สามารถสร้าง Entry Order ได้", "red")
 
@@ -838,7 +904,7 @@ async def _handle_stoploss_adjustment(api_key, api_secret, symbol, state, positi
                     new_stoploss = current_low * PRICE_DECREASE
                     message(symbol, f"ใช้ low ของแท่งปัจจุบันเป็น stoploss", "cyan")
                     
-                await change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss)
+                await change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss, orders=state.current_orders)
                 message(symbol, f"ปรับ Stop Loss เป็น {new_stoploss:.8f}", "cyan")
                 state.is_wait_candle = False
                 state.current_stoploss = new_stoploss
@@ -861,7 +927,7 @@ async def _handle_stoploss_adjustment(api_key, api_secret, symbol, state, positi
                     new_stoploss = current_high * PRICE_INCREASE
                     message(symbol, f"ใช้ high ของแท่งปัจจุบันเป็น stoploss", "cyan")
                     
-                await change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss)
+                await change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss, orders=state.current_orders)
                 message(symbol, f"ปรับ Stop Loss เป็น {new_stoploss:.8f}", "cyan")
                 state.is_wait_candle = False
                 state.current_stoploss = new_stoploss
@@ -891,87 +957,6 @@ async def _adjust_stoploss_for_new_candle(api_key, api_secret, symbol, state, po
     except Exception as e:
         message(symbol, f"Error in stoploss adjustment for new candle: {str(e)}", "red")
 
-async def setup_take_profit_orders(api_key, api_secret, symbol, entry_price, position_side, timeframe, state):
-    """สร้าง take profit orders โดยใช้การตั้งค่าจาก config"""
-    try:
-        if entry_price is None:
-            message(symbol, "ไม่มีข้อมูล entry price สำหรับคำนวณ Take Profit", "red")
-            return []
-
-        # ดึง ATR - แก้ไขลำดับการส่งพารามิเตอร์
-        atr = state.current_atr_length_2
-        if atr is None:
-            message(symbol, "ไม่สามารถคำนวณค่า ATR ได้", "red")
-            return []
-            
-        atr_percent = (atr / entry_price) * 100
-        message(symbol, f"คำนวณ TP จาก: Entry: {entry_price}, ATR: {atr:.8f} ({atr_percent:.2f}%)", "blue")
-
-        # ดึงการตั้งค่า TP จาก config
-        tp_config = state.config.take_profits
-        if not tp_config or not tp_config.get('levels'):
-            message(symbol, "ไม่พบการตั้งค่า Take Profit ใน config", "yellow")
-            return []
-
-        # เตรียมคำสั่ง TP
-        orders = []
-        
-        for level in tp_config['levels']:
-            level_id = level['id']
-            target_atr = level['target_atr']
-            size = level['size']
-
-            # คำนวณราคา TP
-            if position_side == 'buy':
-                tp_base = entry_price + (atr * target_atr)
-                tp_price = tp_base * (PRICE_INCREASE + (PRICE_CHANGE_THRESHOLD * (target_atr * 2)))
-            else:
-                tp_base = entry_price - (atr * target_atr)
-                tp_price = tp_base * (PRICE_DECREASE - (PRICE_CHANGE_THRESHOLD * (target_atr * 2)))
-
-            # ปรับราคาตามข้อจำกัดของ exchange
-            adjusted_price = await get_adjusted_price(
-                api_key, api_secret, str(tp_price), entry_price, position_side, symbol
-            )
-
-            if adjusted_price is None:
-                message(symbol, f"ไม่สามารถปรับราคา {level_id} ได้", "red")
-                continue
-
-            # คำนวณกำไรเป็นเปอร์เซ็นต์
-            profit_percent = abs((adjusted_price - entry_price) / entry_price * 100)
-            distance_in_atr = abs(adjusted_price - entry_price) / atr
-            message(symbol, 
-                f"{level_id}: {adjusted_price:.8f} ({profit_percent:.2f}%, " +
-                f"{distance_in_atr:.1f} ATR, Size: {size})", "blue"
-            )
-
-            # สร้างคำสั่ง TP
-            side = 'sell' if position_side == 'buy' else 'buy'
-            tp_order = await create_order(
-                api_key, api_secret,
-                symbol=symbol,
-                side=side,
-                price=str(adjusted_price),
-                quantity=size,
-                order_type='TAKE_PROFIT_MARKET',
-                martingale_multiplier=state.martingale_multiplier
-            )
-
-            if tp_order:
-                orders.append(tp_order)
-                message(symbol, f"ตั้ง {level_id} ({size}) ที่ราคา {adjusted_price:.8f}", "cyan")
-            else:
-                message(symbol, f"ไม่สามารถสร้างคำสั่ง {level_id} ได้", "red")
-
-        return orders
-
-    except Exception as e:
-        error_traceback = traceback.format_exc()
-        message(symbol, f"เกิดข้อผิดพลาดในการสร้าง Take Profit Orders: {str(e)}", "red")
-        message(symbol, f"Error: {error_traceback}", "red")
-        return []
-
 async def _handle_entry_orders(api_key, api_secret, symbol, state, price, exchange):
     """จัดการ entry orders"""
     try:
@@ -1016,7 +1001,7 @@ async def _handle_entry_orders(api_key, api_secret, symbol, state, price, exchan
         
         if should_cancel:
             message(symbol, f"ยกเลิก Orders เนื่องจาก: {reason}", "yellow")
-            await clear_all_orders(api_key, api_secret, symbol)
+            await clear_all_orders(api_key, api_secret, symbol, orders=state.current_orders)
             state.reset_order_state()
             state.save_state()
 
@@ -1070,13 +1055,10 @@ async def _handle_position_entered(api_key, api_secret, symbol, state, exchange)
 
 async def manage_position_profit(api_key: str, api_secret: str, symbol: str, state: SymbolState):
     """จัดการ position profit รวมถึงการย้าย stoploss ตามระดับ TP ต่างๆ"""
-    exchange = None
     try:
         if not state.is_in_position:
             return
 
-        exchange = await create_future_exchange(api_key, api_secret)
-
         current_stoploss = state.current_stoploss
         atr = state.current_atr_tp
         current_candle = state.current_candle
@@ -1149,7 +1131,7 @@ async def manage_position_profit(api_key: str, api_secret: str, symbol: str, sta
                         if new_stoploss is not None:
                             if ((position_side == 'buy' and current_stoploss < new_stoploss) or
                                 (position_side == 'sell' and current_stoploss > new_stoploss)):
-                                await change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss)
+                                await change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss, orders=state.current_orders)
                                 state.current_stoploss = new_stoploss
                                 message(symbol, "ปรับ stoploss เรียบร้อย", "cyan")
 
@@ -1163,12 +1145,6 @@ async def manage_position_profit(api_key: str, api_secret: str, symbol: str, sta
         error_traceback = traceback.format_exc()
         message(symbol, f"เกิดข้อผิดพลาดในการจัดการกำไร: {str(e)}", "red")
         message(symbol, f"Error: {error_traceback}", "red")
-    finally:
-        if exchange:
-            try:
-                await exchange.close()
-            except:
-                pass
 
 async def should_adjust_tp(state: SymbolState) -> bool:
     """ตรวจสอบว่าควรปรับ TP หรือไม่"""
@@ -1277,7 +1253,7 @@ async def adjust_take_profit_orders(api_key: str, api_secret: str, symbol: str,
         message(symbol, f"ปรับ TP ใหม่ จากราคา {reference_price:.8f} (ATR7: {atr:.8f})", "cyan")
         
         # ลบ TP orders เก่า
-        await clear_tp_orders(api_key, api_secret, symbol)
+        await clear_tp_orders(api_key, api_secret, symbol, orders=state.current_orders)
         
         # สร้าง TP ใหม่โดยใช้ ATR 7
         tp_orders = await create_dynamic_tp_orders(
@@ -1315,7 +1291,8 @@ async def create_dynamic_tp_orders(api_key, api_secret, symbol, reference_price,
             return []
 
         # สร้างคำสั่ง TP
-        orders = []
+        tp_levels = []
+        tp_requests = []
         previous_tp_price = reference_price  # เริ่มต้นที่ราคา reference
 
         for level in tp_config['levels']:
@@ -1367,24 +1344,16 @@ async def create_dynamic_tp_orders(api_key, api_secret, symbol, reference_price,
                 "blue"
             )
 
-            # สร้างคำสั่ง TP
-            side = 'sell' if position_side == 'buy' else 'buy'
-            tp_order = await create_order(
-                api_key, api_secret,
-                symbol=symbol,
-                side=side,
-                price=str(adjusted_price),
-                quantity=size,
-                order_type='TAKE_PROFIT_MARKET'
-            )
-
-            if tp_order:
-                orders.append(tp_order)
-                message(symbol, f"ตั้ง {level_id} ({size}) ที่ราคา {adjusted_price:.8f}", "cyan")
-            else:
-                message(symbol, f"ไม่สามารถสร้างคำสั่ง {level_id} ได้", "red")
+            # เก็บคำสั่ง TP ไว้ส่งพร้อมกันแบบ batch
+            tp_levels.append((level_id, size, adjusted_price))
+            tp_requests.append({
+                'side': 'sell' if position_side == 'buy' else 'buy',
+                'price': str(adjusted_price),
+                'quantity': size,
+                'order_type': 'TAKE_PROFIT_MARKET'
+            })
 
-        return orders
+        return await _place_tp_orders(api_key, api_secret, symbol, state, tp_levels, tp_requests)
 
     except Exception as e:
         error_traceback = traceback.format_exc()
@@ -1396,131 +1365,118 @@ async def create_dynamic_tp_orders(api_key, api_secret, symbol, reference_price,
 async def record_trade(api_key, api_secret, symbol, action, entry_price, exit_price, amount, reason, state):
     """บันทึกข้อมูลการเทรด"""
     try:
-        exchange = await create_future_exchange(api_key, api_secret)
+        journal = get_trade_journal()
+
+        # ดึงข้อมูล position จาก state
+        position_info = state.global_position_data
+        actual_entry_price = float(entry_price)
+        actual_exit_price = float(exit_price)
         
-        try:
-            # โหลดประวัติการเทรดที่มีอยู่
-            trades = []
-            try:
-                with open(state.trade_record_file, 'r') as f:
-                    trades = json.load(f)
-            except FileNotFoundError:
-                pass
-
-            # ดึงข้อมูล position จาก state
-            position_info = state.global_position_data
-            actual_entry_price = float(entry_price)
-            actual_exit_price = float(exit_price)
-            
-            # คำนวณ quantity ที่แท้จริง
-            if position_info['position_size']:
-                actual_amount = abs(float(position_info['position_size']))
-            else:
-                adjusted_amount = await get_adjusted_quantity(api_key, api_secret, amount, actual_entry_price, symbol)
-                actual_amount = adjusted_amount if adjusted_amount is not None else 0
-
-            # Calculate actual profit/loss
-            if action in ['BUY', 'SELL']:
-                profit_loss = ((actual_exit_price - actual_entry_price) if action == 'BUY' else 
-                            (actual_entry_price - actual_exit_price)) * actual_amount
-            else:  # action == 'SWAP'
-                profit_loss = (actual_exit_price - actual_entry_price) * actual_amount
-
-            # Martingale Logic
-            if state.config.martingale_enabled:
-                if profit_loss < -1:  # Loss greater than $1
+        # คำนวณ quantity ที่แท้จริง
+        if position_info['position_size']:
+            actual_amount = abs(float(position_info['position_size']))
+        else:
+            adjusted_amount = await get_adjusted_quantity(api_key, api_secret, amount, actual_entry_price, symbol)
+            actual_amount = adjusted_amount if adjusted_amount is not None else 0
+
+        # Calculate actual profit/loss
+        if action in ['BUY', 'SELL']:
+            profit_loss = ((actual_exit_price - actual_entry_price) if action == 'BUY' else 
+                        (actual_entry_price - actual_exit_price)) * actual_amount
+        else:  # action == 'SWAP'
+            profit_loss = (actual_exit_price - actual_entry_price) * actual_amount
+
+        # คำนวณเปอร์เซ็นต์กำไร/ขาดทุน
+        profit_loss_percentage = (profit_loss / (actual_entry_price * actual_amount)) * 100
+
+        # สร้างบันทึกการเทรด
+        trade = {
+            'timestamp': datetime.now().isoformat(),
+            'symbol': symbol,
+            'action': action,
+            'entry_price': actual_entry_price,
+            'exit_price': actual_exit_price,
+            'amount': actual_amount,
+            'profit_loss': float(profit_loss),
+            'profit_loss_percentage': float(profit_loss_percentage),
+            'reason': reason,
+            'leverage': position_info.get('leverage', 20),
+            'margin_type': position_info.get('margin_type', 'cross'),
+            'position_size_usd': float(actual_amount * actual_entry_price)
+        }
+
+        # Martingale Logic
+        if state.config.martingale_enabled:
+            if profit_loss < -1:  # Loss greater than $1
+                if state.config.martingale_reset_on_win:
+                    # นับจาก journal ที่บันทึกไว้ถาวร (รวมเทรดนี้) ไม่ขึ้นกับ state file
+                    state.consecutive_losses = journal.get_consecutive_losses(symbol, loss_threshold=-1) + 1
+                else:
                     state.consecutive_losses += 1
-                    
-                    # Calculate multiplier with configurable max and step
-                    state.martingale_multiplier = min(
-                        1.0 + (state.config.martingale_step * min(state.consecutive_losses, 4)), 
-                        state.config.martingale_max_multiplier
-                    )
+                
+                # Calculate multiplier with configurable max and step
+                state.martingale_multiplier = min(
+                    1.0 + (state.config.martingale_step * min(state.consecutive_losses, 4)), 
+                    state.config.martingale_max_multiplier
+                )
+                
+                message(symbol, 
+                    f"Martingale: Consecutive Loss {state.consecutive_losses}, " +
+                    f"Multiplier increased to {state.martingale_multiplier}", "red"
+                )
+            else:  # Profitable trade
+                # Reset Martingale state based on config
+                if state.config.martingale_reset_on_win:
+                    state.martingale_multiplier = 1.0
+                    state.consecutive_losses = 0
                     
                     message(symbol, 
-                        f"Martingale: Consecutive Loss {state.consecutive_losses}, " +
-                        f"Multiplier increased to {state.martingale_multiplier}", "red"
+                        f"Martingale: Trade profitable, resetting multiplier", "green"
                     )
-                else:  # Profitable trade
-                    # Reset Martingale state based on config
-                    if state.config.martingale_reset_on_win:
-                        state.martingale_multiplier = 1.0
-                        state.consecutive_losses = 0
-                        
-                        message(symbol, 
-                            f"Martingale: Trade profitable, resetting multiplier", "green"
-                        )
 
-            # Adjust entry amount based on multiplier
-            adjusted_entry_amount = state.config.entry_amount.replace('$', '')
-            adjusted_entry_amount = f"${float(adjusted_entry_amount) * state.martingale_multiplier}"
-
-            # Update trade record with Martingale details
-            trade['martingale_details'] = {
-                'enabled': state.config.martingale_enabled,
-                'multiplier': state.martingale_multiplier,
-                'consecutive_losses': state.consecutive_losses,
-                'original_entry_amount': state.config.entry_amount,
-                'adjusted_entry_amount': adjusted_entry_amount
-            }
+        # Adjust entry amount based on multiplier
+        adjusted_entry_amount = state.config.entry_amount.replace('$', '')
+        adjusted_entry_amount = f"${float(adjusted_entry_amount) * state.martingale_multiplier}"
+
+        # Update trade record with Martingale details
+        trade['martingale_details'] = {
+            'enabled': state.config.martingale_enabled,
+            'multiplier': state.martingale_multiplier,
+            'consecutive_losses': state.consecutive_losses,
+            'original_entry_amount': state.config.entry_amount,
+            'adjusted_entry_amount': adjusted_entry_amount
+        }
 
-            # คำนวณเปอร์เซ็นต์กำไร/ขาดทุน
-            profit_loss_percentage = (profit_loss / (actual_entry_price * actual_amount)) * 100
-
-            # สร้างบันทึกการเทรด
-            trade = {
-                'timestamp': datetime.now().isoformat(),
-                'symbol': symbol,
-                'action': action,
-                'entry_price': actual_entry_price,
-                'exit_price': actual_exit_price,
-                'amount': actual_amount,
-                'profit_loss': float(profit_loss),
-                'profit_loss_percentage': float(profit_loss_percentage),
-                'reason': reason,
-                'leverage': position_info.get('leverage', 20),
-                'margin_type': position_info.get('margin_type', 'cross'),
-                'position_size_usd': float(actual_amount * actual_entry_price)
-            }
+        # บันทึกข้อมูล (append อย่างเดียว ไม่ต้องโหลดประวัติทั้งหมด)
+        journal.append(trade)
 
-            # บันทึกข้อมูล
-            trades.append(trade)
-            os.makedirs(os.path.dirname(state.trade_record_file), exist_ok=True)
-            with open(state.trade_record_file, 'w') as f:
-                json.dump(trades, f, indent=2)
+        # อัพเดท performance metrics
+        state.performance_data['trades_count'] += 1
+        if profit_loss > 0:
+            state.performance_data['winning_trades'] += 1
+        else:
+            state.performance_data['losing_trades'] += 1
+        
+        state.performance_data['total_profit'] += profit_loss
+        state.performance_data['largest_profit'] = max(state.performance_data['largest_profit'], profit_loss)
+        state.performance_data['largest_loss'] = min(state.performance_data['largest_loss'], profit_loss)
 
-            # อัพเดท performance metrics
-            state.performance_data['trades_count'] += 1
-            if profit_loss > 0:
-                state.performance_data['winning_trades'] += 1
-            else:
-                state.performance_data['losing_trades'] += 1
-            
-            state.performance_data['total_profit'] += profit_loss
-            state.performance_data['largest_profit'] = max(state.performance_data['largest_profit'], profit_loss)
-            state.performance_data['largest_loss'] = min(state.performance_data['largest_loss'], profit_loss)
-
-            # แสดงผลลัพธ์
-            message(symbol, f"บันทึกการเทรด: {action} {symbol}", "cyan")
-            message(symbol, f"Entry: {actual_entry_price:.2f} | Exit: {actual_exit_price:.2f}", "cyan")
-            message(symbol, f"จำนวน: {actual_amount:.8f} ({actual_amount * actual_entry_price:.2f} USD)", "cyan")
-            message(symbol, f"Leverage: {position_info.get('leverage', 20)}x | Margin Type: {position_info.get('margin_type', 'cross')}", "cyan")
-            message(symbol, f"กำไร/ขาดทุน: {profit_loss:.2f} USDT ({profit_loss_percentage:.2f}%)", "cyan")
-            
-        except Exception as e:
-            error_traceback = traceback.format_exc()
-            message(symbol, f"เกิดข้อผิดพลาดในการบันทึกการเทรด: {str(e)}", "red")
-            message(symbol, f"Error: {error_traceback}", "red")
-            
-    finally:
-        if exchange:
-            await exchange.close()
+        # แสดงผลลัพธ์
+        message(symbol, f"บันทึกการเทรด: {action} {symbol}", "cyan")
+        message(symbol, f"Entry: {actual_entry_price:.2f} | Exit: {actual_exit_price:.2f}", "cyan")
+        message(symbol, f"จำนวน: {actual_amount:.8f} ({actual_amount * actual_entry_price:.2f} USD)", "cyan")
+        message(symbol, f"Leverage: {position_info.get('leverage', 20)}x | Margin Type: {position_info.get('margin_type', 'cross')}", "cyan")
+        message(symbol, f"กำไร/ขาดทุน: {profit_loss:.2f} USDT ({profit_loss_percentage:.2f}%)", "cyan")
+        
+    except Exception as e:
+        error_traceback = traceback.format_exc()
+        message(symbol, f"เกิดข้อผิดพลาดในการบันทึกการเทรด: {str(e)}", "red")
+        message(symbol, f"Error: {error_traceback}", "red")
 
 async def get_current_stoploss(api_key, api_secret, symbol, state):
     """ดึงค่า stoploss ปัจจุบัน"""
-    exchange = None
     try:
-        exchange = await create_future_exchange(api_key, api_secret)
+        exchange = await get_exchange_pool().acquire(api_key, api_secret)
         exchange_symbol = symbol.replace("USDT", "/USDT:USDT") if 'USDT' in symbol and '/USDT:USDT' not in symbol else symbol
         
         # ดึงรายการ orders และ position
@@ -1558,20 +1514,14 @@ async def get_current_stoploss(api_key, api_secret, symbol, state):
 
     except Exception as e:
         return state.current_stoploss
-    finally:
-        if exchange:
-            await exchange.close()
 
 async def adjust_stoploss(api_key, api_secret, symbol, state, position_side, cross_timestamp, current_stoploss=None):
     """ปรับ stoploss โดยใช้ค่า PRICE_DECREASE และ PRICE_INCREASE"""
-    exchange = None
     try:
         if not state.entry_candle:
             message(symbol, "ไม่พบข้อมูล entry candle ข้ามการปรับ stoploss", "yellow")
             return None
             
-        exchange = await create_future_exchange(api_key, api_secret)
-        
         # ใช้ข้อมูลจาก state ถ้ามี
         ohlcv = await fetch_ohlcv(symbol, state.config.timeframe, limit=6)
 
@@ -1622,7 +1572,7 @@ async def adjust_stoploss(api_key, api_secret, symbol, state, position_side, cro
                 return None
 
         # ปรับหรือสร้าง stoploss
-        await change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss)
+        await change_stoploss_to_price(api_key, api_secret, symbol, new_stoploss, orders=state.current_orders)
         sequence_prices = [prices[i] for i in best_sequence]
         sequence_str = ', '.join([f"{price:.2f}" for price in sequence_prices])
 
@@ -1639,9 +1589,6 @@ async def adjust_stoploss(api_key, api_secret, symbol, state, position_side, cro
         message(symbol, f"เกิดข้อผิดพลาดขณะปรับ stoploss: {str(e)}", "yellow")
         message(symbol, f"Error: {error_traceback}", "red")
         return None
-    finally:
-        if exchange:
-            await exchange.close()
 
 async def check_and_recreate_stoploss(api_key: str, api_secret: str, symbol: str, state: SymbolState):
     """ตรวจสอบและสร้าง stoploss ใหม่ถ้าไม่พบ"""
@@ -1716,7 +1663,8 @@ async def setup_take_profit_orders(api_key, api_secret, symbol, entry_price, pos
             return []
 
         # เตรียมคำสั่ง TP
-        orders = []
+        tp_levels = []
+        tp_requests = []
         
         for level in tp_config['levels']:
             level_id = level['id']
@@ -1748,75 +1696,68 @@ async def setup_take_profit_orders(api_key, api_secret, symbol, entry_price, pos
                 f"{distance_in_atr:.1f} ATR, Size: {size})", "blue"
             )
 
-            # สร้างคำสั่ง TP
-            side = 'sell' if position_side == 'buy' else 'buy'
-            tp_order = await create_order(
-                api_key, api_secret,
-                symbol=symbol,
-                side=side,
-                price=str(adjusted_price),
-                quantity=size,
-                order_type='TAKE_PROFIT_MARKET',
-                martingale_multiplier=state.martingale_multiplier
-            )
-
-            if tp_order:
-                orders.append(tp_order)
-                message(symbol, f"ตั้ง {level_id} ({size}) ที่ราคา {adjusted_price:.8f}", "cyan")
-            else:
-                message(symbol, f"ไม่สามารถสร้างคำสั่ง {level_id} ได้", "red")
+            # เก็บคำสั่ง TP ไว้ส่งพร้อมกันแบบ batch
+            tp_levels.append((level_id, size, adjusted_price))
+            tp_requests.append({
+                'side': 'sell' if position_side == 'buy' else 'buy',
+                'price': str(adjusted_price),
+                'quantity': size,
+                'order_type': 'TAKE_PROFIT_MARKET',
+                'martingale_multiplier': state.martingale_multiplier
+            })
 
-        return orders
+        return await _place_tp_orders(api_key, api_secret, symbol, state, tp_levels, tp_requests)
 
     except Exception as e:
         error_traceback = traceback.format_exc()
         message(symbol, f"เกิดข้อผิดพลาดในการสร้าง Take Profit Orders: {str(e)}", "red")
         message(symbol, f"Error: {error_traceback}", "red")
         return []
+
+async def _place_tp_orders(api_key, api_secret, symbol, state, tp_levels, tp_requests):
+    """ส่งคำสั่ง TP ทุกระดับในครั้งเดียวด้วย batch order และอัพเดท orders ที่ cache ไว้"""
+    if not tp_requests:
+        return []
+
+    orders = []
+    results = await create_batch_orders(api_key, api_secret, symbol, tp_requests)
+    for (level_id, size, adjusted_price), tp_order in zip(tp_levels, results):
+        if tp_order:
+            orders.append(tp_order)
+            message(symbol, f"ตั้ง {level_id} ({size}) ที่ราคา {adjusted_price:.8f}", "cyan")
+        else:
+            message(symbol, f"ไม่สามารถสร้างคำสั่ง {level_id} ได้", "red")
+
+    state.current_orders.extend(orders)
+    return orders
     
-async def update_market_indicators(api_key: str, api_secret: str, symbol: str, state: SymbolState):
-    """อัพเดทค่า ATR และ RSI Period เมื่อมีแท่งเทียนใหม่"""
+async def update_market_indicators(api_key: str, api_secret: str, symbol: str, state: SymbolState, until_time=None):
+    """อัพเดทค่า ATR และ RSI Period เมื่อมีแท่งเทียนใหม่ (until_time = open time ของแท่งสุดท้ายที่ใช้คำนวณ)"""
     try:
         # ดึงข้อมูลแท่งเทียน
         rsi_config = state.config.rsi_period
         
         # เพิ่ม ATR period 7 สำหรับ TP
-        max_length = max(rsi_config['atr']['length2'], rsi_config['atr']['length1'], 7)
-        required_candles = int(max_length * 1.2)
-        
-        ohlcv = await fetch_ohlcv(symbol, state.config.timeframe, limit=required_candles)
+        max_length = get_max_atr_length(rsi_config)
+        required_candles = get_atr_window(rsi_config)
         
-        if not ohlcv or len(ohlcv) < max_length + 1:
-            message(symbol, f"ข้อมูลไม่พอสำหรับคำนวณ ATR (มี {len(ohlcv)} แท่ง)", "yellow")
+        # ใช้ indicator engine ที่อัพเดทแบบ incremental จากแท่งที่ปิดแล้ว
+        engine = get_indicator_engine()
+        if not await engine.sync(symbol, state.config.timeframe, until_time):
+            message(symbol, "ไม่มีข้อมูลแท่งเทียนที่ปิดแล้วสำหรับคำนวณ ATR", "yellow")
             return False
 
-        # คำนวณ ATR สำหรับทุกช่วง
-        def calculate_atr_value(length):
-            tr_values = []
-            for i in range(1, len(ohlcv)):
-                high = ohlcv[i][2]
-                low = ohlcv[i][3]
-                prev_close = ohlcv[i-1][4]
-                
-                tr = max(
-                    high - low,
-                    abs(high - prev_close),
-                    abs(low - prev_close)
-                )
-                tr_values.append(tr)
-
-            alpha = 1.0 / length
-            rma = tr_values[0]
-            for tr in tr_values[1:]:
-                rma = (alpha * tr) + ((1 - alpha) * rma)
-            return rma
+        closed_count = len(engine.get_closed_candles(symbol, state.config.timeframe, limit=required_candles))
+        if closed_count < max_length + 1:
+            message(symbol, f"ข้อมูลไม่พอสำหรับคำนวณ ATR (มี {closed_count} แท่ง)", "yellow")
+            return False
 
-                # คำนวณ ATR ทั้งสามค่า
-        atr_short = calculate_atr_value(rsi_config['atr']['length1'])
-        atr_long = calculate_atr_value(rsi_config['atr']['length2'])
+        # คำนวณ ATR ทั้งสามค่า
+        atr_short = engine.get_atr(symbol, state.config.timeframe, rsi_config['atr']['length1'], required_candles)
+        atr_long = engine.get_atr(symbol, state.config.timeframe, rsi_config['atr']['length2'], required_candles)
         
         # คำนวณ ATR สำหรับ TP แบบ dynamic
-        atr_tp_period = calculate_atr_value(rsi_config['atr']['length_tp'])
+        atr_tp_period = engine.get_atr(symbol, state.config.timeframe, rsi_config['atr']['length_tp'], required_candles)
         
         # คำนวณ weight จาก percent (0-100)
         weight = rsi_config['atr']['weight_percent'] / 100.0
@@ -1829,21 +1770,8 @@ async def update_market_indicators(api_key: str, api_secret: str, symbol: str, s
         state.current_atr_length_2 = atr_long
         state.current_atr_tp = atr_tp  # เก็บค่า ATR 7
 
-        # คำนวณ RSI Period
-        if rsi_config.get('use_dynamic_period', True):
-            atr_diff_percent = ((atr_short - atr_long) / atr_long) * 100
-            
-            if atr_diff_percent >= rsi_config['atr']['max_percent']:
-                current_rsi_period = rsi_config['rsi_period_max']
-            elif atr_diff_percent <= rsi_config['atr']['min_percent']:
-                current_rsi_period = rsi_config['rsi_period_min']
-            else:
-                period_range = rsi_config['rsi_period_max'] - rsi_config['rsi_period_min']
-                volatility_range = rsi_config['atr']['max_percent'] - rsi_config['atr']['min_percent']
-                period_step = (atr_diff_percent - rsi_config['atr']['min_percent']) / volatility_range
-                current_rsi_period = int(round(rsi_config['rsi_period_min'] + (period_range * period_step)))
-        else:
-            current_rsi_period = rsi_config['rsi_period_min']
+        # คำนวณ RSI Period (สูตรเดียวกับ backtest)
+        current_rsi_period = get_dynamic_rsi_period(atr_short, atr_long, rsi_config)
 
         state.current_rsi_period = current_rsi_period
         
@@ -1855,53 +1783,8 @@ async def update_market_indicators(api_key: str, api_secret: str, symbol: str, s
         message(symbol, f"Error: {error_traceback}", "red")
         return False
     
-def calculate_rsi(close_prices, length):
-    """คำนวณ RSI โดยใช้ numpy (คงฟังก์ชันเดิมไว้เพราะทำงานได้ดีอยู่แล้ว)"""
-    if len(close_prices) < length + 1:
-        return np.zeros_like(close_prices)
-        
-    deltas = np.diff(close_prices)
-    seed = deltas[:length+1]
-    up = seed[seed >= 0].sum()/length
-    down = -seed[seed < 0].sum()/length
-    
-    if down == 0:
-        if up == 0:
-            rs = 1.0
-        else:
-            rs = float('inf')
-    else:
-        rs = up/down
-        
-    rsi = np.zeros_like(close_prices)
-    rsi[:length] = 100. - 100./(1. + rs)
-
-    for i in range(length, len(close_prices)):
-        delta = deltas[i-1]
-        if delta > 0:
-            upval = delta
-            downval = 0.
-        else:
-            upval = 0.
-            downval = -delta
-
-        up = (up*(length-1) + upval)/length
-        down = (down*(length-1) + downval)/length
-        
-        if down == 0:
-            if up == 0:
-                rs = 1.0
-            else:
-                rs = float('inf')
-        else:
-            rs = up/down
-            
-        rsi[i] = 100. - 100./(1. + rs)
-
-    return np.clip(rsi, 0, 100)
-
-async def get_rsi_cross_last_candle(api_key, api_secret, symbol, timeframe, state, candle_index=0):
-    """คำนวณ RSI cross โดยใช้ค่า period ที่คำนวณไว้แล้ว"""
+async def get_rsi_cross_last_candle(api_key, api_secret, symbol, timeframe, state, candle_index=0, until_time=None):
+    """คำนวณ RSI cross โดยใช้ค่า period ที่คำนวณไว้แล้ว (until_time = open time ของแท่งที่ปิดล่าสุด)"""
     exchange = None
     try:
         # ใช้ค่า RSI Period ที่คำนวณไว้แล้ว
@@ -1915,10 +1798,13 @@ async def get_rsi_cross_last_candle(api_key, api_secret, symbol, timeframe, stat
                 'error': 'ไม่พบค่า RSI Period'
             }
 
-        # ดึงข้อมูลและคำนวณ RSI
-        ohlcv = await fetch_ohlcv(symbol, timeframe, limit=100)
+        # ใช้แท่งที่ปิดแล้ว 99 แท่งล่าสุด (100 แท่งไม่รวมแท่งที่ยังไม่ปิด) จาก indicator engine
+        rsi_window = RSI_WINDOW
+        engine = get_indicator_engine()
+        await engine.sync(symbol, timeframe, until_time)
+        closed_ohlcv = engine.get_closed_candles(symbol, timeframe, limit=rsi_window)
         
-        if not ohlcv or len(ohlcv) < current_rsi_period + 10:
+        if len(closed_ohlcv) + 1 < current_rsi_period + 10:
             return {
                 'status': False,
                 'type': None,
@@ -1926,16 +1812,7 @@ async def get_rsi_cross_last_candle(api_key, api_secret, symbol, timeframe, stat
                 'error': 'ข้อมูลไม่เพียงพอสำหรับการคำนวณ RSI'
             }
         
-        closed_ohlcv = ohlcv[:-1]
-        df = pd.DataFrame(closed_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        
-        local_tz = pytz.timezone('Asia/Bangkok')
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms').dt.tz_localize(pytz.UTC).dt.tz_convert(local_tz)
-        
-        with np.errstate(divide='ignore', invalid='ignore'):
-            df['rsi'] = calculate_rsi(df['close'].values, current_rsi_period)
-        
-        if len(df) < 2 + candle_index:
+        if len(closed_ohlcv) < 2 + candle_index:
             return {
                 'status': False,
                 'type': None,
@@ -1943,8 +1820,13 @@ async def get_rsi_cross_last_candle(api_key, api_secret, symbol, timeframe, stat
                 'error': 'ข้อมูลไม่เพียงพอสำหรับการตรวจสอบ crossover'
             }
             
-        last_closed_rsi = df['rsi'].iloc[-(1 + candle_index)]
-        prev_closed_rsi = df['rsi'].iloc[-(2 + candle_index)]
+        if candle_index == 0:
+            prev_closed_rsi, last_closed_rsi = engine.get_rsi(symbol, timeframe, current_rsi_period, rsi_window)
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi = calculate_rsi(np.array([candle[4] for candle in closed_ohlcv], dtype=float), current_rsi_period)
+            last_closed_rsi = rsi[-(1 + candle_index)]
+            prev_closed_rsi = rsi[-(2 + candle_index)]
         
         if np.isnan(last_closed_rsi) or np.isnan(prev_closed_rsi):
             return {
@@ -1954,6 +1836,9 @@ async def get_rsi_cross_last_candle(api_key, api_secret, symbol, timeframe, stat
                 'error': 'ค่า RSI เป็น NaN'
             }
         
+        cross_candle = closed_ohlcv[-(1 + candle_index)]
+        cross_time = datetime.fromtimestamp(cross_candle[0] / 1000, tz=pytz.UTC).astimezone(pytz.timezone('Asia/Bangkok'))
+        
         result = {
             'status': False,
             'type': None,
@@ -1963,13 +1848,13 @@ async def get_rsi_cross_last_candle(api_key, api_secret, symbol, timeframe, stat
                 f'atr_{state.config.rsi_period["atr"]["length2"]}': state.current_atr_length_2
             },
             'candle': {
-                'open': float(df['open'].iloc[-(1 + candle_index)]),
-                'high': float(df['high'].iloc[-(1 + candle_index)]),
-                'low': float(df['low'].iloc[-(1 + candle_index)]),
-                'close': float(df['close'].iloc[-(1 + candle_index)]),
-                'volume': float(df['volume'].iloc[-(1 + candle_index)]),
-                'timestamp': int(df['timestamp'].iloc[-(1 + candle_index)].timestamp() * 1000),
-                'time': df['timestamp'].iloc[-(1 + candle_index)].strftime('%d/%m/%Y %H:%M'),
+                'open': float(cross_candle[1]),
+                'high': float(cross_candle[2]),
+                'low': float(cross_candle[3]),
+                'close': float(cross_candle[4]),
+                'volume': float(cross_candle[5]),
+                'timestamp': int(cross_candle[0]),
+                'time': cross_time.strftime('%d/%m/%Y %H:%M'),
                 'rsi': round(float(last_closed_rsi), 2)
             }
         }
@@ -2024,7 +1909,7 @@ async def _handle_rsi_signals(api_key, api_secret, symbol, state, position_side,
             else:
                 if state.last_focus_price is not None:
                     try:
-                        await change_stoploss_to_price(api_key, api_secret, symbol, state.last_focus_price)
+                        await change_stoploss_to_price(api_key, api_secret, symbol, state.last_focus_price, orders=state.current_orders)
                         message(symbol, f"ปรับ Stop Loss เป็น {state.last_focus_price:.8f}", "cyan")
                         state.current_stoploss = state.last_focus_price
                         state.last_focus_price = None
@@ -2032,7 +1917,7 @@ async def _handle_rsi_signals(api_key, api_secret, symbol, state, position_side,
                         message(symbol, f"เกิดข้อผิดพลาดในการเปลี่ยน stop loss: {str(e)}", "red")
 
         elif not state.is_in_position:  # ไม่มี position
-            await clear_all_orders(api_key, api_secret, symbol)
+            await clear_all_orders(api_key, api_secret, symbol, orders=state.current_orders)
             
             if 'candle' in rsi_cross:
                 cross_candle = rsi_cross['candle']
@@ -2161,7 +2046,7 @@ async def _handle_rsi_signals(api_key, api_secret, symbol, state, position_side,
                             state.save_state()
                         else:
                             message(symbol, "ไม่สามารถสร้าง Stoploss Order ได้ ยกเลิก Entry Order", "red")
-                            await clear_all_orders(api_key, api_secret, symbol)
+                            await clear_all_orders(api_key, api_secret, symbol, orders=state.current_orders)
                     else:
                         message(symbol, "ไม่สามารถสร้าง Entry Order ได้", "red")
                         
@@ -2230,7 +2115,7 @@ async def _handle_position_swap(api_key, api_secret, symbol, state, price, posit
             try:
                 # ล้าง orders ทั้งหมดก่อน
                 message(symbol, "เคลียร์ orders ทั้งหมดก่อน swap position", "yellow")
-                await clear_all_orders(api_key, api_secret, symbol)
+                await clear_all_orders(api_key, api_secret, symbol, orders=state.current_orders)
                 
                 """# รอให้แน่ใจว่า orders ถูกเคลียร์จริงๆ
                 await asyncio.sleep(1)  # รอสักครู่
@@ -2239,7 +2124,7 @@ async def _handle_position_swap(api_key, api_secret, symbol, state, price, posit
                 orders = await exchange.fetch_open_orders(symbol)
                 if orders:
                     message(symbol, f"ยังมี orders ค้างอยู่ {len(orders)} orders รอเคลียร์อีกครั้ง", "yellow")
-                    await clear_all_orders(api_key, api_secret, symbol)
+                    await clear_all_orders(api_key, api_secret, symbol, orders=state.current_orders)
                     await asyncio.sleep(1)  # รออีกครั้ง"""
                 
                 # ดำเนินการ swap
@@ -2357,7 +2242,6 @@ async def load_trading_config():
 
 async def get_current_candle(api_key, api_secret, symbol, timeframe):
     """ดึงข้อมูลแท่งเทียนปัจจุบัน"""
-    exchange = await create_future_exchange(api_key, api_secret)
     try:
         ohlcv = await fetch_ohlcv(symbol, timeframe, limit=1)
         if ohlcv and len(ohlcv) > 0:
@@ -2373,8 +2257,6 @@ async def get_current_candle(api_key, api_secret, symbol, timeframe):
         error_traceback = traceback.format_exc()
         message(symbol, f"เกิดข้อผิดพลาดขณะดึงข้อมูลแท่งเทียนปัจจุบัน: {str(e)}", "red")
         message(symbol, f"Error: {error_traceback}", "red")
-    finally:
-        await exchange.close()
     return None
 
 async def adjust_quantity_for_stoploss(api_key: str, api_secret: str, symbol: str, 
@@ -2484,7 +2366,10 @@ async def run_with_error_handling(coro, symbol, max_retries=5, retry_delay=60):
 async def show_trading_summary(symbol: str, state: SymbolState):
     """แสดงสรุปผลการเทรด"""
     try:
-        perf = state.performance_data
+        # สรุปจาก trade journal (query รวมใน SQLite) ถ้าไม่มีให้ใช้ข้อมูลใน state
+        perf = get_trade_journal().get_summary(symbol)
+        if perf['trades_count'] == 0:
+            perf = state.performance_data
         if perf['trades_count'] > 0:
             win_rate = (perf['winning_trades'] / perf['trades_count']) * 100
             message(symbol, "====== สรุปผลการเทรด ======", "magenta")
@@ -2528,7 +2413,9 @@ def format_timestamp(timestamp):
 async def main():
     price_tracker = None
     kline_tracker = None
+    user_data_tracker = None
     tracker_tasks = []
+    scheduler = None
     
     try:
         # โหลด Trading Config
@@ -2540,6 +2427,19 @@ async def main():
         # เริ่มต้น price tracker และ kline tracker
         price_tracker = get_price_tracker()
         kline_tracker = get_kline_tracker()
+        user_data_tracker = get_user_data_tracker()
+
+        # บันทึก market stream ไว้ replay ผ่าน replay.py
+        if STREAM_RECORD_FILE:
+            get_stream_manager().start_recording(STREAM_RECORD_FILE)
+
+        # สถิติ request ไป exchange ที่ http://HTTP_SERVER_HOST:HTTP_SERVER_PORT/metrics
+        # และหน้า dashboard ที่ / (ข้อมูลจาก SymbolState ผ่าน /api/snapshot และ /api/events)
+        if HTTP_SERVER_ENABLED:
+            get_http_server().add_route('GET', '/metrics', handle_metrics)
+            register_metrics_source(render_dispatcher_metrics)
+            get_dashboard_feed().register_routes(get_http_server())
+            await get_http_server().start()
         
         # โหลดและตรวจสอบการตั้งค่าสำหรับทุกเหรียญ
         symbol_configs = {}
@@ -2557,7 +2457,7 @@ async def main():
                     symbol_configs[symbol] = config
                     clean_symbol = symbol.lower()
                     price_tracker.subscribe_symbol(clean_symbol)
-                    await kline_tracker.initialize_symbol_data(symbol, config['timeframe'])
+                    await kline_tracker.subscribe(symbol, config['timeframe'])
                     # เพิ่มดีเลย์ระหว่างการโหลดข้อมูลแต่ละเหรียญ
                     await asyncio.sleep(1)
                     
@@ -2572,7 +2472,9 @@ async def main():
         # เริ่ม trackers
         tracker_tasks = [
             asyncio.create_task(price_tracker.start()),
-            asyncio.create_task(kline_tracker.start())
+            asyncio.create_task(kline_tracker.start()),
+            asyncio.create_task(user_data_tracker.start(api_key, api_secret)),
+            asyncio.create_task(refresh_symbol_data_periodically(api_key, api_secret))
         ]
         
         # รอให้ trackers เริ่มต้น
@@ -2583,25 +2485,18 @@ async def main():
         
         # สร้าง state objects สำหรับทุกเหรียญ
         symbol_states = {symbol: SymbolState(symbol) for symbol in symbol_configs}
-        
-        # Main loop
-        while True:
-            try:
-                # ประมวลผลทีละเหรียญ
-                for symbol, state in symbol_states.items():
-                    await run_sequential_bot(api_key, api_secret, symbol, state)
-                    # เว้น 1 วินาทีระหว่างแต่ละเหรียญ
-                    await asyncio.sleep(1)
-                
-                # เว้น 5 วินาทีก่อนเริ่มรอบใหม่
-                #message("SYSTEM", "รอ 5 วินาทีก่อนเริ่มรอบใหม่...", "blue")
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                error_traceback = traceback.format_exc()
-                message("SYSTEM", f"เกิดข้อผิดพลาดในรอบการทำงาน: {str(e)}", "red")
-                message("SYSTEM", f"Error: {error_traceback}", "red")
-                await asyncio.sleep(5)
+        get_dashboard_feed().attach(symbol_states, PERSISTED_STATE_FIELDS)
+        
+        # รับ event แท่งเทียนปิดจาก websocket แทนการ poll REST
+        indicator_engine = get_indicator_engine()
+        for symbol, state in symbol_states.items():
+            timeframe = symbol_configs[symbol]['timeframe']
+            kline_tracker.add_candle_close_callback(symbol, timeframe, indicator_engine.on_candle_closed)
+            kline_tracker.add_candle_close_callback(symbol, timeframe, state.on_candle_closed)
+        
+        # Main loop: แต่ละเหรียญรันเป็น task ของตัวเอง (จำกัดจำนวนพร้อมกันและ rate limit ใน scheduler)
+        scheduler = SymbolScheduler(partial(run_sequential_bot, api_key, api_secret))
+        await scheduler.start(symbol_states)
                 
     except asyncio.CancelledError:
         message("SYSTEM", "ได้รับคำสั่งยกเลิกการทำงาน", "yellow")
@@ -2614,6 +2509,10 @@ async def main():
     finally:
         message("SYSTEM", "กำลังปิดระบบ...", "yellow")
         
+        # หยุด scheduler ของทุกเหรียญ
+        if scheduler:
+            await scheduler.stop()
+        
         # ยกเลิก tracker tasks
         for task in tracker_tasks:
             if not task.done():
@@ -2624,10 +2523,18 @@ async def main():
             await price_tracker.stop()
         if kline_tracker:
             await kline_tracker.stop()
+        if user_data_tracker:
+            await user_data_tracker.stop()
         
         # รอให้ tracker tasks ถูกยกเลิกเสร็จสิ้น
         if tracker_tasks:
             await asyncio.gather(*tracker_tasks, return_exceptions=True)
+        await get_callback_dispatcher().stop()
+        
+        # ปิด exchange ทั้งหมดใน pool
+        await close_exchange_pool()
+        await get_dashboard_feed().stop()
+        await get_http_server().stop()
         
         message("SYSTEM", "ปิดระบบเรียบร้อย", "green")
 
@@ -0,0 +1,346 @@
+"""replay market stream ผ่าน run_sequential_bot ของ main.py กับ exchange จำลอง (เร็วกว่าเวลาจริง)
+
+ใช้ logic การเทรดชุดเดียวกับที่รันจริง แทนการเขียน strategy ซ้ำใน backtest.py
+และวัด decision latency (เวลาตั้งแต่แท่งเทียนปิดจนบอทตัดสินใจเสร็จ) ของทุกแท่ง
+
+รัน:
+  python replay.py                                   # ทุกเหรียญใน TRADING_CONFIG จากแท่งเทียนใน json/ohlcv
+  python replay.py ADAUSDT 2024-01-01 2024-03-01     # เลือกเหรียญและช่วงเวลา
+  python replay.py --file json/streams/record.ndjson # stream ที่บันทึกไว้ด้วย STREAM_RECORD_FILE
+"""
+import asyncio
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import main
+from function.binance.futures.order.other import get_future_market_price, get_kline_data
+from function.binance.futures.system import (
+    callback_dispatcher, exchange_pool, indicator_engine, state_store, stream_manager, trade_journal
+)
+from function.binance.futures.system.exchange_pool import ExchangePool, close_exchange_pool, get_exchange_pool
+from function.binance.futures.system.ohlcv_cache import get_ohlcv_cache, get_timeframe_ms
+from function.binance.futures.system.simulated_exchange import SIMULATED_INITIAL_BALANCE, SimulatedExchange, SimulatedStreamManager
+from function.message import message
+from config import BACKTEST_OFFLINE, SYMBOL_CYCLE_INTERVAL, TRADING_CONFIG, api_key, api_secret
+
+REPLAY_RESULTS_DIR = 'json/backtest_results'
+REPLAY_WARMUP_CANDLES = 300  # จำนวนแท่งที่ kline tracker โหลดตอนเริ่ม (เท่ากับ initialize_symbol_data)
+
+def candles_to_events(symbol: str, timeframe: str, candles) -> Iterator[dict]:
+    """สร้าง aggTrade/kline event จากแท่งเทียน (ราคา open -> low/high -> close ต่อแท่ง)
+
+    แท่งขาขึ้นถือว่าลงไป low ก่อนแล้วค่อยขึ้น high แท่งขาลงกลับกัน (สมมติฐานเดียวกับ backtest)
+    """
+    market_id = symbol.upper()
+    timeframe_ms = get_timeframe_ms(timeframe)
+    for timestamp, open_price, high, low, close, volume in candles:
+        timestamp = int(timestamp)
+        if close >= open_price:
+            path = (open_price, low, high, close)
+        else:
+            path = (open_price, high, low, close)
+
+        running_high = running_low = open_price
+        for step, price in enumerate(path):
+            event_time = timestamp + timeframe_ms * step // 4 if step < 3 else timestamp + timeframe_ms - 1
+            running_high = max(running_high, price)
+            running_low = min(running_low, price)
+            yield {
+                'stream': f"{symbol.lower()}@aggTrade",
+                'data': {'e': 'aggTrade', 'E': event_time, 's': market_id, 'p': str(price), 'q': '0', 'T': event_time}
+            }
+            is_closed = step == 3
+            yield {
+                'stream': f"{symbol.lower()}@kline_{timeframe}",
+                'data': {
+                    'e': 'kline',
+                    'E': timestamp + timeframe_ms if is_closed else event_time,
+                    's': market_id,
+                    'k': {
+                        't': timestamp, 'T': timestamp + timeframe_ms - 1, 's': market_id, 'i': timeframe,
+                        'o': str(open_price), 'h': str(running_high), 'l': str(running_low), 'c': str(price),
+                        'v': str(volume if is_closed else volume * step / 3), 'x': is_closed
+                    }
+                }
+            }
+
+def read_recorded_events(filepath: str) -> Iterator[dict]:
+    """อ่าน stream ที่บันทึกไว้ (บรรทัดละข้อความ) ข้ามข้อความตอบกลับ SUBSCRIBE"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            data = event.get('data', event)
+            if isinstance(data, dict) and 'e' in data:
+                yield event
+
+def _event_time(event: dict) -> int:
+    return int(event.get('data', event).get('E', 0))
+
+class ReplayEngine:
+    """รัน run_sequential_bot ของทุกเหรียญกับ SimulatedExchange โดยป้อน event ทีละตัวตามเวลาของตลาด
+
+    ระหว่าง replay จะแทนที่ singleton (exchange pool, stream manager, trackers, indicator engine,
+    state store, trade journal) ด้วย instance ใหม่ที่แยกไฟล์ไว้ใน work_dir และคืนค่าเดิมตอน close()
+    ส่ง exchange มาเองได้ถ้าต้องการตั้ง latency/error injection
+    """
+    def __init__(self, symbols: List[str], initial_balance: float = SIMULATED_INITIAL_BALANCE,
+                 cycle_interval: float = SYMBOL_CYCLE_INTERVAL, work_dir: Optional[str] = None,
+                 exchange: Optional[SimulatedExchange] = None):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.cycle_interval_ms = int(cycle_interval * 1000)
+        self.exchange = exchange or SimulatedExchange(initial_balance=initial_balance)
+        self.stream_manager = SimulatedStreamManager()
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='replay_')
+        self._owns_work_dir = work_dir is None
+        self.states: Dict[str, main.SymbolState] = {}
+        self.decision_latencies: Dict[str, List[float]] = {symbol: [] for symbol in self.symbols}
+        self.cycle_counts: Dict[str, int] = {symbol: 0 for symbol in self.symbols}
+        self._last_cycle_time: Dict[str, int] = {}
+        self._tracker_tasks: List[asyncio.Task] = []
+        self._saved_singletons = []
+
+    def _install(self):
+        """แทนที่ singleton ของระบบด้วยของ replay (เก็บของเดิมไว้คืนตอนจบ)"""
+        async def exchange_factory(*args, **kwargs):
+            return self.exchange
+
+        replacements = [
+            (exchange_pool, '_exchange_pool', ExchangePool(exchange_factory=exchange_factory)),
+            (stream_manager, '_stream_manager', self.stream_manager),
+            (get_kline_data, '_kline_tracker', get_kline_data.BinanceKlineTracker()),
+            (get_future_market_price, '_price_tracker', get_future_market_price.BinancePriceTracker()),
+            (callback_dispatcher, '_callback_dispatcher', callback_dispatcher.CallbackDispatcher()),
+            (indicator_engine, '_indicator_engine', indicator_engine.IndicatorEngine()),
+            (state_store, '_state_store', state_store.StateStore(os.path.join(self.work_dir, 'state.db'))),
+            (trade_journal, '_trade_journal', trade_journal.TradeJournal(os.path.join(self.work_dir, 'trades.db'))),
+        ]
+        for module, name, instance in replacements:
+            self._saved_singletons.append((module, name, getattr(module, name)))
+            setattr(module, name, instance)
+
+    async def setup(self, history: Dict[str, np.ndarray]):
+        """โหลดแท่งเทียนก่อนเริ่ม replay (warmup ของ indicator) และเริ่ม trackers แบบเดียวกับ main()"""
+        self._install()
+        price_tracker = get_future_market_price.get_price_tracker()
+        kline_tracker = get_kline_data.get_kline_tracker()
+
+        for symbol in self.symbols:
+            state = main.SymbolState(symbol)
+            timeframe = state.config.timeframe
+            self.exchange.load_ohlcv(symbol, timeframe, history.get(symbol, []))
+            price_tracker.subscribe_symbol(symbol.lower())
+            await kline_tracker.subscribe(symbol, timeframe)
+            kline_tracker.add_candle_close_callback(symbol, timeframe, indicator_engine.get_indicator_engine().on_candle_closed)
+            kline_tracker.add_candle_close_callback(symbol, timeframe, state.on_candle_closed)
+            self.states[symbol] = state
+
+        self._tracker_tasks = [
+            asyncio.create_task(price_tracker.start()),
+            asyncio.create_task(kline_tracker.start())
+        ]
+        # ให้ trackers ลงทะเบียน handler กับ stream manager ก่อนส่ง event แรก
+        await asyncio.sleep(0)
+
+    async def _run_cycle(self, symbol: str):
+        self.cycle_counts[symbol] += 1
+        await main.run_sequential_bot(api_key, api_secret, symbol, self.states[symbol])
+
+    async def run(self, events: Iterable[dict]) -> dict:
+        """ป้อน event ตามลำดับ รันรอบของเหรียญทุก cycle_interval (เวลาตลาด) และทุกครั้งที่แท่งเทียนปิด"""
+        price_tracker = get_future_market_price.get_price_tracker()
+        first_time = last_time = None
+        wall_start = time.perf_counter()
+
+        for event in events:
+            data = event.get('data', event)
+            symbol = data.get('s', '').upper()
+            event_time = _event_time(event)
+            first_time = event_time if first_time is None else first_time
+            last_time = event_time
+
+            start = time.perf_counter()
+            self.exchange.apply_stream_event(data)
+            await self.stream_manager.publish(event)
+
+            if symbol not in self.states or price_tracker.get_price(symbol) is None:
+                continue
+
+            is_candle_close = data.get('e') == 'kline' and data['k']['x'] and data['k']['i'] == self.states[symbol].config.timeframe
+            if is_candle_close:
+                await self._run_cycle(symbol)
+                self.decision_latencies[symbol].append(time.perf_counter() - start)
+                self._last_cycle_time[symbol] = event_time
+            elif event_time - self._last_cycle_time.get(symbol, 0) >= self.cycle_interval_ms:
+                await self._run_cycle(symbol)
+                self._last_cycle_time[symbol] = event_time
+
+        wall_time = time.perf_counter() - wall_start
+        market_time = (last_time - first_time) / 1000 if first_time is not None else 0
+        return {
+            'wall_time': wall_time,
+            'market_time': market_time,
+            'speedup': market_time / wall_time if wall_time > 0 else None
+        }
+
+    def get_summary(self) -> pd.DataFrame:
+        """สรุปผลต่อเหรียญ: จำนวนรอบ, decision latency, ผลการเทรดจาก journal และ fills จาก exchange"""
+        journal = trade_journal.get_trade_journal()
+        rows = []
+        for symbol in self.symbols:
+            latencies = np.array(self.decision_latencies[symbol]) * 1000
+            perf = journal.get_summary(symbol)
+            fills = self.exchange.trades.get(symbol, [])
+            rows.append({
+                'symbol': symbol,
+                'cycles': self.cycle_counts[symbol],
+                'candles': len(latencies),
+                'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+                'latency_max_ms': float(latencies.max()) if len(latencies) else None,
+                'trades': perf['trades_count'],
+                'winning_trades': perf['winning_trades'],
+                'journal_profit': perf['total_profit'],
+                'fills': len(fills),
+                'realized_pnl': sum(float(fill['info']['realizedPnl']) for fill in fills),
+                'fees': sum(fill['fee']['cost'] for fill in fills)
+            })
+        return pd.DataFrame(rows)
+
+    def get_fills(self) -> pd.DataFrame:
+        """fills ทั้งหมดจาก exchange จำลอง (ใช้เทียบกับ trades ของ backtest)"""
+        rows = []
+        for market_id, fills in self.exchange.trades.items():
+            for fill in fills:
+                rows.append({
+                    'time': pd.to_datetime(fill['timestamp'], unit='ms'),
+                    'symbol': market_id,
+                    'side': fill['side'],
+                    'type': fill['type'],
+                    'price': fill['price'],
+                    'amount': fill['amount'],
+                    'realized_pnl': float(fill['info']['realizedPnl']),
+                    'fee': fill['fee']['cost']
+                })
+        return pd.DataFrame(rows)
+
+    async def close(self):
+        """หยุด trackers ปิดไฟล์ และคืน singleton เดิม"""
+        await get_future_market_price.get_price_tracker().stop()
+        await get_kline_data.get_kline_tracker().stop()
+        await self.stream_manager.stop()
+        for task in self._tracker_tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*self._tracker_tasks, return_exceptions=True)
+        await callback_dispatcher.get_callback_dispatcher().stop()
+        await close_exchange_pool()
+        state_store.get_state_store().close()
+        trade_journal.get_trade_journal().close()
+
+        for module, name, instance in reversed(self._saved_singletons):
+            setattr(module, name, instance)
+        self._saved_singletons.clear()
+        if self._owns_work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+def _symbol_timeframe(symbol: str) -> str:
+    return main.TradingConfig(symbol).timeframe
+
+async def _load_candles(symbols: List[str], start_date: str, end_date: str) -> Dict[str, np.ndarray]:
+    """แท่งเทียนช่วงที่ replay รวม warmup ก่อนหน้า (ดึงจาก exchange จริงเฉพาะส่วนที่ cache ยังไม่มี)"""
+    cache = get_ohlcv_cache()
+    exchange = None if BACKTEST_OFFLINE else await get_exchange_pool().acquire(api_key, api_secret)
+    candles = {}
+    try:
+        for symbol in symbols:
+            timeframe = _symbol_timeframe(symbol)
+            timeframe_ms = get_timeframe_ms(timeframe)
+            since = int(pd.Timestamp(start_date, tz='UTC').timestamp() * 1000) - REPLAY_WARMUP_CANDLES * timeframe_ms
+            until = int(pd.Timestamp(end_date, tz='UTC').timestamp() * 1000)
+            candles[symbol] = np.asarray(await cache.get_candles(symbol, timeframe, since, until, exchange=exchange))
+    finally:
+        await close_exchange_pool()
+    return candles
+
+async def run_replay(symbols: Optional[List[str]] = None, start_date: str = "2024-01-01", end_date: str = "2024-03-01",
+                     record_file: Optional[str] = None, initial_balance: float = SIMULATED_INITIAL_BALANCE):
+    """replay แท่งเทียนจาก cache (หรือ stream ที่บันทึกไว้) ผ่าน logic ของ main.py แล้วบันทึกผลเป็น CSV"""
+    symbols = [symbol.upper() for symbol in symbols] if symbols else [config['symbol'] for config in TRADING_CONFIG]
+    engine = None
+    try:
+        if record_file:
+            # warmup มาจาก cache ช่วงก่อน event แรกของไฟล์
+            first_event = next(read_recorded_events(record_file), None)
+            if first_event is None:
+                message("SYSTEM", f"ไม่พบ event ในไฟล์ {record_file}", "red")
+                return None
+            first_time = _event_time(first_event)
+            history = {
+                symbol: get_ohlcv_cache().read(symbol, _symbol_timeframe(symbol), until=first_time - get_timeframe_ms(_symbol_timeframe(symbol)))[-REPLAY_WARMUP_CANDLES:]
+                for symbol in symbols
+            }
+            events = read_recorded_events(record_file)
+        else:
+            candles = await _load_candles(symbols, start_date, end_date)
+            history = {symbol: data[:REPLAY_WARMUP_CANDLES] for symbol, data in candles.items()}
+            events = heapq.merge(
+                *(candles_to_events(symbol, _symbol_timeframe(symbol), data[REPLAY_WARMUP_CANDLES:]) for symbol, data in candles.items()),
+                key=_event_time
+            )
+
+        for symbol, data in history.items():
+            if len(data) < REPLAY_WARMUP_CANDLES:
+                message(symbol, f"แท่งเทียน warmup มีเพียง {len(data)} แท่ง indicator อาจยังคำนวณไม่ได้", "yellow")
+
+        engine = ReplayEngine(symbols, initial_balance=initial_balance)
+        await engine.setup(history)
+        timing = await engine.run(events)
+
+        summary = engine.get_summary()
+        fills = engine.get_fills()
+        os.makedirs(REPLAY_RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now(pytz.UTC).strftime('%Y%m%d_%H%M%S')
+        summary.to_csv(os.path.join(REPLAY_RESULTS_DIR, f"replay_{timestamp}_summary.csv"), index=False)
+        fills.to_csv(os.path.join(REPLAY_RESULTS_DIR, f"replay_{timestamp}_fills.csv"), index=False)
+
+        message("SYSTEM", "====== ผล Replay ======", "magenta")
+        message("SYSTEM", f"เวลาตลาด {timing['market_time'] / 3600:.1f} ชม. ใช้เวลาจริง {timing['wall_time']:.1f} วินาที "
+                          f"(เร็วกว่าเวลาจริง {timing['speedup'] or 0:.0f} เท่า)", "magenta")
+        message("SYSTEM", f"Balance สุดท้าย: {engine.exchange.wallet_balance:.2f} USDT", "magenta")
+        message("SYSTEM", f"Requests: {dict(engine.exchange.request_counts)}", "magenta")
+        print(summary.to_string(index=False))
+        return summary
+
+    except Exception as e:
+        error_traceback = traceback.format_exc()
+        message("SYSTEM", f"เกิดข้อผิดพลาดใน replay: {str(e)}", "red")
+        message("SYSTEM", f"Error: {error_traceback}", "red")
+        return None
+    finally:
+        if engine is not None:
+            await engine.close()
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    if len(sys.argv) > 2 and sys.argv[1] == '--file':
+        loop.run_until_complete(run_replay(record_file=sys.argv[2]))
+    elif len(sys.argv) > 1:
+        loop.run_until_complete(run_replay([sys.argv[1]], *sys.argv[2:4]))
+    else:
+        loop.run_until_complete(run_replay())
+    loop.close()
@@ -0,0 +1,28 @@
+"""ตรวจ regression ของรอบการทำงานของบอท (เวลา p50, request และ memory ต่อรอบ) เทียบกับ benchmark/cycle_baseline.json
+
+ใช้สถานการณ์และเกณฑ์เดียวกับ benchmark.benchmark_cycle ถ้าย้ายเครื่องให้สร้าง baseline ใหม่ก่อนด้วย
+python -m benchmark.benchmark_cycle --save-baseline
+
+รัน: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import benchmark_cycle
+
+REPEAT = 3
+
+@pytest.mark.parametrize('name', list(benchmark_cycle.SCENARIOS))
+def test_cycle_has_no_regression(name):
+    result = asyncio.run(benchmark_cycle.run_repeated(name, REPEAT))
+    assert result['reached'], f"{name}: สถานการณ์ไม่ถึงเหตุการณ์ที่ต้องการ"
+
+    baseline = benchmark_cycle.load_baseline()
+    if name not in baseline:
+        pytest.skip('ยังไม่มี baseline ของสถานการณ์นี้ (python -m benchmark.benchmark_cycle --save-baseline)')
+    assert benchmark_cycle.find_regressions({name: result}, baseline) == []
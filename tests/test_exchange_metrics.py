@@ -0,0 +1,54 @@
+"""ตรวจว่า InstrumentedExchange บันทึกชื่อฟังก์ชันที่เรียก exchange ถูกต้อง แม้เรียกผ่าน asyncio.gather / create_task
+
+รัน: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from function.binance.futures.system.exchange_metrics import ExchangeMetrics, InstrumentedExchange, _find_caller
+
+class FakeExchange:
+    def __init__(self):
+        self.last_response_headers = {'x-mbx-used-weight-1m': '1'}
+
+    async def cancel_order(self, id, symbol=None, params={}):
+        await asyncio.sleep(0)
+        return {'id': id}
+
+def callers(metrics: ExchangeMetrics) -> dict:
+    return {caller: weight for (_, caller), weight in metrics.weight_used.items()}
+
+def make_exchange():
+    metrics = ExchangeMetrics()
+    return InstrumentedExchange(FakeExchange(), metrics), metrics
+
+def test_caller_of_direct_await():
+    exchange, metrics = make_exchange()
+
+    async def cancel_one():
+        await exchange.cancel_order('1', 'ADA/USDT:USDT')
+
+    asyncio.run(cancel_one())
+    assert set(callers(metrics)) == {'cancel_one'}
+
+def test_caller_inside_gather_and_create_task():
+    exchange, metrics = make_exchange()
+
+    async def cancel_all():
+        await asyncio.gather(*(exchange.cancel_order(str(i), 'ADA/USDT:USDT') for i in range(3)))
+
+    async def cancel_later():
+        await asyncio.create_task(exchange.cancel_order('9', 'ADA/USDT:USDT'))
+
+    async def run():
+        await cancel_all()
+        await cancel_later()
+
+    asyncio.run(run())
+    assert set(callers(metrics)) == {'cancel_all', 'cancel_later'}
+
+def test_unknown_caller_outside_project():
+    assert _find_caller(None) == 'unknown'
@@ -0,0 +1,100 @@
+"""ตรวจว่า IndicatorEngine (incremental) ให้ค่าเท่ากับ calculate_atr / calculate_rsi แบบคำนวณใหม่ทั้งหน้าต่าง
+
+รัน: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from function.binance.futures.system.indicator_engine import (
+    RSI_WINDOW,
+    IndicatorEngine,
+    calculate_atr,
+    calculate_rsi,
+    get_atr_window,
+)
+
+SYMBOL = 'ADAUSDT'
+TIMEFRAME = '4h'
+INTERVAL = 4 * 60 * 60 * 1000
+RSI_CONFIG = DEFAULT_CONFIG['rsi_period']
+ATR_LENGTHS = sorted({RSI_CONFIG['atr']['length1'], RSI_CONFIG['atr']['length2'], RSI_CONFIG['atr']['length_tp']})
+RSI_LENGTHS = range(RSI_CONFIG['rsi_period_min'], RSI_CONFIG['rsi_period_max'] + 1)
+
+def make_candles(count: int, seed: int = 42) -> list:
+    """แท่งเทียนสุ่มแบบ random walk (มีช่วงขึ้นหรือลงต่อเนื่องปนอยู่)"""
+    rng = np.random.default_rng(seed)
+    candles = []
+    close = 100.0
+    for index in range(count):
+        open_price = close
+        close = max(open_price + rng.normal(0, 1.0), 1.0)
+        high = max(open_price, close) + rng.random()
+        low = max(min(open_price, close) - rng.random(), 0.5)
+        candles.append([index * INTERVAL, open_price, high, low, close, 1000.0])
+    return candles
+
+def assert_parity(engine: IndicatorEngine, history: list):
+    """ค่าจาก engine ต้องเท่ากับการคำนวณใหม่จากแท่งที่ปิดแล้วชุดเดียวกัน"""
+    atr_window = get_atr_window(RSI_CONFIG)
+    for length in ATR_LENGTHS:
+        expected = calculate_atr(history[-atr_window:], length)
+        assert engine.get_atr(SYMBOL, TIMEFRAME, length, atr_window) == pytest.approx(expected, rel=1e-9, abs=1e-12)
+
+    closes = np.array([candle[4] for candle in history[-RSI_WINDOW:]], dtype=float)
+    for length in RSI_LENGTHS:
+        expected = calculate_rsi(closes, length)
+        rsi_prev, rsi_last = engine.get_rsi(SYMBOL, TIMEFRAME, length, RSI_WINDOW)
+        assert rsi_prev == pytest.approx(expected[-2], abs=1e-7)
+        assert rsi_last == pytest.approx(expected[-1], abs=1e-7)
+
+def test_push_matches_full_recalculation():
+    candles = make_candles(450)
+    engine = IndicatorEngine()
+    engine.seed(SYMBOL, TIMEFRAME, candles[:300])
+    assert_parity(engine, candles[:300])
+
+    for index in range(300, len(candles)):
+        assert engine.push(SYMBOL, TIMEFRAME, candles[index])
+        assert_parity(engine, candles[:index + 1])
+
+def test_short_history_matches_full_recalculation():
+    """ข้อมูลยังไม่ครบหน้าต่างของ ATR ยาว engine ต้องคำนวณจากแท่งที่มีแบบเดียวกัน"""
+    candles = make_candles(150, seed=7)
+    engine = IndicatorEngine()
+    engine.seed(SYMBOL, TIMEFRAME, candles[:120])
+    for index in range(120, len(candles)):
+        assert engine.push(SYMBOL, TIMEFRAME, candles[index])
+        assert_parity(engine, candles[:index + 1])
+
+def test_duplicate_push_is_ignored():
+    candles = make_candles(300)
+    engine = IndicatorEngine()
+    engine.seed(SYMBOL, TIMEFRAME, candles)
+    assert engine.push(SYMBOL, TIMEFRAME, candles[-1])
+    assert_parity(engine, candles)
+
+def test_non_contiguous_push_forces_reseed():
+    candles = make_candles(420, seed=3)
+    engine = IndicatorEngine()
+    engine.seed(SYMBOL, TIMEFRAME, candles[:300])
+    for index in range(300, 320):
+        assert engine.push(SYMBOL, TIMEFRAME, candles[index])
+
+    # ข้ามไปสองแท่ง (เช่นหลุดการเชื่อมต่อ) engine ต้องทิ้ง state และรอ seed ใหม่
+    assert not engine.push(SYMBOL, TIMEFRAME, candles[322])
+    assert engine.get_atr(SYMBOL, TIMEFRAME, ATR_LENGTHS[0], get_atr_window(RSI_CONFIG)) is None
+    assert engine.get_rsi(SYMBOL, TIMEFRAME, RSI_CONFIG['rsi_period_min'], RSI_WINDOW) is None
+    assert not engine.push(SYMBOL, TIMEFRAME, candles[323])
+
+    # seed ใหม่จากประวัติที่ต่อเนื่อง (แบบเดียวกับ sync หลัง backfill) แล้ว push ต่อได้ค่าตรงกัน
+    engine.seed(SYMBOL, TIMEFRAME, candles[:323])
+    assert_parity(engine, candles[:323])
+    for index in range(323, len(candles)):
+        assert engine.push(SYMBOL, TIMEFRAME, candles[index])
+        assert_parity(engine, candles[:index + 1])
@@ -0,0 +1,97 @@
+"""ตรวจการรอ rate limit ของ SymbolScheduler ด้วยนาฬิกาจำลอง (asyncio.sleep เลื่อนเวลาแทนการรอจริง)
+
+รัน: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from function.binance.futures.system import symbol_scheduler
+from function.binance.futures.system.exchange_pool import ExchangePool
+from function.binance.futures.system.exchange_metrics import USED_WEIGHT_HEADER
+
+START_MINUTE = 29_000_000
+WEIGHT_BUDGET = 1000
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+class FakeExchange:
+    def __init__(self, used_weight: int):
+        self.last_response_headers = {USED_WEIGHT_HEADER: str(used_weight)}
+
+def install_fake_clock(monkeypatch, start: float) -> FakeClock:
+    clock = FakeClock(start)
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, result=None):
+        clock.now += delay
+        return await real_sleep(0, result)
+
+    monkeypatch.setattr(time, 'time', clock.time)
+    monkeypatch.setattr(asyncio, 'sleep', fake_sleep)
+    return clock
+
+def make_scheduler(run_cycle, interval: float = 1) -> symbol_scheduler.SymbolScheduler:
+    scheduler = symbol_scheduler.SymbolScheduler(run_cycle, max_concurrency=1, interval=interval, jitter=0,
+                                                 weight_budget=WEIGHT_BUDGET)
+    scheduler.is_running = True
+    return scheduler
+
+def test_stale_used_weight_expires_at_next_minute(monkeypatch):
+    clock = install_fake_clock(monkeypatch, START_MINUTE * 60 + 10)
+    pool = ExchangePool()
+    # header เกินงบจาก request ของนาทีนี้ และไม่มี request ใหม่ที่จะมาอัพเดท header อีก
+    pool._exchanges[('key',)] = FakeExchange(WEIGHT_BUDGET + 200)
+    monkeypatch.setattr(symbol_scheduler, 'get_exchange_pool', lambda: pool)
+    assert pool.get_used_weight() == WEIGHT_BUDGET + 200
+
+    cycle_times = []
+
+    async def run_cycle(symbol, state):
+        cycle_times.append(clock.now)
+        if len(cycle_times) == 3:
+            scheduler.is_running = False
+
+    scheduler = make_scheduler(run_cycle)
+    asyncio.run(asyncio.wait_for(scheduler._run_symbol('ADAUSDT', None), timeout=5))
+
+    assert len(cycle_times) == 3
+    assert int(cycle_times[0] // 60) == START_MINUTE + 1
+    assert pool.get_used_weight() == 0
+
+def test_restart_delay_resets_after_successful_cycle(monkeypatch):
+    install_fake_clock(monkeypatch, START_MINUTE * 60)
+    monkeypatch.setattr(symbol_scheduler, 'get_exchange_pool', ExchangePool)
+    monkeypatch.setattr(symbol_scheduler, 'message', lambda *args, **kwargs: None)
+
+    # ล้ม 3 ครั้งติดกัน ทำงานสำเร็จ 1 รอบแล้วล้มอีก 2 ครั้ง
+    outcomes = ['fail', 'fail', 'fail', 'ok', 'fail', 'fail']
+    restart_delays = []
+    fake_sleep = asyncio.sleep
+
+    async def recording_sleep(delay, result=None):
+        # interval ของรอบปกติเป็น 0.5 วินาที ที่เหลือคือเวลารอก่อนเริ่ม task ใหม่
+        if delay >= 1:
+            restart_delays.append(delay)
+        return await fake_sleep(delay, result)
+
+    async def run_cycle(symbol, state):
+        outcome = outcomes.pop(0)
+        if not outcomes:
+            scheduler.is_running = False
+        if outcome == 'fail':
+            raise RuntimeError('cycle failed')
+
+    monkeypatch.setattr(asyncio, 'sleep', recording_sleep)
+    scheduler = make_scheduler(run_cycle, interval=0.5)
+    asyncio.run(asyncio.wait_for(scheduler._supervise('ADAUSDT', None), timeout=5))
+
+    assert restart_delays == [1, 2, 4, 1, 2]